@@ -0,0 +1,189 @@
+import os
+import re
+import datetime
+import time
+import threading
+from collections import OrderedDict
+import numpy as np
+from embedding_engine import get_embedding_engine
+from index import db
+
+# Constants
+ANSWER_CACHE_TTL_SECONDS = int(os.getenv("ANSWER_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.92"))
+ANSWER_CACHE_LRU_SIZE = int(os.getenv("ANSWER_CACHE_LRU_SIZE", "2048"))
+ANSWER_CACHE_SEMANTIC_LIMIT = int(os.getenv("ANSWER_CACHE_SEMANTIC_LIMIT", "500"))
+ANSWER_CACHE_SEMANTIC_PDFS = int(os.getenv("ANSWER_CACHE_SEMANTIC_PDFS", "64"))  # PDFs whose question vectors stay in memory
+ANSWER_CACHE_REFRESH_SECONDS = float(os.getenv("ANSWER_CACHE_REFRESH_SECONDS", "60"))  # how stale another worker's answers may be
+
+answer_cache_collection = db["answer_cache"]
+
+def normalize_question(question):
+    """Lowercase, drop punctuation and collapse whitespace"""
+    question = re.sub(r"[^\w\s]", " ", question.lower())
+    return " ".join(question.split())
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def _cutoff():
+    """Oldest created_at still within the TTL; MongoDB's TTL monitor only runs once a minute"""
+    return datetime.datetime.utcnow() - datetime.timedelta(seconds=ANSWER_CACHE_TTL_SECONDS)
+
+class AnswerCache:
+    """Answers per (pdf_hash, question): in-memory LRU in front of a TTL'd MongoDB collection (see schema.py)
+
+    Exact hits match on the normalized question. Near-duplicates match when
+    the cosine similarity of question embeddings is at least `threshold`.
+    """
+
+    def __init__(self, collection=answer_cache_collection, threshold=ANSWER_CACHE_SIMILARITY,
+                 lru_size=ANSWER_CACHE_LRU_SIZE, semantic_pdfs=ANSWER_CACHE_SEMANTIC_PDFS):
+        self.collection = collection
+        self.threshold = threshold
+        self.lru_size = lru_size
+        self.semantic_pdfs = semantic_pdfs
+        self._lru = OrderedDict()
+        self._semantic = OrderedDict()
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.seconds_saved = 0.0
+
+    def _remember(self, pdf_hash, key, entry):
+        """Put an entry in the LRU tier; caller holds the lock"""
+        self._lru[(pdf_hash, key)] = entry
+        self._lru.move_to_end((pdf_hash, key))
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _semantic_entries(self, pdf_hash):
+        """Unexpired question vectors for a PDF, newest first
+
+        Loaded from MongoDB on first use, then topped up with the entries
+        created since the newest one seen at most every
+        ANSWER_CACHE_REFRESH_SECONDS, so answers cached by other workers
+        become visible. Only the last `semantic_pdfs` PDFs used are kept.
+        """
+        cutoff = _cutoff()
+        with self._lock:
+            cached = self._semantic.get(pdf_hash)
+            if cached is not None:
+                self._semantic.move_to_end(pdf_hash)
+                if time.monotonic() - cached["loaded_at"] < ANSWER_CACHE_REFRESH_SECONDS:
+                    return [entry for entry in cached["entries"] if entry[2]["created_at"] >= cutoff]
+        since = max(cutoff, cached["newest"]) if cached else cutoff
+        loaded_at = time.monotonic()
+        cursor = self.collection.find(
+            {"pdf_hash": pdf_hash, "created_at": {"$gte": since}},
+            {"_id": 0, "key": 1, "answer": 1, "embedding": 1, "latency": 1, "created_at": 1}
+        ).sort("created_at", -1).limit(ANSWER_CACHE_SEMANTIC_LIMIT)
+        fresh = [(doc["key"], _unit(doc.pop("embedding")), doc) for doc in cursor if doc.get("embedding")]
+        with self._lock:
+            # Re-read: store() may have added entries while MongoDB was queried
+            cached = self._semantic.get(pdf_hash)
+            keys = {key for key, _, _ in fresh}
+            kept = [entry for entry in cached["entries"] if entry[0] not in keys] if cached else []
+            entries = sorted(fresh + kept, key=lambda entry: entry[2]["created_at"], reverse=True)
+            entries = [entry for entry in entries if entry[2]["created_at"] >= cutoff][:ANSWER_CACHE_SEMANTIC_LIMIT]
+            newest = fresh[0][2]["created_at"] if fresh else since
+            self._semantic[pdf_hash] = {
+                "entries": entries,
+                "newest": max(newest, cached["newest"]) if cached else newest,
+                "loaded_at": loaded_at
+            }
+            self._semantic.move_to_end(pdf_hash)
+            while len(self._semantic) > self.semantic_pdfs:
+                self._semantic.popitem(last=False)
+            return list(entries)
+
+    def _hit(self, entry, semantic):
+        with self._lock:
+            if semantic:
+                self.semantic_hits += 1
+            else:
+                self.exact_hits += 1
+            self.seconds_saved += entry.get("latency", 0.0)
+        return entry["answer"]
+
+    def lookup(self, pdf_hash, question, embedding=None):
+        """Return a cached answer for the question, or None
+
+        `embedding` is the normalized question's vector when the caller has
+        already embedded it, e.g. as part of a batch.
+        """
+        key = normalize_question(question)
+        cutoff = _cutoff()
+        with self._lock:
+            entry = self._lru.get((pdf_hash, key))
+            if entry is not None and entry["created_at"] < cutoff:
+                del self._lru[(pdf_hash, key)]
+                entry = None
+            if entry is not None:
+                self._lru.move_to_end((pdf_hash, key))
+        if entry is not None:
+            return self._hit(entry, semantic=False)
+
+        entry = self.collection.find_one(
+            {"pdf_hash": pdf_hash, "key": key, "created_at": {"$gte": cutoff}},
+            {"_id": 0, "answer": 1, "latency": 1, "created_at": 1}
+        )
+        if entry is not None:
+            with self._lock:
+                self._remember(pdf_hash, key, entry)
+            return self._hit(entry, semantic=False)
+
+        entries = self._semantic_entries(pdf_hash)
+        if entries:
+            query = _unit(embedding if embedding is not None else get_embedding_engine().embed_query(key))
+            scores = np.stack([vector for _, vector, _ in entries]) @ query
+            best = int(np.argmax(scores))
+            if scores[best] >= self.threshold:
+                return self._hit(entries[best][2], semantic=True)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, pdf_hash, question, answer, latency=0.0, embedding=None):
+        """Cache an answer along with how long it took to produce"""
+        key = normalize_question(question)
+        if embedding is None:
+            embedding = get_embedding_engine().embed_query(key)
+        entry = {"answer": answer, "latency": latency, "created_at": datetime.datetime.utcnow()}
+        self.collection.update_one(
+            {"pdf_hash": pdf_hash, "key": key},
+            {"$set": {
+                "question": question,
+                "answer": answer,
+                "latency": latency,
+                "embedding": [float(value) for value in embedding],
+                "created_at": entry["created_at"]
+            }},
+            upsert=True
+        )
+        with self._lock:
+            self._remember(pdf_hash, key, entry)
+            cached = self._semantic.get(pdf_hash)
+            if cached is not None:
+                entries = [item for item in cached["entries"] if item[0] != key]
+                entries.insert(0, (key, _unit(embedding), entry))
+                cached["entries"] = entries[:ANSWER_CACHE_SEMANTIC_LIMIT]
+
+    def stats(self):
+        """Hit counters, hit rate and total LLM time avoided"""
+        with self._lock:
+            lookups = self.exact_hits + self.semantic_hits + self.misses
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0,
+                "seconds_saved": self.seconds_saved
+            }
+
+# Shared by every Streamlit session in this process
+answer_cache = AnswerCache()
@@ -0,0 +1,94 @@
+import logging
+import requests
+from llm_client import chat_completion, stream_chat_completion
+from library import LIBRARY_TOP_K, cite
+from retrieval import RETRIEVAL_K, retrieve
+from context_builder import build_context
+from tokens import count_tokens
+from metrics import registry
+
+# Constants
+ANSWER_TEMPERATURE = 0.3
+ANSWER_TIMEOUT = 30
+NO_PDF_MESSAGE = "⚠️ No PDF loaded or vector store missing."
+NO_LIBRARY_MESSAGE = "⚠️ No indexed PDFs in your library yet."
+
+logger = logging.getLogger(__name__)
+
+def retrieval_k(library=False):
+    """Chunks to retrieve per question for the retrieval mode"""
+    return LIBRARY_TOP_K if library else RETRIEVAL_K
+
+def context_from(docs, library=False):
+    """Prompt context from retrieved chunks; library chunks are headed by file and page"""
+    context = build_context(docs, label=cite) if library else build_context(docs)
+    logger.info("retrieval: %s", context)
+    return context.text
+
+def retrieve_context(vs, query, library=False):
+    """Retrieve relevant context from a single-PDF or library vector store"""
+    if vs is None:
+        return NO_LIBRARY_MESSAGE if library else NO_PDF_MESSAGE
+    with registry.timer("retrieval_seconds", stage="total", scope="library" if library else "pdf"):
+        docs = retrieve(vs, query, k=retrieval_k(library))
+    return context_from(docs, library)
+
+def build_answer_prompt(query, context):
+    """Prompt asking the model to answer from retrieved PDF context"""
+    return f"""Based on this context from the PDF:
+{context}
+
+Answer this question: {query}
+
+If the answer cannot be found in the context, reply with "I couldn't find that information in the document.\""""
+
+def build_library_prompt(query, context):
+    """Prompt asking the model to answer from chunks of several PDFs and cite them"""
+    return f"""Based on these excerpts from the user's PDFs, each headed by [file, page]:
+{context}
+
+Answer this question: {query}
+
+Cite the file and page of every excerpt you use, in the same [file, p. N] form.
+If the answer cannot be found in the excerpts, reply with "I couldn't find that information in your documents.\""""
+
+def answer_prompt(query, context, memory="", library=False):
+    """Prompt for the retrieval mode, preceded by the conversation memory if any"""
+    prompt = build_library_prompt(query, context) if library else build_answer_prompt(query, context)
+    return f"{memory}\n\n{prompt}" if memory else prompt
+
+def answer_question(vs, query, memory="", library=False):
+    """Retrieve context and return the whole answer, or a "⚠️" message"""
+    context = retrieve_context(vs, query, library)
+    if context.startswith("⚠️"):
+        return context
+    return complete_answer(query, context, memory, library)
+
+def complete_answer(query, context, memory="", library=False):
+    """Whole answer from already retrieved context, or a "⚠️" message"""
+    full_prompt = answer_prompt(query, context, memory, library)
+    logger.info("answer prompt: %d tokens", count_tokens(full_prompt))
+
+    try:
+        return chat_completion([{"role": "user", "content": full_prompt}], temperature=ANSWER_TEMPERATURE, timeout=ANSWER_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        return f"⚠️ Error connecting to API: {str(e)}"
+    except Exception as e:
+        return f"⚠️ An unexpected error occurred: {str(e)}"
+
+def stream_answer(vs, query, memory="", library=False):
+    """Retrieve context and yield answer tokens as they arrive, or one "⚠️" message"""
+    context = retrieve_context(vs, query, library)
+    if context.startswith("⚠️"):
+        yield context
+        return
+
+    full_prompt = answer_prompt(query, context, memory, library)
+    logger.info("answer prompt: %d tokens", count_tokens(full_prompt))
+
+    try:
+        yield from stream_chat_completion([{"role": "user", "content": full_prompt}], temperature=ANSWER_TEMPERATURE, timeout=ANSWER_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        yield f"⚠️ Error connecting to API: {str(e)}"
+    except Exception as e:
+        yield f"⚠️ An unexpected error occurred: {str(e)}"
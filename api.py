@@ -0,0 +1,318 @@
+import os
+import json
+import hmac
+import asyncio
+import logging
+import datetime
+import tempfile
+import threading
+from contextlib import aclosing
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+import service
+from schema import ensure_indexes_once
+from embedding_engine import warm_up_embedding_engine
+from metrics import registry
+
+# Constants
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_THREADS = int(os.getenv("API_THREADS", "32"))  # blocking pipeline calls in flight per worker
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(200 * 1024 * 1024)))
+UPLOAD_SPOOL_BYTES = 8 * 1024 * 1024  # uploads larger than this are spooled to disk
+UPLOAD_BLOCK_SIZE = 256 * 1024
+STREAM_QUEUE_SIZE = 64
+
+logger = logging.getLogger(__name__)
+
+executor_key = web.AppKey("executor", ThreadPoolExecutor)
+
+def to_json(value):
+    """JSON body with datetimes as ISO 8601 strings"""
+    return json.dumps(value, default=lambda obj: obj.isoformat() if isinstance(obj, datetime.datetime) else str(obj))
+
+def json_response(value, status=200):
+    return web.json_response(value, status=status, dumps=to_json)
+
+def parse_timestamp(value):
+    """datetime from an ISO 8601 string, None passed through"""
+    return datetime.datetime.fromisoformat(value) if value else None
+
+def parse_messages(messages):
+    """Client-side conversation with ISO timestamps turned back into datetimes"""
+    if messages is None:
+        return None
+    return [{**message, "timestamp": parse_timestamp(message.get("timestamp"))} for message in messages]
+
+def parse_cursor(cursor):
+    """Sidebar cursor, a JSON list of [timestamp, pdf_hash] as sent by list_conversations"""
+    if not cursor:
+        return None
+    latest, pdf_hash = json.loads(cursor)
+    return parse_timestamp(latest), pdf_hash
+
+async def run_blocking(request, fn, *args, **kwargs):
+    """Run a blocking pipeline call on the worker's thread pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(request.app[executor_key], lambda: fn(*args, **kwargs))
+
+async def stream_text(request, tokens):
+    """Send a blocking token generator as a chunked text/plain response
+
+    The generator runs on the thread pool and hands tokens over through a
+    bounded queue, so a slow client holds back the LLM stream instead of
+    buffering it. A client that disconnects stops the generator.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(STREAM_QUEUE_SIZE)
+    cancelled = threading.Event()
+    done = object()
+
+    def pump():
+        try:
+            for token in tokens:
+                if cancelled.is_set():
+                    break
+                asyncio.run_coroutine_threadsafe(queue.put(token), loop).result()
+        except Exception as e:
+            logger.exception("stream failed")
+            asyncio.run_coroutine_threadsafe(queue.put(f"⚠️ An unexpected error occurred: {str(e)}"), loop).result()
+        finally:
+            tokens.close()
+            asyncio.run_coroutine_threadsafe(queue.put(done), loop).result()
+
+    response = web.StreamResponse(headers={"Content-Type": "text/plain; charset=utf-8", "Cache-Control": "no-cache"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    producer = loop.run_in_executor(request.app[executor_key], pump)
+    try:
+        while (token := await queue.get()) is not done:
+            await response.write(token.encode())
+    finally:
+        cancelled.set()
+        # Unblock a producer waiting on a full queue
+        while not queue.empty():
+            queue.get_nowait()
+        await producer
+    await response.write_eof()
+    return response
+
+@web.middleware
+async def auth_middleware(request, handler):
+    """Bearer token check; the end user comes from X-Username"""
+    if request.path in ("/healthz", "/metrics"):
+        return await handler(request)
+    if API_TOKEN:
+        expected = f"Bearer {API_TOKEN}"
+        if not hmac.compare_digest(request.headers.get("Authorization", ""), expected):
+            return json_response({"error": "unauthorized"}, status=401)
+    request["username"] = request.headers.get("X-Username") or None
+    return await handler(request)
+
+def require_username(request):
+    if not request["username"]:
+        raise web.HTTPBadRequest(text=to_json({"error": "X-Username header is required"}), content_type="application/json")
+    return request["username"]
+
+def is_question(value):
+    return isinstance(value, str) and bool(value.strip())
+
+async def read_json(request, required="question"):
+    """Request body, checked to hold a non-blank "question" string or a "questions" list of strings"""
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        raise web.HTTPBadRequest(text=to_json({"error": "body must be JSON"}), content_type="application/json")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text=to_json({"error": "body must be a JSON object"}), content_type="application/json")
+    value = body.get(required)
+    if required == "questions":
+        valid = isinstance(value, list) and all(isinstance(question, str) for question in value) and any(map(is_question, value))
+        message = "questions must be a list of strings with at least one question"
+    else:
+        valid = is_question(value)
+        message = f"{required} must be a non-blank string"
+    if not valid:
+        raise web.HTTPBadRequest(text=to_json({"error": message}), content_type="application/json")
+    return body
+
+async def spool_upload(request):
+    """(file object, filename) for a multipart "file" field or a raw application/pdf body
+
+    The body is copied block by block into a SpooledTemporaryFile, so large
+    uploads go to disk rather than memory.
+    """
+    if request.content_type.startswith("multipart/"):
+        reader = await request.multipart()
+        part = await reader.next()
+        while part is not None and part.name != "file":
+            part = await reader.next()
+        if part is None:
+            raise web.HTTPBadRequest(text=to_json({"error": "multipart field 'file' is required"}), content_type="application/json")
+        filename, read_block = part.filename or "document.pdf", lambda: part.read_chunk(UPLOAD_BLOCK_SIZE)
+    else:
+        filename, read_block = request.query.get("filename", "document.pdf"), lambda: request.content.read(UPLOAD_BLOCK_SIZE)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_BYTES)
+    size = 0
+    while block := await read_block():
+        size += len(block)
+        if size > MAX_UPLOAD_BYTES:
+            spool.close()
+            raise web.HTTPRequestEntityTooLarge(max_size=MAX_UPLOAD_BYTES, actual_size=size)
+        spool.write(block)
+    if not size:
+        spool.close()
+        raise web.HTTPBadRequest(text=to_json({"error": "empty upload"}), content_type="application/json")
+    spool.seek(0)
+    return spool, filename
+
+async def healthz(request):
+    return json_response({"status": "ok"})
+
+async def metrics_text(request):
+    return web.Response(text=registry.render_prometheus(), content_type="text/plain", charset="utf-8")
+
+async def upload(request):
+    spool, filename = await spool_upload(request)
+    with spool:
+        status = await run_blocking(request, service.upload_pdf, spool, filename)
+    return json_response(status, status=202 if status["state"] != service.INDEXED else 200)
+
+async def ingest_status(request):
+    status = await run_blocking(request, service.ingest_status, request.match_info["pdf_hash"])
+    return json_response(status, status=404 if status["state"] is None else 200)
+
+async def reject_pending(request, pdf_hash):
+    """409 with the ingest status while any worker is still ingesting the PDF
+
+    Without it the request would find no saved index and build one itself,
+    repeating the scheduler's work on an API thread. PDFs that were never
+    ingested are still built on demand.
+    """
+    status = await run_blocking(request, service.ingest_status, pdf_hash)
+    if status["state"] in service.ACTIVE_STATES:
+        raise web.HTTPConflict(text=to_json(status), content_type="application/json")
+
+def ask_args(request, body):
+    """Positional and keyword arguments of service.ask from a request body"""
+    return (request["username"], body.get("pdf_hash"), body["question"]), {
+        "library": bool(body.get("library")),
+        "messages": parse_messages(body.get("messages")),
+        "extra_pdf_hashes": tuple(body.get("extra_pdf_hashes") or ())
+    }
+
+async def ask(request):
+    args, kwargs = ask_args(request, await read_json(request))
+    if args[1] and not kwargs["library"]:
+        await reject_pending(request, args[1])
+    return json_response(await run_blocking(request, service.ask, *args, **kwargs))
+
+async def ask_stream(request):
+    args, kwargs = ask_args(request, await read_json(request))
+    if args[1] and not kwargs["library"]:
+        await reject_pending(request, args[1])
+    return await stream_text(request, service.ask_stream(*args, **kwargs))
+
+async def ask_batch(request):
+    """Answers to a list of questions as newline-delimited JSON, one line per answer as it is ready"""
+    body = await read_json(request, required="questions")
+    questions = [question for question in body["questions"] if is_question(question)]
+    if body.get("pdf_hash") and not body.get("library"):
+        await reject_pending(request, body["pdf_hash"])
+    response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson", "Cache-Control": "no-cache"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    # The batch pipeline is async already, so it runs on the event loop itself
+    results = service.iter_ask_batch(
+        request["username"], body.get("pdf_hash"), questions,
+        library=bool(body.get("library")),
+        extra_pdf_hashes=tuple(body.get("extra_pdf_hashes") or ())
+    )
+    # Closing the generator on disconnect cancels the LLM calls still queued
+    async with aclosing(results):
+        async for result in results:
+            await response.write(f"{to_json(result)}\n".encode())
+    await response.write_eof()
+    return response
+
+async def summary(request):
+    await reject_pending(request, request.match_info["pdf_hash"])
+    result = await run_blocking(request, service.summarize, request["username"], request.match_info["pdf_hash"])
+    return json_response(result)
+
+async def summary_stream(request):
+    await reject_pending(request, request.match_info["pdf_hash"])
+    return await stream_text(request, service.summarize_stream(request["username"], request.match_info["pdf_hash"]))
+
+async def conversations(request):
+    username = require_username(request)
+    try:
+        cursor = parse_cursor(request.query.get("cursor"))
+    except ValueError:
+        raise web.HTTPBadRequest(text=to_json({"error": "invalid cursor"}), content_type="application/json")
+    rows, next_cursor = await run_blocking(request, service.conversations, username, cursor)
+    return json_response({"conversations": rows, "cursor": to_json(next_cursor) if next_cursor else None})
+
+async def conversation_messages(request):
+    username = require_username(request)
+    messages = await run_blocking(request, service.conversation_messages, username, request.match_info["pdf_hash"])
+    return json_response({"messages": messages})
+
+async def rename_conversation(request):
+    username = require_username(request)
+    body = await read_json(request, required="conversation_name")
+    changed = await run_blocking(request, service.rename_conversation, username, request.match_info["pdf_hash"], body["conversation_name"].strip())
+    return json_response({"changed": changed})
+
+async def on_startup(app):
+    app[executor_key] = ThreadPoolExecutor(max_workers=API_THREADS, thread_name_prefix="api")
+    loop = asyncio.get_running_loop()
+    # Load the embedding model and check MongoDB indexes before taking traffic
+    await loop.run_in_executor(app[executor_key], warm_up_embedding_engine)
+    await loop.run_in_executor(app[executor_key], ensure_indexes_once)
+
+async def on_cleanup(app):
+    app[executor_key].shutdown(wait=False, cancel_futures=True)
+
+def create_app():
+    """aiohttp application; also the gunicorn entry point
+
+    Each worker keeps its own vector and answer caches. PDFs, chat history
+    and ingest status live in MongoDB and indexes in INDEX_STORE_DIR, so
+    with that directory on shared storage workers scale out behind any
+    load balancer:
+
+        gunicorn api:create_app --worker-class aiohttp.GunicornWebWorker --workers 4 --bind 0.0.0.0:8000
+
+    Requests carry `Authorization: Bearer $API_TOKEN` and the end user in
+    `X-Username`.
+    """
+    app = web.Application(middlewares=[auth_middleware], client_max_size=MAX_UPLOAD_BYTES)
+    app.add_routes([
+        web.get("/healthz", healthz),
+        web.get("/metrics", metrics_text),
+        web.post("/pdfs", upload),
+        web.get("/pdfs/{pdf_hash}/status", ingest_status),
+        web.post("/pdfs/{pdf_hash}/summary", summary),
+        web.post("/pdfs/{pdf_hash}/summary/stream", summary_stream),
+        web.post("/ask", ask),
+        web.post("/ask/stream", ask_stream),
+        web.post("/ask/batch", ask_batch),
+        web.get("/conversations", conversations),
+        web.get("/conversations/{pdf_hash}/messages", conversation_messages),
+        web.patch("/conversations/{pdf_hash}", rename_conversation)
+    ])
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    return app
+
+def main():
+    if not API_TOKEN and API_HOST not in ("127.0.0.1", "localhost", "::1"):
+        raise SystemExit("API_TOKEN must be set to serve on a non-loopback address")
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(), host=API_HOST, port=API_PORT)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import os
+import json
+import datetime
+import requests
+from requests.adapters import HTTPAdapter
+from job_states import ACTIVE_STATES
+
+# Constants
+API_URL = os.getenv("API_URL", "").rstrip("/")  # the Streamlit app is a thin client of this API when set
+API_TOKEN = os.getenv("API_TOKEN", "")
+API_TIMEOUT = float(os.getenv("API_TIMEOUT", "120"))
+API_POOL_SIZE = 16
+
+def _parse_timestamp(value):
+    return datetime.datetime.fromisoformat(value) if isinstance(value, str) else value
+
+def _encode_timestamp(value):
+    return value.isoformat() if isinstance(value, datetime.datetime) else value
+
+def _with_timestamps(rows, field):
+    return [{**row, field: _parse_timestamp(row.get(field))} for row in rows]
+
+class ApiClient:
+    """Same calls as service.py, made over HTTP to the api.py server"""
+
+    def __init__(self, api_url=API_URL, token=API_TOKEN, timeout=API_TIMEOUT):
+        self.api_url = api_url
+        self.token = token
+        self.timeout = timeout
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=API_POOL_SIZE)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _headers(self, username=None):
+        headers = {}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        if username:
+            headers["X-Username"] = username
+        return headers
+
+    def _request(self, method, path, username=None, **kwargs):
+        response = self._session.request(
+            method, f"{self.api_url}{path}",
+            headers=self._headers(username),
+            timeout=self.timeout,
+            **kwargs
+        )
+        response.raise_for_status()
+        return response
+
+    def _stream(self, path, username=None, **kwargs):
+        """Yield the text of a chunked response as it arrives, or one "⚠️" message"""
+        try:
+            with self._request("POST", path, username, stream=True, **kwargs) as response:
+                response.encoding = "utf-8"
+                yield from response.iter_content(chunk_size=None, decode_unicode=True)
+        except requests.exceptions.RequestException as e:
+            yield f"⚠️ Error connecting to API: {str(e)}"
+
+    def upload_pdf(self, stream, filename):
+        """Stream an upload to the API; returns its ingest status"""
+        response = self._request("POST", "/pdfs", files={"file": (filename, stream, "application/pdf")})
+        return response.json()
+
+    def ingest_status(self, pdf_hash):
+        response = self._session.get(f"{self.api_url}/pdfs/{pdf_hash}/status", headers=self._headers(), timeout=self.timeout)
+        if response.status_code != 404:
+            response.raise_for_status()
+        return response.json()
+
+    def is_pending(self, pdf_hash):
+        return self.ingest_status(pdf_hash)["state"] in ACTIVE_STATES
+
+    def _ask_body(self, pdf_hash, question, library, messages, extra_pdf_hashes):
+        return {
+            "pdf_hash": pdf_hash,
+            "question": question,
+            "library": library,
+            "messages": None if messages is None else [
+                {**message, "timestamp": _encode_timestamp(message.get("timestamp"))} for message in messages
+            ],
+            "extra_pdf_hashes": list(extra_pdf_hashes)
+        }
+
+    def ask(self, username, pdf_hash, question, library=False, messages=None, extra_pdf_hashes=()):
+        body = self._ask_body(pdf_hash, question, library, messages, extra_pdf_hashes)
+        try:
+            return self._request("POST", "/ask", username, json=body).json()
+        except requests.exceptions.RequestException as e:
+            return {"answer": f"⚠️ Error connecting to API: {str(e)}", "cached": False}
+
+    def ask_stream(self, username, pdf_hash, question, library=False, messages=None, extra_pdf_hashes=()):
+        body = self._ask_body(pdf_hash, question, library, messages, extra_pdf_hashes)
+        return self._stream("/ask/stream", username, json=body)
+
+    def ask_batch(self, username, pdf_hash, questions, library=False, extra_pdf_hashes=(), on_answer=None):
+        """Results in question order; on_answer(result) is called as each line of the response arrives"""
+        body = {"pdf_hash": pdf_hash, "questions": list(questions), "library": library, "extra_pdf_hashes": list(extra_pdf_hashes)}
+        results = []
+        with self._request("POST", "/ask/batch", username, json=body, stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                result = json.loads(line)
+                results.append(result)
+                if on_answer:
+                    on_answer(result)
+        return sorted(results, key=lambda result: result["index"])
+
+    def summarize(self, username, pdf_hash):
+        return self._request("POST", f"/pdfs/{pdf_hash}/summary", username).json()
+
+    def summarize_stream(self, username, pdf_hash):
+        return self._stream(f"/pdfs/{pdf_hash}/summary/stream", username)
+
+    def conversations(self, username, cursor=None):
+        """(rows, next_cursor); the cursor is opaque, pass it back as is"""
+        params = {"cursor": cursor} if cursor else {}
+        body = self._request("GET", "/conversations", username, params=params).json()
+        return _with_timestamps(body["conversations"], "latest"), body["cursor"]
+
+    def conversation_messages(self, username, pdf_hash):
+        body = self._request("GET", f"/conversations/{pdf_hash}/messages", username).json()
+        return _with_timestamps(body["messages"], "timestamp")
+
+    def rename_conversation(self, username, pdf_hash, name):
+        body = self._request("PATCH", f"/conversations/{pdf_hash}", username, json={"conversation_name": name}).json()
+        return body["changed"]
+
+# Shared by every Streamlit session in this process
+default_client = ApiClient()
+
+def upload_pdf(stream, filename):
+    return default_client.upload_pdf(stream, filename)
+
+def ingest_status(pdf_hash):
+    return default_client.ingest_status(pdf_hash)
+
+def is_pending(pdf_hash):
+    return default_client.is_pending(pdf_hash)
+
+def ask(username, pdf_hash, question, library=False, messages=None, extra_pdf_hashes=()):
+    return default_client.ask(username, pdf_hash, question, library, messages, extra_pdf_hashes)
+
+def ask_stream(username, pdf_hash, question, library=False, messages=None, extra_pdf_hashes=()):
+    return default_client.ask_stream(username, pdf_hash, question, library, messages, extra_pdf_hashes)
+
+def ask_batch(username, pdf_hash, questions, library=False, extra_pdf_hashes=(), on_answer=None):
+    return default_client.ask_batch(username, pdf_hash, questions, library, extra_pdf_hashes, on_answer)
+
+def summarize(username, pdf_hash):
+    return default_client.summarize(username, pdf_hash)
+
+def summarize_stream(username, pdf_hash):
+    return default_client.summarize_stream(username, pdf_hash)
+
+def conversations(username, cursor=None):
+    return default_client.conversations(username, cursor)
+
+def conversation_messages(username, pdf_hash):
+    return default_client.conversation_messages(username, pdf_hash)
+
+def export_messages(username, pdf_hash):
+    return default_client.conversation_messages(username, pdf_hash)
+
+def rename_conversation(username, pdf_hash, name):
+    return default_client.rename_conversation(username, pdf_hash, name)
+
+def conversations_version(username):
+    """Always 0: history is written by the API, so the app clears its cached list after each of its own writes"""
+    return 0
@@ -6,6 +6,17 @@ st.set_page_config(page_title="PDF Inquiry and Response", page_icon="📄", layo
 # Now import the other modules
 from login import login_page
 from chat import chat_page
+from metrics import start_exporters_once
+from api_client import API_URL
+
+# Load the shared embedding model, check MongoDB indexes and start metrics exporters once per server process
+# A thin client of the API (API_URL set) leaves the model and the indexes to the API
+if not API_URL:
+    from embedding_engine import warm_up_embedding_engine
+    from schema import ensure_indexes_once
+    warm_up_embedding_engine()
+    ensure_indexes_once()
+start_exporters_once()
 
 # App logic
 if "authenticated" not in st.session_state:
@@ -0,0 +1,118 @@
+import os
+import time
+import asyncio
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from embedding_engine import get_embedding_engine
+from answer_cache import answer_cache, normalize_question
+from answering import NO_LIBRARY_MESSAGE, NO_PDF_MESSAGE, retrieval_k, context_from, complete_answer
+from retrieval import retrieve_many
+from index import save_chat_history
+from llm_client import LLM_MAX_CONCURRENCY
+from metrics import registry
+
+# Constants
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+BATCH_LLM_CONCURRENCY = int(os.getenv("BATCH_LLM_CONCURRENCY", str(LLM_MAX_CONCURRENCY)))
+BATCH_RETRIEVAL_SIZE = int(os.getenv("BATCH_RETRIEVAL_SIZE", "16"))  # questions embedded and searched together
+
+# LLM calls block a thread each; shared by every Streamlit session and API request in this process
+_llm_executor = ThreadPoolExecutor(max_workers=BATCH_LLM_CONCURRENCY, thread_name_prefix="batch-llm")
+
+def _embed_chunk(questions):
+    """(cache key vectors, question vectors) for a chunk of questions from one embedding call"""
+    keys = [normalize_question(question) for question in questions]
+    with registry.timer("retrieval_seconds", stage="embed_batch"):
+        vectors = get_embedding_engine().embed_documents(keys + list(questions))
+    return vectors[:len(questions)], vectors[len(questions):]
+
+def _retrieve_chunk(vs, scope, questions, library):
+    """Cache lookups, then one FAISS search for the misses
+
+    Returns (answers, contexts, key vectors): answers holds the cached
+    answer or None, contexts the prompt context for each miss.
+    """
+    key_vectors, question_vectors = _embed_chunk(questions)
+    answers = [
+        answer_cache.lookup(scope, question, embedding) if scope else None
+        for question, embedding in zip(questions, key_vectors)
+    ]
+    misses = [i for i, answer in enumerate(answers) if answer is None]
+    results = retrieve_many(vs, [questions[i] for i in misses], retrieval_k(library), [question_vectors[i] for i in misses])
+    contexts = {i: context_from(docs, library) for i, docs in zip(misses, results)}
+    return answers, contexts, key_vectors
+
+async def iter_batch_answers(vs, questions, scope=None, library=False, concurrency=BATCH_LLM_CONCURRENCY):
+    """Answer independent questions about one store, yielding dicts as each answer is ready
+
+    Questions are embedded and searched BATCH_RETRIEVAL_SIZE at a time and
+    their LLM calls start as soon as their chunk is retrieved, at most
+    `concurrency` at once. New answers go to the answer cache in the
+    background. Results are {"index", "question", "answer", "cached"},
+    in completion order.
+    """
+    if vs is None:
+        message = NO_LIBRARY_MESSAGE if library else NO_PDF_MESSAGE
+        for index, question in enumerate(questions):
+            yield {"index": index, "question": question, "answer": message, "cached": False}
+        return
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    ready = asyncio.Queue()
+    persisting = []
+
+    async def answer(index, context, key_vector):
+        async with semaphore:
+            start = time.perf_counter()
+            text = await loop.run_in_executor(_llm_executor, complete_answer, questions[index], context, "", library)
+            elapsed = time.perf_counter() - start
+        registry.observe("answer_seconds", elapsed, source="batch")
+        await ready.put({"index": index, "question": questions[index], "answer": text, "cached": False})
+        if scope and not text.startswith("⚠️"):
+            persisting.append(loop.run_in_executor(
+                None, lambda: answer_cache.store(scope, questions[index], text, elapsed, key_vector)
+            ))
+
+    async def produce():
+        llm_calls = []
+        try:
+            for start in range(0, len(questions), BATCH_RETRIEVAL_SIZE):
+                chunk = questions[start:start + BATCH_RETRIEVAL_SIZE]
+                answers, contexts, key_vectors = await loop.run_in_executor(None, _retrieve_chunk, vs, scope, chunk, library)
+                for offset, cached in enumerate(answers):
+                    if cached is not None:
+                        await ready.put({"index": start + offset, "question": chunk[offset], "answer": cached, "cached": True})
+                    else:
+                        llm_calls.append(asyncio.ensure_future(answer(start + offset, contexts[offset], key_vectors[offset])))
+            await asyncio.gather(*llm_calls)
+        except Exception as e:
+            for call in llm_calls:
+                call.cancel()
+            # Hand the failure to the consumer instead of leaving it waiting
+            await ready.put(e)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        for _ in questions:
+            result = await ready.get()
+            if isinstance(result, Exception):
+                raise result
+            yield result
+        await producer
+    finally:
+        producer.cancel()
+        # Cache writes overlap the LLM calls; wait for the last ones so none is lost when the loop closes
+        await asyncio.gather(*persisting, return_exceptions=True)
+
+def record_batch(username, pdf_hash, results):
+    """History rows for a finished batch, in question order
+
+    Rows are stamped a millisecond apart; MongoDB keeps milliseconds only,
+    so rows written in one loop would otherwise tie and lose their order.
+    """
+    if username and pdf_hash:
+        start = datetime.datetime.now()
+        for offset, result in enumerate(results):
+            timestamp = start + datetime.timedelta(milliseconds=offset)
+            save_chat_history(username, result["question"], result["answer"], pdf_hash, timestamp)
@@ -0,0 +1,205 @@
+"""Requests per second of one api.py worker against local stand-ins for MongoDB and Mistral
+
+Starts the API in a subprocess (mongomock unless --mongo-uri, hashing
+embeddings, bench.mock_mistral as the LLM), uploads a synthetic PDF
+through POST /pdfs, waits for ingestion, then drives each endpoint from
+an aiohttp client at the given concurrency levels:
+
+    healthz       GET /healthz, the floor set by the server itself
+    conversations GET /conversations, one MongoDB aggregation
+    ask_cached    POST /ask with a question already answered
+    ask           POST /ask with a new question each time (retrieval + LLM)
+    ask_stream    POST /ask/stream, also reporting time to first byte
+
+Questions are sent with an empty conversation, as a first question would
+be; follow-ups add one LLM call for the rewrite.
+
+With several workers behind a balancer, throughput scales by the worker
+count until MongoDB or the LLM rate limit is the bottleneck; mongomock is
+in-process, so this bench always runs one worker.
+
+Run from the repository root:
+    python -m bench.bench_api --pages 50 --requests 200 --concurrency 1 8 32
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import itertools
+import tempfile
+import subprocess
+import aiohttp
+from bench.synthetic import make_pdf
+from bench.bench_e2e import percentiles
+
+USERNAME = "bench_user"
+
+# Question numbers keep counting across runs so a new question is never in the answer cache
+question_numbers = itertools.count()
+
+def serve(args):
+    """Child process: the API on args.port with the bench stand-ins installed"""
+    from bench import env
+    workdir = tempfile.mkdtemp(prefix="bench-api-")
+    os.environ["INDEX_STORE_DIR"] = os.path.join(workdir, "index_store")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    os.environ["API_PORT"] = str(args.port)
+    # Hashing embeddings make every "What does ERR-n mean" a near-duplicate; keep only exact answer cache hits
+    os.environ["ANSWER_CACHE_SIMILARITY"] = "1.01"
+    env.setup(args.mongo_uri)
+
+    import embedding_engine
+    from bench.bench_e2e import HashEmbeddingEngine
+    embedding_engine._engine = HashEmbeddingEngine()
+    from bench.mock_mistral import MockMistralServer
+    import llm_client
+    import api
+
+    with MockMistralServer(args.first_token_delay, args.token_delay, args.tokens) as server:
+        llm_client.default_client.api_url = server.url
+        api.main()
+
+async def wait_until_up(session, url, timeout=60):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            async with session.get(f"{url}/healthz") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientConnectionError:
+            pass
+        if time.monotonic() > deadline:
+            raise RuntimeError("API server did not start")
+        await asyncio.sleep(0.2)
+
+async def upload(session, url, pages):
+    """Upload a synthetic PDF and wait for it to be indexed; returns (pdf hash, seconds)"""
+    start = time.perf_counter()
+    form = aiohttp.FormData()
+    form.add_field("file", make_pdf(pages), filename=f"bench-{pages}p.pdf", content_type="application/pdf")
+    async with session.post(f"{url}/pdfs", data=form) as response:
+        response.raise_for_status()
+        status = await response.json()
+    while status["state"] not in ("indexed", "failed"):
+        await asyncio.sleep(0.1)
+        async with session.get(f"{url}/pdfs/{status['pdf_hash']}/status") as response:
+            status = await response.json()
+    if status["state"] == "failed":
+        raise RuntimeError(status["error"])
+    return status["pdf_hash"], time.perf_counter() - start
+
+def make_request(name, url, pdf_hash, pages):
+    """Coroutine function sending one request of a scenario; returns time to first byte or None"""
+
+    async def healthz(session):
+        async with session.get(f"{url}/healthz") as response:
+            await response.read()
+
+    async def conversations(session):
+        async with session.get(f"{url}/conversations") as response:
+            response.raise_for_status()
+            await response.read()
+
+    async def ask(session, question):
+        async with session.post(f"{url}/ask", json={"pdf_hash": pdf_hash, "question": question, "messages": []}) as response:
+            response.raise_for_status()
+            body = await response.json()
+            if body["answer"].startswith("⚠️"):
+                raise RuntimeError(body["answer"])
+
+    async def ask_stream(session):
+        n = next(question_numbers)
+        start = time.perf_counter()
+        ttfb = None
+        question = f"Stream error ERR-{n % pages:05d}, variant {n}"
+        async with session.post(f"{url}/ask/stream", json={"pdf_hash": pdf_hash, "question": question, "messages": []}) as response:
+            response.raise_for_status()
+            async for _ in response.content.iter_any():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - start
+        return ttfb
+
+    return {
+        "healthz": healthz,
+        "conversations": conversations,
+        "ask_cached": lambda session: ask(session, "What does reference code ERR-00001 refer to?"),
+        "ask": lambda session: ask(session, (lambda n: f"What does ERR-{n % pages:05d} mean, variant {n}?")(next(question_numbers))),
+        "ask_stream": ask_stream
+    }[name]
+
+async def run_scenario(session, request, total, concurrency):
+    latencies, ttfbs, errors = [], [], []
+
+    async def worker(count):
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                ttfb = await request(session)
+            except (aiohttp.ClientError, RuntimeError) as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+            if ttfb is not None:
+                ttfbs.append(ttfb)
+
+    shares = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(count) for count in shares))
+    wall = time.perf_counter() - start
+    return {"rps": round(len(latencies) / wall, 1), "errors": len(errors), "latency": percentiles(latencies), "ttfb": percentiles(ttfbs), "first_error": errors[0] if errors else None}
+
+async def drive(args, url):
+    connector = aiohttp.TCPConnector(limit=max(args.concurrency))
+    headers = {"X-Username": USERNAME}
+    async with aiohttp.ClientSession(connector=connector, headers=headers, timeout=aiohttp.ClientTimeout(total=300)) as session:
+        await wait_until_up(session, url)
+        pdf_hash, seconds = await upload(session, url, args.pages)
+        print(f"uploaded and indexed a {args.pages}-page PDF through the API in {seconds:.2f}s")
+        print(f"mock LLM first token {args.first_token_delay}s + {args.tokens} x {args.token_delay}s")
+
+        # Warm the answer cache and the conversation list
+        await make_request("ask_cached", url, pdf_hash, args.pages)(session)
+
+        print(f"{'scenario':<14} {'conc':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttfb p50':>9} {'errors':>7}")
+        for name in args.scenarios:
+            for concurrency in args.concurrency:
+                total = args.requests if name in ("healthz", "conversations", "ask_cached") else args.llm_requests
+                row = await run_scenario(session, make_request(name, url, pdf_hash, args.pages), total, concurrency)
+                latency = row["latency"]
+                print(f"{name:<14} {concurrency:>5} {row['rps']:>8.1f} {latency.get('p50_ms', 0):>8.1f} {latency.get('p95_ms', 0):>8.1f} "
+                      f"{latency.get('p99_ms', 0):>8.1f} {row['ttfb'].get('p50_ms', 0):>9.1f} {row['errors']:>7}")
+                if row["first_error"]:
+                    print(f"  first error: {row['first_error']}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=500, help="requests per run for the scenarios without an LLM call")
+    parser.add_argument("--llm-requests", type=int, default=100, help="requests per run for ask and ask_stream")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--scenarios", nargs="+", default=["healthz", "conversations", "ask_cached", "ask", "ask_stream"])
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--mongo-uri", default=None, help="real mongod to use instead of mongomock")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+
+    log_path = os.path.join(tempfile.gettempdir(), "bench_api_server.log")
+    with open(log_path, "w") as log:
+        child = subprocess.Popen([sys.executable, "-m", "bench.bench_api", "--serve", *sys.argv[1:]], stdout=log, stderr=subprocess.STDOUT)
+        try:
+            asyncio.run(drive(args, f"http://127.0.0.1:{args.port}"))
+        finally:
+            child.terminate()
+            child.wait()
+            print(f"server log: {log_path}")
+
+if __name__ == "__main__":
+    main()
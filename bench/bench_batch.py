@@ -0,0 +1,87 @@
+"""Serial asks vs the async batch pipeline for "ask these N questions about this document"
+
+Ingests a synthetic PDF, then answers the same N questions twice with
+fresh answer caches: once through service.ask one after another, as
+repeated chat turns would, and once through service.ask_batch. MongoDB is
+mongomock unless --mongo-uri, the LLM is bench.mock_mistral and
+embeddings are a hashing stand-in. The LLM-bound floor is
+ceil(N / concurrency) times one call's latency.
+
+Run from the repository root:
+    python -m bench.bench_batch --pages 100 --questions 50
+"""
+import os
+import math
+import time
+import argparse
+import tempfile
+from io import BytesIO
+from bench import env
+from bench.synthetic import make_pdf
+from bench.mock_mistral import MockMistralServer
+from bench.bench_e2e import HashEmbeddingEngine, make_questions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--mongo-uri", default=None, help="real mongod to use instead of mongomock")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-batch-")
+    os.environ["INDEX_STORE_DIR"] = os.path.join(workdir, "index_store")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    # Hashing embeddings make every "ERR-n" question a near-duplicate; keep only exact answer cache hits
+    os.environ["ANSWER_CACHE_SIMILARITY"] = "1.01"
+    backend = env.setup(args.mongo_uri)
+
+    import embedding_engine
+    embedding_engine._engine = HashEmbeddingEngine()
+    import index
+    import service
+    import llm_client
+    from answer_cache import answer_cache
+    from batch_answers import BATCH_LLM_CONCURRENCY
+
+    pdf_hash = index.save_pdf_stream(BytesIO(make_pdf(args.pages)), "bench.pdf")
+    service.get_vector_store(pdf_hash)
+    questions = make_questions(args.pages, args.questions)
+
+    def reset_caches():
+        answer_cache.collection.delete_many({})
+        answer_cache._lru.clear()
+        answer_cache._semantic.clear()
+
+    with MockMistralServer(args.first_token_delay, args.token_delay, args.tokens) as server:
+        llm_client.default_client.api_url = server.url
+        call_seconds = args.first_token_delay + args.tokens * args.token_delay
+        floor = math.ceil(len(questions) / BATCH_LLM_CONCURRENCY) * call_seconds
+        print(f"backend: {backend}, {len(questions)} questions on a {args.pages}-page PDF, "
+              f"mock LLM {call_seconds:.2f}s per answer, concurrency {BATCH_LLM_CONCURRENCY}")
+
+        reset_caches()
+        start = time.perf_counter()
+        serial = [service.ask("bench_serial", pdf_hash, question, messages=[])["answer"] for question in questions]
+        serial_s = time.perf_counter() - start
+
+        reset_caches()
+        first = []
+        start = time.perf_counter()
+        results = service.ask_batch("bench_batch", pdf_hash, questions, on_answer=lambda result: first.append(time.perf_counter() - start))
+        batch_s = time.perf_counter() - start
+
+        assert [result["answer"] for result in results] == serial, "batch answers differ from serial ones"
+        print(f"{'mode':<8} {'wall s':>8} {'q/s':>8} {'first answer s':>15}")
+        print(f"{'serial':<8} {serial_s:>8.2f} {len(questions) / serial_s:>8.2f} {serial_s / len(questions):>15.2f}")
+        print(f"{'batch':<8} {batch_s:>8.2f} {len(questions) / batch_s:>8.2f} {first[0]:>15.2f}")
+        print(f"LLM-bound floor {floor:.2f}s; batch is {serial_s / batch_s:.1f}x faster than serial, {batch_s / floor:.2f}x the floor")
+
+    index.history_writer.flush()
+    rows = index.get_conversation_messages("bench_batch", pdf_hash)
+    assert [row["question"] for row in reversed(rows)] == questions, "history not in question order"
+
+if __name__ == "__main__":
+    main()
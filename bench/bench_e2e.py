@@ -0,0 +1,273 @@
+"""End-to-end ingest and Q&A benchmark against local stand-ins for MongoDB and Mistral
+
+Drives the app's own code: save_pdf_stream, load_and_process_pdf and
+create_vector_store for ingest; list_conversations, answering.stream_answer
+and save_chat_history for each question, as one Streamlit rerun would.
+MongoDB is mongomock unless --mongo-uri is given, the LLM is
+bench.mock_mistral with the given latency, and embeddings are a hashing
+stand-in unless --real-embeddings.
+
+Reports ingest throughput, question latency percentiles (total and
+time-to-first-token), the process memory high-water mark and throughput
+as concurrent sessions grow. --json writes every number plus the app's
+own per-stage metrics; --compare prints the change against an earlier
+--json file, e.g. from the previous commit.
+
+Run from the repository root:
+    python -m bench.bench_e2e --pages 20 200 --questions 100 --sessions 1 4 16 --json e2e.json
+    python -m bench.bench_e2e --compare e2e.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from bench import env
+from bench.synthetic import make_pdf
+from bench.mock_mistral import MockMistralServer
+from bench.bench_retrieval import TrigramHashEmbeddings
+
+class HashEmbeddingEngine(TrigramHashEmbeddings):
+    """TrigramHashEmbeddings with the EmbeddingEngine attributes the app reads"""
+
+    model_name = "bench-trigram-hash"
+    batch_size = 32
+
+    def embed_documents(self, texts, batch_size=None):
+        return super().embed_documents(texts)
+
+    def warm_up(self):
+        pass
+
+def percentiles(samples):
+    """p50/p95/p99 and max in milliseconds"""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {"p50_ms": round(pick(0.5), 2), "p95_ms": round(pick(0.95), 2), "p99_ms": round(pick(0.99), 2), "max_ms": round(ordered[-1] * 1000, 2)}
+
+def max_rss_mb():
+    """Process memory high-water mark"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1e6 if sys.platform == "darwin" else 1e3), 1)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def ingest(index, pages, seed):
+    """Store, parse and index one synthetic PDF; returns (vector store, pdf hash, result row)"""
+    pdf_bytes = make_pdf(pages, seed=seed)
+    filename = f"bench-{pages}p-{seed}.pdf"
+    timings = {}
+
+    start = time.perf_counter()
+    pdf_hash = index.save_pdf_stream(BytesIO(pdf_bytes), filename)
+    timings["store_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with index.open_pdf_stream(pdf_hash) as stream:
+        docs = index.load_and_process_pdf(stream, filename)
+    timings["parse_split_s"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vs = index.create_vector_store(docs)
+    timings["embed_index_s"] = time.perf_counter() - start
+
+    total = sum(timings.values())
+    row = {
+        "pages": pages,
+        "pdf_mb": round(len(pdf_bytes) / 1e6, 2),
+        "chunks": len(docs),
+        **{name: round(seconds, 3) for name, seconds in timings.items()},
+        "total_s": round(total, 3),
+        "pages_per_s": round(pages / total, 1),
+        "chunks_per_s": round(len(docs) / total, 1),
+        "max_rss_mb": max_rss_mb()
+    }
+    return vs, pdf_hash, row
+
+def make_questions(pages, count):
+    templates = ["What does reference code ERR-{:05d} refer to?", "Which section mentions ERR-{:05d}?", "Explain error ERR-{:05d}"]
+    return [templates[i % len(templates)].format((i * 7919) % pages) for i in range(count)]
+
+def ask(index, answering, vs, pdf_hash, username, question):
+    """One question as chat.py handles it: sidebar query, streamed answer, history write
+
+    Returns (total seconds, time to first token or None).
+    """
+    start = time.perf_counter()
+    index.list_conversations(username)
+    ttft = None
+    tokens = []
+    for token in answering.stream_answer(vs, question):
+        if ttft is None:
+            ttft = time.perf_counter() - start
+        tokens.append(token)
+    answer = "".join(tokens)
+    if answer.startswith("⚠️"):
+        raise RuntimeError(answer)
+    index.save_chat_history(username, question, answer, pdf_hash)
+    return time.perf_counter() - start, ttft
+
+def run_sessions(index, answering, vs, pdf_hash, questions, sessions):
+    """Each session asks its share of the questions in turn; sessions run concurrently"""
+    totals, ttfts = [], []
+    lock = threading.Lock()
+
+    def session(number):
+        username = f"bench_user{number}"
+        for question in questions[number::sessions]:
+            total, ttft = ask(index, answering, vs, pdf_hash, username, question)
+            with lock:
+                totals.append(total)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sessions) as pool:
+        list(pool.map(session, range(sessions)))
+    wall = time.perf_counter() - start
+    return {
+        "sessions": sessions,
+        "questions": len(totals),
+        "wall_s": round(wall, 3),
+        "questions_per_s": round(len(totals) / wall, 2),
+        "total": percentiles(totals),
+        "ttft": percentiles(ttfts),
+        "max_rss_mb": max_rss_mb()
+    }
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="bench-e2e-")
+    # The app reads these at import time
+    os.environ["INDEX_STORE_DIR"] = os.path.join(workdir, "index_store")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(workdir, "embedding_cache.sqlite3")
+    backend = env.setup(args.mongo_uri)
+    from metrics import registry
+    # Before index is imported, so its timed() decorators apply
+    registry.enabled = True
+
+    import embedding_engine
+    if args.real_embeddings:
+        embedding_engine.warm_up_embedding_engine()
+    else:
+        embedding_engine._engine = HashEmbeddingEngine()
+    import index
+    import answering
+    import llm_client
+
+    for collection in (index.history_collection, index.conversation_meta_collection, index.db["fs.files"], index.db["fs.chunks"]):
+        collection.delete_many({})
+
+    results = {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {
+            "backend": backend,
+            "embeddings": type(embedding_engine.get_embedding_engine()).__name__,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            **{key: value for key, value in vars(args).items() if key not in ("json", "compare")}
+        },
+        "ingest": [],
+        "sessions": []
+    }
+
+    print(f"backend: {backend}, embeddings: {results['config']['embeddings']}")
+    print(f"{'pages':>6} {'chunks':>7} {'store s':>8} {'parse s':>8} {'embed+idx s':>12} {'pages/s':>8} {'chunks/s':>9} {'rss MB':>7}")
+    stores = []
+    for seed, pages in enumerate(args.pages):
+        vs, pdf_hash, row = ingest(index, pages, seed)
+        stores.append((vs, pdf_hash, pages))
+        results["ingest"].append(row)
+        print(f"{pages:>6} {row['chunks']:>7} {row['store_s']:>8.3f} {row['parse_split_s']:>8.3f} {row['embed_index_s']:>12.3f} "
+              f"{row['pages_per_s']:>8.1f} {row['chunks_per_s']:>9.1f} {row['max_rss_mb']:>7.1f}")
+
+    # Questions go to the largest PDF, the one whose retrieval costs most
+    vs, pdf_hash, pages = stores[-1]
+    questions = make_questions(pages, args.questions)
+    with MockMistralServer(args.first_token_delay, args.token_delay, args.tokens) as server:
+        llm_client.default_client.api_url = server.url
+        print(f"\n{args.questions} questions on the {pages}-page PDF, mock LLM first token {args.first_token_delay}s + {args.tokens} x {args.token_delay}s")
+        print(f"{'sessions':>8} {'q/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'ttft p50':>9} {'ttft p95':>9} {'rss MB':>7}")
+        for sessions in args.sessions:
+            row = run_sessions(index, answering, vs, pdf_hash, questions, sessions)
+            results["sessions"].append(row)
+            total, ttft = row["total"], row["ttft"]
+            print(f"{sessions:>8} {row['questions_per_s']:>7.2f} {total['p50_ms']:>8.1f} {total['p95_ms']:>8.1f} {total['p99_ms']:>8.1f} "
+                  f"{ttft.get('p50_ms', 0):>9.1f} {ttft.get('p95_ms', 0):>9.1f} {row['max_rss_mb']:>7.1f}")
+
+    index.history_writer.flush()
+    histograms, counters = registry.snapshot()
+    results["stages"] = histograms
+    results["counters"] = counters
+    results["max_rss_mb"] = max_rss_mb()
+    return results
+
+def flatten(results):
+    """Comparable numbers keyed by a stable path, e.g. sessions.4.total.p95_ms"""
+    flat = {}
+    for row in results.get("ingest", []):
+        for key in ("pages_per_s", "chunks_per_s", "total_s", "max_rss_mb"):
+            flat[f"ingest.{row['pages']}p.{key}"] = row[key]
+    for row in results.get("sessions", []):
+        flat[f"sessions.{row['sessions']}.questions_per_s"] = row["questions_per_s"]
+        for part in ("total", "ttft"):
+            for key, value in row[part].items():
+                flat[f"sessions.{row['sessions']}.{part}.{key}"] = value
+    for row in results.get("stages", []):
+        flat[f"stage.{row['metric']}[{row['labels']}].p50_ms"] = row["p50_ms"]
+    flat["max_rss_mb"] = results.get("max_rss_mb")
+    return flat
+
+def compare(baseline, current):
+    """Print each number next to its baseline with the relative change"""
+    before, after = flatten(baseline), flatten(current)
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'} ({baseline.get('created_at', '?')})")
+    print(f"{'metric':<56} {'before':>10} {'after':>10} {'change':>8}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        if old is None or new is None:
+            continue
+        change = f"{100 * (new - old) / old:+.1f}%" if old else ""
+        print(f"{key:<56} {old:>10} {new:>10} {change:>8}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[20, 200], help="synthetic PDF sizes to ingest")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--first-token-delay", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--mongo-uri", default=None, help="real mongod to use instead of mongomock")
+    parser.add_argument("--real-embeddings", action="store_true", help="use the sentence-transformers model")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="earlier --json results to compare against")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, default=str)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
+    else:
+        print(f"\nmax RSS {results['max_rss_mb']} MB; slowest stages by p50:")
+        for row in sorted(results["stages"], key=lambda row: row["p50_ms"] or 0, reverse=True)[:8]:
+            print(f"  {row['metric']:<18} {row['labels']:<28} p50 {row['p50_ms']:>8} ms  p95 {row['p95_ms']:>8} ms  n={row['count']}")
+
+if __name__ == "__main__":
+    main()
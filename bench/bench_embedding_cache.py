@@ -0,0 +1,46 @@
+"""Ingest time of a near-duplicate PDF revision with and without the chunk embedding cache
+
+Run from the repository root:
+    python -m bench.bench_embedding_cache --pages 200 --changed 5
+"""
+import argparse
+import os
+import tempfile
+import time
+from embedding_cache import CachedEmbeddings, SqliteVectorStore
+from embedding_engine import get_embedding_engine, warm_up_embedding_engine
+from pdf_ingest import split_pdf_serial
+from bench.synthetic import make_pdf
+
+def embed_all(embedder, texts, batch_size):
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embedder.embed_documents(texts[i:i + batch_size])
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--changed", type=int, default=5)
+    args = parser.parse_args()
+
+    original = [doc.page_content for doc in split_pdf_serial(make_pdf(args.pages))]
+    changed_pages = set(range(0, args.pages, max(1, args.pages // max(1, args.changed))))
+    revision = [doc.page_content for doc in split_pdf_serial(make_pdf(args.pages, changed_pages=changed_pages))]
+
+    engine = warm_up_embedding_engine()
+    with tempfile.TemporaryDirectory() as tmp:
+        cached = CachedEmbeddings(SqliteVectorStore(os.path.join(tmp, "cache.sqlite3")))
+
+        uncached_time = embed_all(get_embedding_engine(), revision, engine.batch_size)
+        first_time = embed_all(cached, original, engine.batch_size)
+        hits_before, misses_before = cached.hits, cached.misses
+        revision_time = embed_all(cached, revision, engine.batch_size)
+
+    print(f"chunks: {len(revision)}, pages changed: {len(changed_pages)} of {args.pages}")
+    print(f"revision without cache:     {uncached_time:7.2f} s")
+    print(f"original with empty cache:  {first_time:7.2f} s")
+    print(f"revision with warm cache:   {revision_time:7.2f} s  ({cached.hits - hits_before} hits, {cached.misses - misses_before} re-embedded)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Startup and per-upload latency of the shared embedding engine
+
+Run from the repository root:
+    python -m bench.bench_embeddings --uploads 5 --chunks 200
+"""
+import argparse
+import time
+from langchain.docstore.document import Document
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.vectorstores import FAISS
+from embedding_engine import EMBEDDING_MODEL_NAME, EmbeddingEngine
+
+def synthetic_chunks(count):
+    """Build chunk-sized documents similar to RecursiveCharacterTextSplitter output"""
+    return [
+        Document(
+            page_content=f"Section {i}. The operator shall inspect valve V-{i:04d} before restarting the pump. " * 5,
+            metadata={"source": "synthetic.pdf", "page": i // 4}
+        )
+        for i in range(count)
+    ]
+
+def bench_per_call_model(docs, uploads):
+    """Previous behaviour: a fresh HuggingFaceEmbeddings for every upload"""
+    timings = []
+    for _ in range(uploads):
+        start = time.perf_counter()
+        FAISS.from_documents(docs, HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_NAME))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def bench_shared_engine(docs, uploads, batch_size):
+    """Shared engine: one model load, then only the encode cost per upload"""
+    start = time.perf_counter()
+    engine = EmbeddingEngine(batch_size=batch_size)
+    engine.warm_up()
+    startup = time.perf_counter() - start
+
+    timings = []
+    for _ in range(uploads):
+        start = time.perf_counter()
+        FAISS.from_documents(docs, engine)
+        timings.append(time.perf_counter() - start)
+    return startup, timings
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--uploads", type=int, default=5)
+    parser.add_argument("--chunks", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    docs = synthetic_chunks(args.chunks)
+
+    startup, shared = bench_shared_engine(docs, args.uploads, args.batch_size)
+    per_call = bench_per_call_model(docs, args.uploads)
+
+    print(f"chunks per upload:        {args.chunks}")
+    print(f"shared engine startup:    {startup * 1000:.1f} ms")
+    print(f"shared engine per upload: {sum(shared) / len(shared) * 1000:.1f} ms (mean of {args.uploads})")
+    print(f"fresh model per upload:   {sum(per_call) / len(per_call) * 1000:.1f} ms (mean of {args.uploads})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Chat export time and peak Python memory at growing conversation sizes
+
+Compares the previous in-memory PDF export (prefix re-measuring word wrap,
+whole list of messages, BytesIO) with chat_export streaming the same
+conversation from MongoDB in PDF, Markdown and JSON.
+
+Run from the repository root:
+    python -m bench.bench_export --messages 100 1000 10000
+"""
+import argparse
+import datetime
+import random
+import time
+import tracemalloc
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from bench import env
+from bench.synthetic import WORDS
+
+USERNAME = "export_user"
+PDF_HASH = "export_pdf"
+
+def load_conversation(index, messages, seed=0):
+    """Insert messages/2 Q&A rows; answers range from one line to a few paragraphs"""
+    rng = random.Random(seed)
+    index.history_collection.delete_many({})
+    start = datetime.datetime(2024, 1, 1)
+    rows = []
+    for i in range(messages // 2):
+        answer_words = rng.choice([20, 80, 300, 1200])
+        rows.append({
+            "username": USERNAME,
+            "pdf_hash": PDF_HASH,
+            "question": " ".join(rng.choice(WORDS) for _ in range(15)) + "?",
+            "answer": " ".join(rng.choice(WORDS) for _ in range(answer_words)),
+            "timestamp": start + datetime.timedelta(seconds=i)
+        })
+    index.history_collection.insert_many(rows)
+
+def legacy_pdf(messages):
+    """The previous export_chat_to_pdf layout loop, without Streamlit"""
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+    margin = 72
+    line_height = 14
+    c.setFont("Helvetica-Bold", 16)
+    c.drawString(margin, height - margin, "Chat Conversation Export")
+    y_position = height - margin - 30
+    for msg in messages:
+        if y_position < margin + 100:
+            c.showPage()
+            y_position = height - margin
+        c.setFont("Helvetica-Bold", 12)
+        c.drawString(margin, y_position, msg["role"])
+        y_position -= line_height
+        text = c.beginText(margin, y_position)
+        text.setFont("Helvetica", 12)
+        text.setLeading(line_height)
+        lines, current_line = [], ""
+        for word in msg["content"].split():
+            test_line = f"{current_line} {word}".strip()
+            if c.stringWidth(test_line, "Helvetica", 12) < (width - 2 * margin):
+                current_line = test_line
+            else:
+                lines.append(current_line)
+                current_line = word
+        if current_line:
+            lines.append(current_line)
+        for line in lines:
+            text.textLine(line)
+        c.drawText(text)
+        y_position -= (line_height * len(lines) + 20)
+    c.showPage()
+    c.save()
+    buffer.seek(0)
+    return buffer
+
+def measure(fn):
+    """(seconds, peak traced MB, output MB); timed separately since tracemalloc slows everything down"""
+    start = time.perf_counter()
+    fn().close()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    out = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = out.seek(0, 2)
+    out.close()
+    return elapsed, peak / 1e6, size / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--skip-legacy-above", type=int, default=10000, help="the old exporter is slow; skip it past this size")
+    args = parser.parse_args()
+
+    env.setup()
+    import index
+    from chat_export import export_conversation
+
+    print(f"{'messages':>9} {'exporter':<16} {'seconds':>8} {'peak MB':>8} {'file MB':>8}")
+    for messages in args.messages:
+        load_conversation(index, messages)
+        runs = {}
+        if messages <= args.skip_legacy_above:
+            runs["legacy pdf"] = lambda: legacy_pdf(list(index.iter_conversation_messages(USERNAME, PDF_HASH)))
+        for fmt in ("pdf", "markdown", "json"):
+            runs[f"streaming {fmt}"] = lambda fmt=fmt: export_conversation(index.iter_conversation_messages(USERNAME, PDF_HASH), fmt)
+        for name, run in runs.items():
+            elapsed, peak, size = measure(run)
+            print(f"{messages:>9} {name:<16} {elapsed:>8.2f} {peak:>8.1f} {size:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Upload and re-read of a PDF through GridFS: whole-file buffers vs streaming
+
+The buffered path is the previous one: read the upload into bytes, hash it,
+hash it again before fs.put, then read the whole file back to parse it. The
+streaming path goes through save_pdf_stream and parses from the GridOut,
+spooled to a temp file block by block. Each is measured for a new PDF and
+for a duplicate upload.
+
+With mongomock the stored chunks themselves are Python objects and count
+toward the traced peak for both paths; use --mongo-uri for the app's own
+overhead alone.
+
+Run from the repository root:
+    python -m bench.bench_gridfs_upload --pages 100 1000 [--mongo-uri mongodb://localhost:27017]
+"""
+import argparse
+import time
+import tracemalloc
+from io import BytesIO
+from bench import env
+from bench.synthetic import make_pdf
+
+def buffered_upload(index, upload):
+    pdf_bytes = upload.read()
+    pdf_hash = index.hash_pdf_bytes(pdf_bytes)
+    if not index.fs.find_one({"metadata.hash": index.hash_pdf_bytes(pdf_bytes)}):
+        index.fs.put(pdf_bytes, filename="bench.pdf", metadata={"hash": pdf_hash})
+    return pdf_hash
+
+def buffered_parse(index, pdf_hash):
+    pdf_bytes = index.fs.find_one({"metadata.hash": pdf_hash}).read()
+    return index.load_and_process_pdf(pdf_bytes, "bench.pdf")
+
+def streaming_upload(index, upload):
+    return index.save_pdf_stream(upload, "bench.pdf")
+
+def streaming_parse(index, pdf_hash):
+    with index.open_pdf_stream(pdf_hash) as stream:
+        return index.load_and_process_pdf(stream, "bench.pdf")
+
+def measure(fn, *args):
+    """(result, seconds, peak traced MB above the starting point)"""
+    tracemalloc.start()
+    base, _ = tracemalloc.get_traced_memory()
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, (peak - base) / 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--mongo-uri", default=None, help="real mongod to use instead of mongomock")
+    args = parser.parse_args()
+
+    backend = env.setup(args.mongo_uri)
+    import index
+    paths = {
+        "buffered": (buffered_upload, buffered_parse),
+        "streaming": (streaming_upload, streaming_parse)
+    }
+
+    print(f"backend: {backend}")
+    print(f"{'pages':>6} {'PDF MB':>7} {'path':<10} {'stage':<10} {'seconds':>8} {'peak MB':>8}")
+    for pages in args.pages:
+        pdf_bytes = make_pdf(pages)
+        chunks = None
+        for name, (upload, parse) in paths.items():
+            index.db["fs.files"].delete_many({})
+            index.db["fs.chunks"].delete_many({})
+            rows = []
+            pdf_hash, elapsed, peak = measure(upload, index, BytesIO(pdf_bytes))
+            rows.append(("upload", elapsed, peak))
+            _, elapsed, peak = measure(upload, index, BytesIO(pdf_bytes))
+            rows.append(("duplicate", elapsed, peak))
+            docs, elapsed, peak = measure(parse, index, pdf_hash)
+            rows.append(("parse", elapsed, peak))
+
+            if pdf_hash != index.hash_pdf_bytes(pdf_bytes) or index.db["fs.files"].count_documents({}) != 1:
+                raise SystemExit(f"{name} path stored the wrong file set at {pages} pages")
+            output = [(d.page_content, d.metadata) for d in docs]
+            if chunks is not None and output != chunks:
+                raise SystemExit(f"{name} path parsed different chunks at {pages} pages")
+            chunks = output
+            for stage, elapsed, peak in rows:
+                print(f"{pages:>6} {len(pdf_bytes) / 1e6:>7.2f} {name:<10} {stage:<10} {elapsed:>8.3f} {peak:>8.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Recall, query latency and memory of each FAISS index mode against the flat baseline
+
+Vectors are clustered and unit-normalised like sentence embeddings; pass
+--real to embed synthetic PDF chunks with the actual model instead.
+
+Run from the repository root:
+    python -m bench.bench_index_modes --sizes 10000 100000 --k 4
+"""
+import argparse
+import statistics
+import time
+import faiss
+import numpy as np
+from index_factory import apply_search_params, build_index, factory_string, index_memory_bytes
+
+MODES = ["flat", "sq", "hnsw", "ivfsq", "ivfpq"]
+
+def clustered_vectors(n, dimension, clusters=200, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+def real_vectors(n):
+    from embedding_engine import warm_up_embedding_engine
+    from pdf_ingest import split_pdf_serial
+    from bench.synthetic import make_pdf
+    engine = warm_up_embedding_engine()
+    texts = []
+    pages = 50
+    while len(texts) < n:
+        texts = [doc.page_content for doc in split_pdf_serial(make_pdf(pages))]
+        pages *= 2
+    return np.asarray(engine.embed_documents(texts[:n]), dtype=np.float32)
+
+def search_latencies(index, queries, k):
+    timings = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        timings.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    return timings, results
+
+def recall_at_k(results, truth):
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, truth))
+    return hits / sum(len(expected) for expected in truth)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[16])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64])
+    parser.add_argument("--real", action="store_true", help="embed synthetic PDF chunks with the real model")
+    args = parser.parse_args()
+
+    print(f"{'chunks':>8} {'index':<18} {'knob':>10} {'build s':>8} {'MB':>8} {'file MB':>8} {'p50 ms':>7} {'recall@' + str(args.k):>9}")
+    for size in args.sizes:
+        data = real_vectors(size + args.queries) if args.real else clustered_vectors(size + args.queries, args.dimension)
+        vectors, queries = data[:size], data[size:]
+
+        baseline = None
+        for mode in ["flat"] + [m for m in args.modes if m != "flat"]:
+            start = time.perf_counter()
+            index = build_index(vectors, mode)
+            build_time = time.perf_counter() - start
+            file_mb = len(faiss.serialize_index(index)) / 1e6
+
+            if mode in ("ivfsq", "ivfpq"):
+                settings = [("nprobe", value, {"nprobe": value}) for value in args.nprobe]
+            elif mode == "hnsw":
+                settings = [("ef", value, {"ef_search": value}) for value in args.ef_search]
+            else:
+                settings = [("", "", {})]
+
+            for knob, value, params in settings:
+                apply_search_params(index, **params)
+                timings, results = search_latencies(index, queries, args.k)
+                if baseline is None:
+                    baseline = results
+                print(
+                    f"{size:>8} {factory_string(size, vectors.shape[1], mode):<18} {knob + str(value):>10} "
+                    f"{build_time:>8.2f} {index_memory_bytes(index) / 1e6:>8.1f} {file_mb:>8.1f} "
+                    f"{statistics.median(timings):>7.3f} {recall_at_k(results, baseline):>9.3f}"
+                )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""Serial vs process-pool PDF extraction and chunking
+
+The pool is started and warmed before timing, as it is in a running
+app after the first large upload.
+
+Run from the repository root:
+    python -m bench.bench_ingest --pages 10 100 1000 --workers 4
+"""
+import os
+import argparse
+import time
+from bench.synthetic import make_pdf
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+
+    # The shared pool is sized from the environment when pdf_ingest is imported
+    os.environ["PDF_PARSE_WORKERS"] = str(args.workers)
+    from pdf_ingest import split_pdf_parallel, split_pdf_serial
+    _, startup_time = timed(split_pdf_parallel, make_pdf(args.workers), pages_per_task=1)
+    print(f"pool of {args.workers} workers started in {startup_time:.2f}s")
+
+    print(f"{'pages':>6} {'chunks':>7} {'serial s':>9} {'parallel s':>11} {'speedup':>8}")
+    for pages in args.pages:
+        pdf_bytes = make_pdf(pages)
+        serial, serial_time = timed(split_pdf_serial, pdf_bytes)
+        parallel, parallel_time = timed(split_pdf_parallel, pdf_bytes, pages_per_task=args.pages_per_task)
+        if [(d.page_content, d.metadata) for d in serial] != [(d.page_content, d.metadata) for d in parallel]:
+            raise SystemExit(f"parallel output differs from serial output at {pages} pages")
+        print(f"{pages:>6} {len(serial):>7} {serial_time:>9.2f} {parallel_time:>11.2f} {serial_time / parallel_time:>7.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Library-wide query latency: one merged index vs fanning out over per-PDF indexes
+
+Builds synthetic per-PDF stores (clustered unit vectors, page metadata),
+merges them the way library.get_library_store does and times top-k
+searches. Query embedding is not included unless --real is given.
+
+Run from the repository root:
+    python -m bench.bench_library --documents 10 100 500 --chunks 200
+"""
+import argparse
+import heapq
+import statistics
+import time
+from langchain.embeddings.base import Embeddings
+from bench import env
+from bench.bench_index_modes import clustered_vectors
+
+class VectorOnlyEmbeddings(Embeddings):
+    """Placeholder for stores that are only searched by vector"""
+
+    def embed_documents(self, texts):
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        raise NotImplementedError
+
+def make_stores(documents, chunks, dimension, queries):
+    """Per-PDF stores plus query vectors drawn from the same distribution"""
+    from index_factory import build_vector_store
+    vectors = clustered_vectors(documents * chunks + queries, dimension)
+    stores = {}
+    for d in range(documents):
+        rows = vectors[d * chunks:(d + 1) * chunks]
+        stores[f"pdf{d:04d}"] = build_vector_store(
+            [f"document {d} chunk {c}" for c in range(chunks)],
+            rows,
+            [{"source": f"doc{d}.pdf", "page": c // 4} for c in range(chunks)],
+            VectorOnlyEmbeddings(),
+            mode="flat"
+        )
+    return stores, vectors[documents * chunks:].tolist()
+
+def fan_out_search(stores, vector, k):
+    results = []
+    for vs in stores.values():
+        results.extend(vs.similarity_search_with_score_by_vector(vector, k=k))
+    return heapq.nsmallest(k, results, key=lambda pair: pair[1])
+
+def recall(merged, stores, queries, k):
+    """Share of the exact fan-out top-k that the merged (possibly approximate) index also returns"""
+    hits = 0
+    for query in queries:
+        expected = {doc.page_content for doc, _ in fan_out_search(stores, query, k)}
+        hits += len(expected & {doc.page_content for doc, _ in merged.similarity_search_with_score_by_vector(query, k=k)})
+    return hits / (k * len(queries))
+
+def p50_ms(fn, queries):
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--chunks", type=int, default=200, help="chunks per PDF")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--real", action="store_true", help="also time embedding the query with the real model")
+    args = parser.parse_args()
+
+    env.setup()
+    from library import cite, merge_vector_stores
+
+    embed_ms = 0.0
+    if args.real:
+        from embedding_engine import warm_up_embedding_engine
+        engine = warm_up_embedding_engine()
+        embed_ms = p50_ms(engine.embed_query, [f"what does section {i} say" for i in range(args.queries)])
+        print(f"query embedding p50: {embed_ms:.2f} ms (added to the totals below)")
+
+    print(f"{'PDFs':>6} {'chunks':>8} {'index':>14} {'merge s':>8} {'merged ms':>10} {'fan-out ms':>11} {'recall':>7}")
+    for documents in args.documents:
+        stores, queries = make_stores(documents, args.chunks, args.dimension, args.queries)
+        filenames = {pdf_hash: vs.docstore.search(vs.index_to_docstore_id[0]).metadata["source"] for pdf_hash, vs in stores.items()}
+
+        start = time.perf_counter()
+        merged = merge_vector_stores(stores, filenames, VectorOnlyEmbeddings())
+        merge_time = time.perf_counter() - start
+
+        best = merged.similarity_search_with_score_by_vector(queries[0], k=1)[0][0]
+
+        merged_ms = p50_ms(lambda q: merged.similarity_search_with_score_by_vector(q, k=args.k), queries) + embed_ms
+        fan_out_ms = p50_ms(lambda q: fan_out_search(stores, q, args.k), queries) + embed_ms
+        print(
+            f"{documents:>6} {merged.index.ntotal:>8} {type(merged.index).__name__:>14} {merge_time:>8.2f} "
+            f"{merged_ms:>10.2f} {fan_out_ms:>11.2f} {recall(merged, stores, queries, args.k):>7.3f}   e.g. [{cite(best)}]"
+        )
+
+if __name__ == "__main__":
+    main()
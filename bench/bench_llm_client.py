@@ -0,0 +1,103 @@
+"""Pooled LLM client vs per-call requests.post against a local stub server
+
+Checks connection reuse, Retry-After handling and the concurrency cap,
+then reports per-call latency for both approaches.
+
+Run from the repository root:
+    python -m bench.bench_llm_client --requests 50 --threads 16 --max-concurrency 4
+"""
+import argparse
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from llm_client import LLMClient
+from bench.mock_mistral import MockMistralServer
+
+MESSAGES = [{"role": "user", "content": "ping"}]
+
+def fresh_post(url):
+    """Previous behaviour: a new connection for every question"""
+    response = requests.post(url, json={"messages": MESSAGES}, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+def run_fresh(url, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        fresh_post(url)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def run_pooled(client, count):
+    timings = []
+    for _ in range(count):
+        start = time.perf_counter()
+        client.chat_completion(MESSAGES, temperature=0.3, timeout=30)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def check_retry_after():
+    """Two 429s with Retry-After: 1 must delay the call by roughly two seconds, even above backoff_max"""
+    with MockMistralServer(first_token_delay=0, token_delay=0, fail_first=2, retry_after=1) as server:
+        client = LLMClient(api_url=server.url, max_retries=3, backoff_max=0.25)
+        start = time.perf_counter()
+        client.chat_completion(MESSAGES, temperature=0.3, timeout=30)
+        elapsed = time.perf_counter() - start
+        assert server.requests == 3, server.requests
+        assert elapsed >= 2.0, elapsed
+        print(f"retry-after:      3 attempts, {elapsed:.2f} s, retries recorded {client.metrics.snapshot()['retries']}")
+
+def check_concurrency(threads, max_concurrency):
+    """No more than max_concurrency requests may be in flight at once"""
+    in_flight = 0
+    peak = 0
+    lock = threading.Lock()
+
+    with MockMistralServer(first_token_delay=0.1, token_delay=0) as server:
+        client = LLMClient(api_url=server.url, max_concurrency=max_concurrency)
+        original_post = client._post
+
+        def counting_post(*args, **kwargs):
+            nonlocal in_flight, peak
+            with lock:
+                in_flight += 1
+                peak = max(peak, in_flight)
+            try:
+                return original_post(*args, **kwargs)
+            finally:
+                with lock:
+                    in_flight -= 1
+
+        client._post = counting_post
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            list(pool.map(lambda _: client.chat_completion(MESSAGES, 0.3, 30), range(threads * 2)))
+        assert peak <= max_concurrency, peak
+        print(f"concurrency cap:  peak {peak} in flight with limit {max_concurrency} and {threads} threads")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--max-concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    with MockMistralServer(first_token_delay=0, token_delay=0) as server:
+        fresh = run_fresh(server.url, args.requests)
+        fresh_connections = len(server.connections)
+
+    with MockMistralServer(first_token_delay=0, token_delay=0) as server:
+        client = LLMClient(api_url=server.url)
+        pooled = run_pooled(client, args.requests)
+        pooled_connections = len(server.connections)
+
+    print(f"fresh requests:   p50 {statistics.median(fresh) * 1000:6.2f} ms over {fresh_connections} connections")
+    print(f"pooled client:    p50 {statistics.median(pooled) * 1000:6.2f} ms over {pooled_connections} connections")
+    print(f"client metrics:   {client.metrics.snapshot()}")
+    check_retry_after()
+    check_concurrency(args.threads, args.max_concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Per-query latency and index usage for the MongoDB access paths in index.py
+
+Loads synthetic chat history at each size, runs schema.ensure_indexes and
+times the sidebar/conversation/login/GridFS queries. Against a real mongod
+it also checks every query plan is an index scan (mongomock has no planner).
+
+Run from the repository root against a throwaway mongod:
+    python -m bench.bench_mongo_queries --mongo-uri mongodb://localhost:27017 --rows 10000 100000 1000000
+or in-process:
+    python -m bench.bench_mongo_queries --rows 10000 100000
+"""
+import argparse
+import datetime
+import json
+import statistics
+import time
+from bench import env
+
+HEAVY_USER = "heavy_user"
+
+def load_rows(index, rows, conversations_per_user=20):
+    """Insert `rows` history entries; a quarter belong to one heavy user"""
+    for collection in (index.history_collection, index.conversation_meta_collection, index.users_collection, index.db["fs.files"]):
+        collection.delete_many({})
+
+    users = max(10, rows // 500)
+    start = datetime.datetime(2024, 1, 1)
+    batch = []
+    for i in range(rows):
+        username = HEAVY_USER if i % 4 == 0 else f"user{i % users}"
+        batch.append({
+            "username": username,
+            "question": f"question {i}",
+            "answer": f"answer {i}",
+            "pdf_hash": f"pdf{(i // 7) % conversations_per_user:04d}",
+            "timestamp": start + datetime.timedelta(seconds=i)
+        })
+        if len(batch) == 10000:
+            index.history_collection.insert_many(batch)
+            batch = []
+    if batch:
+        index.history_collection.insert_many(batch)
+
+    index.users_collection.insert_many([{"username": f"user{u}", "password": b""} for u in range(users)] + [{"username": HEAVY_USER, "password": b""}])
+    index.conversation_meta_collection.insert_many([
+        {"username": HEAVY_USER, "pdf_hash": f"pdf{c:04d}", "conversation_name": f"Conversation {c}"}
+        for c in range(conversations_per_user)
+    ])
+    index.db["fs.files"].insert_many([{"filename": f"{c}.pdf", "metadata": {"hash": f"pdf{c:04d}"}} for c in range(conversations_per_user)])
+
+def queries(index):
+    """name -> (callable, cursor factory for explain or None)"""
+    history = index.history_collection
+    return {
+        "get_chat_history": (
+            lambda: index.get_chat_history(HEAVY_USER),
+            lambda: history.find({"username": HEAVY_USER}).sort("timestamp", -1)
+        ),
+        "list_conversations": (
+            lambda: index.list_conversations(HEAVY_USER),
+            None
+        ),
+        "get_conversation_messages": (
+            lambda: index.get_conversation_messages(HEAVY_USER, "pdf0003"),
+            lambda: history.find({"username": HEAVY_USER, "pdf_hash": "pdf0003"}).sort("timestamp", -1)
+        ),
+        "get_conversation_meta": (
+            lambda: index.get_conversation_meta(HEAVY_USER, "pdf0003"),
+            lambda: index.conversation_meta_collection.find({"username": HEAVY_USER, "pdf_hash": "pdf0003"})
+        ),
+        "users.find_one": (
+            lambda: index.users_collection.find_one({"username": HEAVY_USER}),
+            lambda: index.users_collection.find({"username": HEAVY_USER})
+        ),
+        "gridfs.find_one": (
+            lambda: index.fs.find_one({"metadata.hash": "pdf0003"}),
+            lambda: index.db["fs.files"].find({"metadata.hash": "pdf0003"})
+        )
+    }
+
+def check_plan(name, cursor_factory, aggregate_pipeline=None, index=None):
+    """Fail if the winning plan contains a collection scan"""
+    if aggregate_pipeline is not None:
+        plan = index.db.command("aggregate", index.history_collection.name, pipeline=aggregate_pipeline, explain=True)
+    else:
+        plan = cursor_factory().explain()
+    text = json.dumps(plan, default=str)
+    if "COLLSCAN" in text or "IXSCAN" not in text:
+        raise SystemExit(f"{name}: query plan is not an index scan")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mongo-uri", default=None, help="real mongod; defaults to in-process mongomock")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    backend = env.setup(args.mongo_uri)
+    import index
+    from schema import ensure_indexes
+
+    print(f"backend: {backend}")
+    for rows in args.rows:
+        load_rows(index, rows)
+        ensure_indexes(index.db)
+        ensure_indexes(index.db)  # must be idempotent
+
+        print(f"\n{rows} history rows")
+        for name, (run, cursor_factory) in queries(index).items():
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            plan = "-"
+            if backend == "mongod":
+                if cursor_factory is not None:
+                    check_plan(name, cursor_factory)
+                else:
+                    check_plan(name, None, [{"$match": {"username": HEAVY_USER, "pdf_hash": {"$ne": None}}}], index)
+                plan = "IXSCAN"
+            print(f"  {name:<28} p50 {statistics.median(timings):8.2f} ms   max {max(timings):8.2f} ms   plan {plan}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Offline retrieval quality and latency: dense vs BM25 vs hybrid (RRF) vs hybrid + rerank
+
+The fixture set is a few synthetic PDFs whose pages each carry an exact
+identifier ("Reference code ERR-00042"). Each question asks about one
+identifier and is answered by chunks from that page. Without --real the
+dense side uses character-trigram hashing, which like MiniLM blurs
+near-identical identifiers; --real uses the actual embedding model.
+
+Run from the repository root:
+    python -m bench.bench_retrieval --pdfs 3 --pages 60 --questions 100
+    python -m bench.bench_retrieval --real --rerank-model cross-encoder/ms-marco-MiniLM-L-6-v2
+"""
+import argparse
+import hashlib
+import random
+import statistics
+import time
+import numpy as np
+from langchain.embeddings.base import Embeddings
+from index_factory import build_vector_store
+from pdf_ingest import split_pdf_serial
+from retrieval import get_sparse_index, chunk_at, retrieve
+from bench.synthetic import make_pdf
+
+class TrigramHashEmbeddings(Embeddings):
+    """Deterministic stand-in for a sentence embedding model"""
+
+    def __init__(self, dimension=384):
+        self.dimension = dimension
+
+    def _embed(self, text):
+        vector = np.zeros(self.dimension, dtype=np.float32)
+        text = f"  {text.lower()}  "
+        for i in range(len(text) - 2):
+            digest = hashlib.blake2b(text[i:i + 3].encode(), digest_size=4).digest()
+            vector[int.from_bytes(digest, "little") % self.dimension] += 1.0
+        return (vector / (np.linalg.norm(vector) or 1.0)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def build_fixtures(pdfs, pages, embedding):
+    stores = []
+    for seed in range(pdfs):
+        docs = split_pdf_serial(make_pdf(pages, seed=seed), f"fixture{seed}.pdf")
+        texts = [doc.page_content for doc in docs]
+        stores.append(build_vector_store(texts, embedding.embed_documents(texts), [doc.metadata for doc in docs], embedding))
+    return stores
+
+def make_questions(pdfs, pages, count, seed=0):
+    rng = random.Random(seed)
+    templates = [
+        "What does reference code ERR-{code:05d} refer to?",
+        "Which section mentions ERR-{code:05d}?",
+        "Explain error ERR-{code:05d}"
+    ]
+    return [
+        (rng.randrange(pdfs), page, rng.choice(templates).format(code=page))
+        for page in (rng.randrange(pages) for _ in range(count))
+    ]
+
+def bm25_only(vs, query, k):
+    return [chunk_at(vs, position) for position, _ in get_sparse_index(vs).search(query, k)]
+
+def evaluate(search, stores, questions, k):
+    """hit@k, MRR@k and p50 latency for one retrieval strategy"""
+    hits, reciprocal_ranks, timings = 0, 0.0, []
+    for pdf, page, question in questions:
+        start = time.perf_counter()
+        docs = search(stores[pdf], question, k)
+        timings.append((time.perf_counter() - start) * 1000)
+        ranks = [rank for rank, doc in enumerate(docs, 1) if doc.metadata.get("page") == page]
+        if ranks:
+            hits += 1
+            reciprocal_ranks += 1.0 / ranks[0]
+    return hits / len(questions), reciprocal_ranks / len(questions), statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pdfs", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=60)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--real", action="store_true", help="use the real embedding model for the dense side")
+    parser.add_argument("--rerank-model", default="", help="local cross-encoder to evaluate as a final stage")
+    args = parser.parse_args()
+
+    if args.real:
+        from embedding_engine import warm_up_embedding_engine
+        embedding = warm_up_embedding_engine()
+    else:
+        embedding = TrigramHashEmbeddings()
+    stores = build_fixtures(args.pdfs, args.pages, embedding)
+    questions = make_questions(args.pdfs, args.pages, args.questions)
+
+    strategies = {
+        "dense": lambda vs, q, k: retrieve(vs, q, k, hybrid=False, rerank_model=""),
+        "bm25": bm25_only,
+        "hybrid (RRF)": lambda vs, q, k: retrieve(vs, q, k, hybrid=True, rerank_model="")
+    }
+    if args.rerank_model:
+        strategies["hybrid + rerank"] = lambda vs, q, k: retrieve(vs, q, k, hybrid=True, rerank_model=args.rerank_model)
+
+    chunks = sum(vs.index.ntotal for vs in stores)
+    print(f"{args.pdfs} PDFs, {chunks} chunks, {len(questions)} questions, dense: {type(embedding).__name__}")
+    print(f"{'strategy':<16} {'hit@' + str(args.k):>7} {'MRR':>6} {'p50 ms':>7}")
+    for name, search in strategies.items():
+        hit_rate, mrr, p50 = evaluate(search, stores, questions, args.k)
+        print(f"{name:<16} {hit_rate:>7.3f} {mrr:>6.3f} {p50:>7.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Time-to-first-token of streaming vs blocking completions against a mock server
+
+Run from the repository root:
+    python -m bench.bench_streaming --requests 10 --first-token-delay 0.3 --token-delay 0.02
+"""
+import argparse
+import statistics
+import time
+import llm_client
+from bench.mock_mistral import MockMistralServer
+
+MESSAGES = [{"role": "user", "content": "What is the torque for bolt B-12?"}]
+
+def measure_blocking():
+    start = time.perf_counter()
+    llm_client.chat_completion(MESSAGES, temperature=0.3, timeout=30)
+    elapsed = time.perf_counter() - start
+    # Nothing can be shown before the whole body arrives
+    return elapsed, elapsed
+
+def measure_streaming():
+    start = time.perf_counter()
+    first = None
+    for _ in llm_client.stream_chat_completion(MESSAGES, temperature=0.3, timeout=30):
+        if first is None:
+            first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+def report(name, samples):
+    ttft = [s[0] * 1000 for s in samples]
+    total = [s[1] * 1000 for s in samples]
+    print(f"{name:<10} ttft p50 {statistics.median(ttft):7.1f} ms   total p50 {statistics.median(total):7.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--first-token-delay", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--tokens", type=int, default=50)
+    args = parser.parse_args()
+
+    with MockMistralServer(args.first_token_delay, args.token_delay, args.tokens) as server:
+        llm_client.default_client.api_url = server.url
+        report("blocking", [measure_blocking() for _ in range(args.requests)])
+        report("streaming", [measure_streaming() for _ in range(args.requests)])
+
+if __name__ == "__main__":
+    main()
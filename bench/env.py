@@ -0,0 +1,56 @@
+"""Point the app modules at a benchmark MongoDB before they are imported
+
+database.py connects at import time, so call setup() before importing it
+or anything that imports it, such as index.
+"""
+import os
+import sys
+
+def setup(mongo_uri=None):
+    """Use a real mongod at mongo_uri, or an in-process mongomock when None"""
+    if "database" in sys.modules:
+        raise RuntimeError("bench.env.setup() must run before database is imported")
+    os.environ.setdefault("MISTRAL_API_KEY", "bench")
+    if mongo_uri:
+        os.environ["MONGO_URI"] = mongo_uri
+        return "mongod"
+
+    import mongomock
+    import mongomock.gridfs
+    import pymongo
+    mongomock.gridfs.enable_gridfs_integration()
+    _enable_lookup_pipelines()
+    pymongo.MongoClient = mongomock.MongoClient
+    os.environ["MONGO_URI"] = "mongodb://mongomock"
+    return "mongomock"
+
+def _bind(value, variables):
+    """Pipeline with "$$name" references replaced by literal values"""
+    if isinstance(value, dict):
+        return {key: _bind(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_bind(item, variables) for item in value]
+    if isinstance(value, str) and value[2:] in variables and value.startswith("$$"):
+        return {"$literal": variables[value[2:]]}
+    return value
+
+def _enable_lookup_pipelines():
+    """Teach mongomock the let/pipeline form of $lookup, which it does not implement"""
+    from mongomock import aggregate, helpers
+    lookup = aggregate._PIPELINE_HANDLERS["$lookup"]
+
+    def lookup_pipeline(in_collection, database, options):
+        if "pipeline" not in options:
+            return lookup(in_collection, database, options)
+        foreign_collection = database.get_collection(options["from"])
+        for doc in in_collection:
+            variables = {}
+            for name, path in options.get("let", {}).items():
+                try:
+                    variables[name] = helpers.get_value_by_dot(doc, path[1:])
+                except KeyError:
+                    variables[name] = None
+            doc[options["as"]] = list(foreign_collection.aggregate(_bind(options["pipeline"], variables)))
+        return in_collection
+
+    aggregate._PIPELINE_HANDLERS["$lookup"] = lookup_pipeline
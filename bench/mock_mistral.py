@@ -0,0 +1,105 @@
+"""Local stand-in for the Mistral chat-completions endpoint
+
+Serves both blocking JSON and SSE streaming responses with configurable
+time-to-first-token and per-token delay, so client latency can be
+measured without network access or an API key.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class MockMistralServer:
+    """Threaded HTTP server answering POST /v1/chat/completions"""
+
+    def __init__(self, first_token_delay=0.3, token_delay=0.02, tokens=50, fail_first=0, fail_status=429, retry_after=None):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.retry_after = retry_after
+        self.requests = 0
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body go out in separate writes; avoid delayed-ACK stalls on keep-alive
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    attempt = server.requests
+                    server.connections.add(self.client_address)
+
+                if attempt <= server.fail_first:
+                    payload = b'{"error": "rate limited"}'
+                    self.send_response(server.fail_status)
+                    if server.retry_after is not None:
+                        self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                    return
+
+                # Non-ASCII text sent unescaped, as the real API does, so decoding bugs show up
+                words = [f"tokén{i} " for i in range(server.tokens)]
+                time.sleep(server.first_token_delay)
+                if body.get("stream"):
+                    self._stream(words)
+                else:
+                    time.sleep(server.token_delay * len(words))
+                    payload = json.dumps({
+                        "choices": [{"message": {"role": "assistant", "content": "".join(words)}}],
+                        "usage": {"prompt_tokens": 0, "completion_tokens": len(words)}
+                    }, ensure_ascii=False).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+            def _stream(self, words):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i, word in enumerate(words):
+                    if i:
+                        time.sleep(server.token_delay)
+                    event = {"choices": [{"delta": {"content": word}}]}
+                    self._chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+
+            def _chunk(self, data):
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
@@ -0,0 +1,39 @@
+"""Synthetic PDFs of controlled size for benchmarks"""
+import random
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+
+WORDS = (
+    "pump valve pressure inspect operator manual section clause warranty maintenance "
+    "replace filter torque bolt sensor calibrate error code reset safety procedure "
+    "install housing gasket seal flow rate temperature limit shutdown restart"
+).split()
+
+def page_lines(page, rng, lines_per_page):
+    """Pseudo-text for one page, with an exact-match token per page"""
+    lines = [f"Section {page + 1}. Reference code ERR-{page:05d}."]
+    for _ in range(lines_per_page - 1):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(12)).capitalize() + ".")
+    return lines
+
+def make_pdf(pages, lines_per_page=40, seed=0, changed_pages=()):
+    """Build a PDF with the given number of text pages and return its bytes
+
+    Each page's text depends only on (seed, page), so a revision with
+    `changed_pages` differs from the original on exactly those pages.
+    """
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+    for page in range(pages):
+        rng = random.Random(f"{seed}:{page}:{'rev' if page in changed_pages else ''}")
+        text = c.beginText(72, height - 72)
+        text.setFont("Helvetica", 10)
+        text.setLeading(14)
+        for line in page_lines(page, rng, lines_per_page):
+            text.textLine(line)
+        c.drawText(text)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
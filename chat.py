@@ -1,28 +1,31 @@
 import streamlit as st
 import requests
 import os
+import time
 import datetime
-from io import BytesIO
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from index import (
-    load_and_process_pdf_from_bytes,
-    create_vector_store,
-    save_chat_history,
-    get_chat_history,
-    save_pdf_to_gridfs,
-    load_pdf_from_gridfs,
-    hash_pdf_bytes,
-    get_conversation_meta,
-    update_conversation_name
-)
+import re
+from job_states import INDEXED, FAILED
+from chat_export import EXPORT_FORMATS, export_conversation
+from metrics import METRICS_ADMINS, registry
+from api_client import API_URL
+
+# Q&A runs in the api.py service when API_URL is set, so a thin client never loads the pipeline
+if API_URL:
+    import api_client as backend
+else:
+    import service as backend
 
 # Constants
-MISTRAL_MODEL = "mistral-small"
+INGEST_POLL_SECONDS = 1.5
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+STREAM_RENDER_INTERVAL = 0.05
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
-# Validate API key
-if not MISTRAL_API_KEY:
+# "1.", "2)", "-", "*" and "•" list markers in front of pasted questions
+LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*•])\s*")
+
+# Validate API key; a thin client leaves the LLM calls to the API
+if not MISTRAL_API_KEY and not API_URL:
     st.error("MISTRAL_API_KEY is not set in environment variables.")
     st.stop()
 
@@ -58,141 +61,118 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def export_chat_to_pdf():
-    """Export current conversation to a downloadable PDF"""
+def export_messages():
+    """Messages to export: the stored conversation streamed from MongoDB, or this session's messages"""
+    if "username" in st.session_state and st.session_state.get("pdf_hash"):
+        return backend.export_messages(st.session_state["username"], st.session_state["pdf_hash"])
+    return sorted(st.session_state.messages, key=lambda msg: msg.get("timestamp") or datetime.datetime.min)
+
+def export_chat(fmt="pdf"):
+    """Export current conversation to a downloadable PDF, Markdown or JSON file"""
     if not st.session_state.messages:
         st.warning("No conversation to export")
         return
     
-    buffer = BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-    margin = 72
-    line_height = 14
-    
-    # PDF styling
-    c.setFont("Helvetica-Bold", 16)
-    c.drawString(margin, height - margin, "Chat Conversation Export")
-    c.setFont("Helvetica", 12)
-    
-    y_position = height - margin - 30
-    
-    for msg in st.session_state.messages:
-        if y_position < margin + 100:
-            c.showPage()
-            y_position = height - margin
-            c.setFont("Helvetica", 12)
-        
-        role = "User" if msg["role"] == "user" else "Assistant"
-        timestamp = msg.get("timestamp", datetime.datetime.now())
-        time_str = timestamp.strftime("%Y-%m-%d %H:%M") if isinstance(timestamp, datetime.datetime) else ""
-        
-        c.setFont("Helvetica-Bold", 12)
-        c.drawString(margin, y_position, f"{role} - {time_str}")
-        y_position -= line_height
-        
-        c.setFont("Helvetica", 12)
-        text = c.beginText(margin, y_position)
-        text.setFont("Helvetica", 12)
-        text.setLeading(line_height)
-        
-        content = msg["content"]
-        lines = []
-        words = content.split()
-        current_line = ""
-        
-        for word in words:
-            test_line = f"{current_line} {word}".strip()
-            if c.stringWidth(test_line, "Helvetica", 12) < (width - 2 * margin):
-                current_line = test_line
-            else:
-                lines.append(current_line)
-                current_line = word
-        if current_line:
-            lines.append(current_line)
-        
-        for line in lines:
-            text.textLine(line)
-        
-        c.drawText(text)
-        lines_used = len(lines) + content.count('\n')
-        y_position -= (line_height * lines_used + 20)
-    
-    c.showPage()
-    c.setFont("Helvetica", 10)
-    c.drawString(margin, 30, f"Exported from PDF Inquiry System on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
-    
-    c.save()
-    buffer.seek(0)
+    mime, extension = EXPORT_FORMATS[fmt]
+    with st.spinner("Preparing export..."):
+        data = export_conversation(export_messages(), fmt)
     
     st.download_button(
-        label="⬇️ Download PDF Export",
-        data=buffer,
-        file_name=f"chat_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.pdf",
-        mime="application/pdf",
+        label=f"⬇️ Download {extension.upper()} Export",
+        data=data,
+        file_name=f"chat_export_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.{extension}",
+        mime=mime,
         use_container_width=True
     )
 
 def generate_pdf_summary():
-    """Generate a summary of the current PDF"""
-    pdf_hash = st.session_state.get("pdf_hash")
-    if not pdf_hash or pdf_hash not in st.session_state["vector_cache"]:
-        return "⚠️ No PDF loaded or vector store missing."
-    
-    vs = st.session_state["vector_cache"][pdf_hash]
-    all_chunks = vs.similarity_search(" ", k=100)
-    combined_text = "\n".join([doc.page_content for doc in all_chunks])
-    combined_text = combined_text[:8000]
-    
+    """Generate a map-reduce summary covering the whole current PDF; recorded in history"""
     try:
-        response = requests.post(
-            "https://api.mistral.ai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {MISTRAL_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": MISTRAL_MODEL,
-                "messages": [{
-                    "role": "user", 
-                    "content": f"Please provide a comprehensive summary of the following document. Focus on the main points, key findings, and important details. Structure the summary with clear paragraphs:\n\n{combined_text}"
-                }],
-                "temperature": 0.2
-            },
-            timeout=60
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
+        result = backend.summarize(st.session_state.get("username"), st.session_state["pdf_hash"])
+        if result["report"]:
+            st.toast(f"📝 Summary: {result['report']}")
+        return result["summary"]
     except requests.exceptions.RequestException as e:
         return f"⚠️ Error generating summary: {str(e)}"
     except Exception as e:
         return f"⚠️ An unexpected error occurred: {str(e)}"
 
-def load_conversation(pdf_hash, chats):
+def stream_pdf_summary():
+    """Yield summary tokens for the current PDF, streaming the final reduce step; recorded in history"""
+    try:
+        yield from backend.summarize_stream(st.session_state.get("username"), st.session_state["pdf_hash"])
+    except requests.exceptions.RequestException as e:
+        yield f"⚠️ Error generating summary: {str(e)}"
+    except Exception as e:
+        yield f"⚠️ An unexpected error occurred: {str(e)}"
+
+def load_conversation(pdf_hash):
     """Load conversation from history"""
-    st.session_state.messages = []
-    for chat in sorted(chats, key=lambda x: x.get("timestamp", datetime.datetime.now()), reverse=True):
-        st.session_state.messages.append({
-            "role": "user", 
-            "content": chat["question"],
-            "timestamp": chat.get("timestamp")
-        })
-        st.session_state.messages.append({
-            "role": "assistant", 
-            "content": chat["answer"],
-            "timestamp": chat.get("timestamp")
-        })
-    
-    pdf_bytes = load_pdf_from_gridfs(pdf_hash)
-    if pdf_bytes:
-        if pdf_hash not in st.session_state["vector_cache"]:
-            with st.spinner("Loading PDF..."):
-                docs = load_and_process_pdf_from_bytes(pdf_bytes)
-                vs = create_vector_store(docs)
-                st.session_state["vector_cache"][pdf_hash] = vs
-        st.session_state["pdf_hash"] = pdf_hash
+    st.session_state.messages = backend.conversation_messages(st.session_state["username"], pdf_hash)
+    st.session_state["pdf_hash"] = pdf_hash
     st.rerun()
 
+def show_ingest_status():
+    """Show progress for this session's PDFs that are still being ingested"""
+    pending = False
+    for filename, pdf_hash in st.session_state.uploaded_files.items():
+        status = backend.ingest_status(pdf_hash)
+        if status["state"] in (None, INDEXED):
+            continue
+        if status["state"] == FAILED:
+            st.error(f"❌ {filename} could not be processed: {status['error']}")
+        else:
+            pending = True
+            st.progress(status["progress"], text=f"⏳ {filename}: {status['state']}...")
+    return pending
+
+def show_metrics_panel():
+    """Latency histograms, counters and cache stats for this server process"""
+    with st.expander("📈 Metrics"):
+        histograms, counters = registry.snapshot()
+        st.caption("Latencies (bucket estimates for p50/p95)")
+        st.dataframe(histograms, hide_index=True, use_container_width=True)
+        if counters:
+            st.dataframe(counters, hide_index=True, use_container_width=True)
+        if API_URL:
+            st.caption("Q&A runs in the API service; its workers export their own /metrics")
+        else:
+            stats = backend.cache_stats()
+            st.caption("LLM client")
+            st.json(stats["llm_client"], expanded=False)
+            st.caption("Answer cache")
+            st.json(stats["answer_cache"], expanded=False)
+            st.caption("Vector cache")
+            st.json(stats["vector_cache"], expanded=False)
+        st.download_button(
+            "⬇️ Prometheus text",
+            registry.render_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+        if st.button("Reset metrics", key="reset_metrics", use_container_width=True):
+            registry.reset()
+            st.rerun()
+
+def get_conversation_list(username):
+    """Sidebar rows cached per session, reloaded after a history write or rename"""
+    cached = st.session_state.get("conversation_list")
+    version = backend.conversations_version(username)
+    if not cached or cached["version"] != version:
+        rows, cursor = backend.conversations(username)
+        cached = {"version": version, "rows": rows, "cursor": cursor}
+        st.session_state.conversation_list = cached
+    return cached
+
+def load_more_conversations(username):
+    """Append the next page of conversations to the cached sidebar list"""
+    cached = st.session_state.conversation_list
+    rows, cursor = backend.conversations(username, cursor=cached["cursor"])
+    seen = {row["pdf_hash"] for row in cached["rows"]}
+    cached["rows"].extend(row for row in rows if row["pdf_hash"] not in seen)
+    cached["cursor"] = cursor
+
 def prepare_rename(pdf_hash, current_name):
     """Prepare for renaming conversation"""
     st.session_state.rename_modal_open = True
@@ -227,96 +207,148 @@ def show_rename_modal():
 def handle_rename_save(new_name):
     """Handle saving renamed conversation"""
     if new_name.strip():
-        success = update_conversation_name(
+        success = backend.rename_conversation(
             st.session_state["username"],
             st.session_state.conversation_to_rename,
             new_name.strip()
         )
         if success:
             st.toast("✅ Conversation renamed successfully")
+        st.session_state.conversation_list = None
     st.session_state.rename_modal_open = False
     st.rerun()
 
+def message_html(msg):
+    """Render one chat message as a bubble"""
+    bubble_class = "user-message" if msg["role"] == "user" else "bot-message"
+    icon = "🧍" if msg["role"] == "user" else "🤖"
+    timestamp = msg.get("timestamp", datetime.datetime.now())
+    time_str = timestamp.strftime("%I:%M %p") if isinstance(timestamp, datetime.datetime) else ""
+    
+    return f"""
+    <div class='chat-wrapper' style='justify-content: {"flex-end" if msg["role"] == "user" else "flex-start"}'>
+        <div class='chat-bubble {bubble_class}'>
+            <div class='chat-timestamp'>{time_str}</div>
+            <span>{icon}</span> {msg['content']}
+        </div>
+    </div>
+    """
+
 def display_chat_messages():
     """Display chat message history"""
     st.markdown("<div class='chat-container'>", unsafe_allow_html=True)
     for msg in st.session_state.messages:
-        bubble_class = "user-message" if msg["role"] == "user" else "bot-message"
-        icon = "🧍" if msg["role"] == "user" else "🤖"
-        timestamp = msg.get("timestamp", datetime.datetime.now())
-        time_str = timestamp.strftime("%I:%M %p") if isinstance(timestamp, datetime.datetime) else ""
-        
-        st.markdown(f"""
-        <div class='chat-wrapper' style='justify-content: {"flex-end" if msg["role"] == "user" else "flex-start"}'>
-            <div class='chat-bubble {bubble_class}'>
-                <div class='chat-timestamp'>{time_str}</div>
-                <span>{icon}</span> {msg['content']}
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
+        st.markdown(message_html(msg), unsafe_allow_html=True)
     st.markdown("</div>", unsafe_allow_html=True)
 
-def retrieve_context(query):
-    """Retrieve relevant context from vector store"""
-    pdf_hash = st.session_state.get("pdf_hash")
-    if not pdf_hash or pdf_hash not in st.session_state["vector_cache"]:
-        return "⚠️ No PDF loaded or vector store missing."
-    results = st.session_state["vector_cache"][pdf_hash].similarity_search(query, k=3)
-    return "\n".join([doc.page_content for doc in results])
-
-def query_mistral_api(query):
-    """Query Mistral API with context"""
-    context = retrieve_context(query)
-    if context.startswith("⚠️"):
-        return context
-    
-    full_prompt = f"""Based on this context from the PDF:
-{context}
+def render_stream(tokens, prefix=""):
+    """Render tokens into a live assistant bubble and return the full text"""
+    placeholder = st.empty()
+    msg = {"role": "assistant", "content": prefix, "timestamp": datetime.datetime.now()}
+    text = ""
+    last_render = 0.0
+    for token in tokens:
+        text += token
+        # Throttle redraws; each one re-sends the whole bubble to the browser
+        if time.monotonic() - last_render >= STREAM_RENDER_INTERVAL:
+            msg["content"] = f"{prefix}{text}▌"
+            placeholder.markdown(message_html(msg), unsafe_allow_html=True)
+            last_render = time.monotonic()
+    msg["content"] = f"{prefix}{text}"
+    placeholder.markdown(message_html(msg), unsafe_allow_html=True)
+    return text
 
-Answer this question: {query}
+def ask_args(user_input):
+    """Arguments of backend.ask for the current conversation and retrieval mode
 
-If the answer cannot be found in the context, reply with "I couldn't find that information in the document.\""""
-    
-    try:
-        response = requests.post(
-            "https://api.mistral.ai/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {MISTRAL_API_KEY}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": MISTRAL_MODEL,
-                "messages": [{"role": "user", "content": full_prompt}],
-                "temperature": 0.3
-            },
-            timeout=30
-        )
-        response.raise_for_status()
-        return response.json()["choices"][0]["message"]["content"]
-    except requests.exceptions.RequestException as e:
-        return f"⚠️ Error connecting to API: {str(e)}"
-    except Exception as e:
-        return f"⚠️ An unexpected error occurred: {str(e)}"
+    Call it before the new question is appended: the memory layer expects
+    the turns before the question, and gets a copy of them.
+    """
+    return dict(
+        username=st.session_state.get("username"),
+        pdf_hash=st.session_state.get("pdf_hash"),
+        question=user_input,
+        library=st.session_state.get("library_mode", False),
+        messages=list(st.session_state.messages),
+        extra_pdf_hashes=tuple(st.session_state.uploaded_files.values())
+    )
 
 def handle_user_input(user_input):
-    """Handle user message input"""
-    current_time = datetime.datetime.now()
-    user_msg = {"role": "user", "content": user_input, "timestamp": current_time}
+    """Handle user message input; the backend rewrites follow-ups, answers and records history"""
+    user_msg = {"role": "user", "content": user_input, "timestamp": datetime.datetime.now()}
+    args = ask_args(user_input)
     st.session_state.messages.append(user_msg)
     
-    with st.spinner("🤖 Thinking..."):
-        answer = query_mistral_api(user_input)
+    if STREAM_RESPONSES:
+        st.markdown(message_html(user_msg), unsafe_allow_html=True)
+        answer = render_stream(backend.ask_stream(**args))
+    else:
+        with st.spinner("🤖 Thinking..."):
+            answer = backend.ask(**args)["answer"]
     
     bot_msg = {"role": "assistant", "content": answer, "timestamp": datetime.datetime.now()}
     st.session_state.messages.append(bot_msg)
+    # History was written elsewhere when remote, so history_version cannot tell
+    st.session_state.conversation_list = None
+    st.rerun()
 
-    if "username" in st.session_state and st.session_state["pdf_hash"]:
-        save_chat_history(
-            st.session_state["username"],
-            user_input,
-            answer,
-            st.session_state["pdf_hash"]
+def parse_questions(text):
+    """One question per non-empty line, list markers stripped, duplicates dropped"""
+    questions = []
+    for line in text.splitlines():
+        question = LIST_MARKER.sub("", line).strip()
+        if question and question not in questions:
+            questions.append(question)
+    return questions
+
+def handle_batch_questions(text):
+    """Answer a pasted list of questions concurrently and add them to the conversation in order"""
+    questions = parse_questions(text)
+    if not questions:
+        st.warning("Enter one question per line")
+        return
+    
+    progress = st.progress(0.0, text=f"🤖 Answering {len(questions)} questions...")
+    done = []
+    
+    def on_answer(result):
+        done.append(result)
+        progress.progress(len(done) / len(questions), text=f"🤖 Answered {len(done)} of {len(questions)}")
+    
+    error = None
+    try:
+        results = backend.ask_batch(
+            st.session_state.get("username"),
+            st.session_state.get("pdf_hash"),
+            questions,
+            library=st.session_state.get("library_mode", False),
+            extra_pdf_hashes=tuple(st.session_state.uploaded_files.values()),
+            on_answer=on_answer
         )
+    except requests.exceptions.RequestException as e:
+        error = f"⚠️ Error connecting to API: {str(e)}"
+    except Exception as e:
+        error = f"⚠️ An unexpected error occurred: {str(e)}"
+    if error:
+        # Keep the answers that arrived before the failure
+        results = sorted(done, key=lambda result: result["index"])
+    elif len(results) < len(questions):
+        st.toast(f"⚠️ Only the first {len(results)} questions were answered")
+    for result in results:
+        now = datetime.datetime.now()
+        for msg in (
+            {"role": "user", "content": result["question"], "timestamp": now},
+            {"role": "assistant", "content": result["answer"], "timestamp": now}
+        ):
+            st.session_state.messages.append(msg)
+            if error:
+                st.markdown(message_html(msg), unsafe_allow_html=True)
+    st.session_state.conversation_list = None
+    if error:
+        # No rerun, which would clear the error before it is read
+        progress.empty()
+        st.error(error)
+        return
     st.rerun()
 
 def chat_page():
@@ -326,8 +358,8 @@ def chat_page():
     # Initialize session state
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "vector_cache" not in st.session_state:
-        st.session_state.vector_cache = {}
+    if "library_mode" not in st.session_state:
+        st.session_state.library_mode = False
     if "pdf_hash" not in st.session_state:
         st.session_state.pdf_hash = None
     if "rename_modal_open" not in st.session_state:
@@ -352,21 +384,12 @@ def chat_page():
             st.rerun()
 
         if "username" in st.session_state:
-            chat_history = get_chat_history(st.session_state["username"])
-            by_hash = {}
-            for entry in chat_history:
-                pdf_hash = entry.get("pdf_hash")
-                if pdf_hash:
-                    by_hash.setdefault(pdf_hash, []).append(entry)
-
-            for pdf_hash, chats in by_hash.items():
-                if not chats:
-                    continue
-                
-                meta = get_conversation_meta(st.session_state["username"], pdf_hash)
-                conversation_name = meta["conversation_name"] if meta else "New Conversation"
-                latest_chat = chats[0]
-                timestamp = latest_chat.get("timestamp", datetime.datetime.now())
+            conversations = get_conversation_list(st.session_state["username"])
+
+            for conversation in conversations["rows"]:
+                pdf_hash = conversation["pdf_hash"]
+                conversation_name = conversation["conversation_name"]
+                timestamp = conversation["latest"]
                 date_str = timestamp.strftime("%b %d, %I:%M %p") if isinstance(timestamp, datetime.datetime) else ""
                 
                 with st.container():
@@ -377,13 +400,21 @@ def chat_page():
                             key=f"conv_{pdf_hash}",
                             use_container_width=True
                         ):
-                            load_conversation(pdf_hash, chats)
+                            load_conversation(pdf_hash)
                     with cols[1]:
                         if st.button("✏️", key=f"rename_{pdf_hash}", help="Rename conversation"):
                             prepare_rename(pdf_hash, conversation_name)
                     
                     st.markdown(f'<div class="sidebar-timestamp">{date_str}</div>', unsafe_allow_html=True)
 
+            if conversations["cursor"]:
+                if st.button("Load more", key="load_more_conversations", use_container_width=True):
+                    load_more_conversations(st.session_state["username"])
+                    st.rerun()
+
+        if registry.enabled and st.session_state.get("username") in METRICS_ADMINS:
+            show_metrics_panel()
+
     # Rename modal
     if st.session_state.rename_modal_open:
         show_rename_modal()
@@ -393,18 +424,15 @@ def chat_page():
     
     for uploaded_file in uploaded_files:
         if uploaded_file.name not in st.session_state.uploaded_files:
-            pdf_bytes = uploaded_file.read()
-            pdf_hash = hash_pdf_bytes(pdf_bytes)
+            uploaded_file.seek(0)
+            with st.spinner(f"Storing {uploaded_file.name}..."):
+                status = backend.upload_pdf(uploaded_file, uploaded_file.name)
             
-            with st.spinner(f"Processing {uploaded_file.name}..."):
-                if pdf_hash not in st.session_state["vector_cache"]:
-                    docs = load_and_process_pdf_from_bytes(pdf_bytes)
-                    vs = create_vector_store(docs)
-                    st.session_state["vector_cache"][pdf_hash] = vs
-                    save_pdf_to_gridfs(pdf_bytes, uploaded_file.name)
-            
-            st.session_state.uploaded_files[uploaded_file.name] = pdf_hash
-            st.toast(f"✅ {uploaded_file.name} processed successfully")
+            st.session_state.uploaded_files[uploaded_file.name] = status["pdf_hash"]
+            st.toast(f"📥 {uploaded_file.name} queued for processing")
+    
+    ingest_pending = show_ingest_status()
+    pdf_pending = bool(st.session_state.pdf_hash) and backend.is_pending(st.session_state.pdf_hash)
     
     if len(st.session_state.uploaded_files) > 0:
         selected_file = st.selectbox(
@@ -421,39 +449,64 @@ def chat_page():
             st.session_state.messages = []
             st.rerun()
 
+    if pdf_pending:
+        st.info("⏳ This PDF is still being processed. You can chat with other PDFs in the meantime.")
+
     # Action buttons container
-    if st.session_state.get("pdf_hash"):
+    if st.session_state.get("pdf_hash") and not pdf_pending:
         col1, col2 = st.columns([1, 1])
         with col1:
             if st.button("📝 Summarize PDF", 
                         key="summarize_btn", 
                         help="Generate a summary of the uploaded PDF",
                         use_container_width=True):
-                with st.spinner("Generating summary..."):
-                    summary = generate_pdf_summary()
-                    if summary:
-                        bot_msg = {"role": "assistant", "content": f"📝 PDF Summary:\n\n{summary}", "timestamp": datetime.datetime.now()}
-                        st.session_state.messages.append(bot_msg)
-                        
-                        if "username" in st.session_state and st.session_state["pdf_hash"]:
-                            save_chat_history(
-                                st.session_state["username"],
-                                "[System] Generate PDF summary",
-                                summary,
-                                st.session_state["pdf_hash"]
-                            )
-                        st.rerun()
+                if STREAM_RESPONSES:
+                    summary = render_stream(stream_pdf_summary(), prefix="📝 PDF Summary:\n\n")
+                else:
+                    with st.spinner("Generating summary..."):
+                        summary = generate_pdf_summary()
+                if summary:
+                    bot_msg = {"role": "assistant", "content": f"📝 PDF Summary:\n\n{summary}", "timestamp": datetime.datetime.now()}
+                    st.session_state.messages.append(bot_msg)
+                    st.session_state.conversation_list = None
+                    st.rerun()
         with col2:
+            export_format = st.selectbox(
+                "Export format",
+                options=list(EXPORT_FORMATS),
+                key="export_format",
+                format_func=lambda fmt: EXPORT_FORMATS[fmt][1].upper(),
+                label_visibility="collapsed"
+            )
             if st.button("💾 Export Chat", 
                          key="export_btn", 
-                         help="Export conversation as PDF",
+                         help="Export conversation as PDF, Markdown or JSON",
                          type="primary", 
                          use_container_width=True,
                          disabled=len(st.session_state.messages) == 0):
-                export_chat_to_pdf()
+                export_chat(export_format)
 
     display_chat_messages()
 
-    user_input = st.chat_input("Ask something about the PDF...")
+    st.checkbox("📚 Search all my PDFs", key="library_mode", help="Answer from every indexed PDF, citing file and page")
+    library_mode = st.session_state.library_mode
+    with st.expander("📋 Ask a list of questions"):
+        batch_text = st.text_area(
+            "Questions",
+            key="batch_questions",
+            placeholder="One question per line, e.g.\nWho are the parties?\nWhen does the contract end?",
+            label_visibility="collapsed"
+        )
+        if st.button("Ask all", key="batch_btn", use_container_width=True, disabled=pdf_pending and not library_mode):
+            handle_batch_questions(batch_text)
+    user_input = st.chat_input(
+        "Ask something about your PDFs..." if library_mode else "Ask something about the PDF...",
+        disabled=pdf_pending and not library_mode
+    )
     if user_input:
-        handle_user_input(user_input)
\ No newline at end of file
+        handle_user_input(user_input)
+
+    # Poll background ingestion until this session's uploads are done
+    if ingest_pending:
+        time.sleep(INGEST_POLL_SECONDS)
+        st.rerun()
\ No newline at end of file
@@ -0,0 +1,179 @@
+import os
+import json
+import datetime
+import tempfile
+from io import BytesIO
+from reportlab.pdfgen import canvas
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.lib.pagesizes import letter
+
+# Constants
+EXPORT_SPOOL_BYTES = int(os.getenv("EXPORT_SPOOL_BYTES", str(8 * 1024 * 1024)))  # larger exports are served from disk
+PAGE_MARGIN = 72
+LINE_HEIGHT = 14
+MESSAGE_GAP = 20
+BODY_FONT = ("Helvetica", 12)
+HEADER_FONT = ("Helvetica-Bold", 12)
+
+# format -> (mime type, file extension)
+EXPORT_FORMATS = {
+    "pdf": ("application/pdf", "pdf"),
+    "markdown": ("text/markdown", "md"),
+    "json": ("application/json", "json")
+}
+
+class GlyphWidths:
+    """Per-character advance widths for one font, measured once each"""
+
+    def __init__(self, font_name, font_size):
+        self.font_name = font_name
+        self.font_size = font_size
+        self._widths = {}
+
+    def width(self, text):
+        widths = self._widths
+        total = 0.0
+        for char in text:
+            w = widths.get(char)
+            if w is None:
+                w = widths[char] = stringWidth(char, self.font_name, self.font_size)
+            total += w
+        return total
+
+def wrap_text(text, max_width, glyphs):
+    """Greedy word wrap in one pass over the text, keeping explicit line breaks"""
+    lines = []
+    space = glyphs.width(" ")
+    for paragraph in text.split("\n"):
+        line, line_width = [], 0.0
+        for word in paragraph.split():
+            word_width = glyphs.width(word)
+            if word_width > max_width:
+                # Hard-break words longer than a whole line
+                if line:
+                    lines.append(" ".join(line))
+                    line, line_width = [], 0.0
+                piece, piece_width = "", 0.0
+                for char in word:
+                    char_width = glyphs.width(char)
+                    if piece and piece_width + char_width > max_width:
+                        lines.append(piece)
+                        piece, piece_width = "", 0.0
+                    piece += char
+                    piece_width += char_width
+                line, line_width = [piece], piece_width
+                continue
+            needed = word_width + (space if line else 0.0)
+            if line and line_width + needed > max_width:
+                lines.append(" ".join(line))
+                line, line_width = [word], word_width
+            else:
+                line.append(word)
+                line_width += needed
+        lines.append(" ".join(line))
+    return lines
+
+def _role(msg):
+    return "User" if msg["role"] == "user" else "Assistant"
+
+def _time_str(msg):
+    timestamp = msg.get("timestamp")
+    return timestamp.strftime("%Y-%m-%d %H:%M") if isinstance(timestamp, datetime.datetime) else ""
+
+class _PdfWriter:
+    """Lays out messages line by line, starting a new page whenever the next line would not fit
+
+    Each page is one text object, so fonts are only switched between a
+    message header and its body rather than per line.
+    """
+
+    def __init__(self, out):
+        self.canvas = canvas.Canvas(out, pagesize=letter, pageCompression=1)
+        self.width, self.height = letter
+        self.glyphs = GlyphWidths(*BODY_FONT)
+        self.page = 1
+        self.canvas.setFont("Helvetica-Bold", 16)
+        self.canvas.drawString(PAGE_MARGIN, self.height - PAGE_MARGIN, "Chat Conversation Export")
+        self._start_text(self.height - PAGE_MARGIN - 30)
+
+    def _start_text(self, y):
+        self.y = y
+        self.font = None
+        self.text = self.canvas.beginText(PAGE_MARGIN, y)
+        self.text.setLeading(LINE_HEIGHT)
+
+    def _end_page(self):
+        self.canvas.drawText(self.text)
+        self.canvas.setFont("Helvetica", 9)
+        self.canvas.drawRightString(self.width - PAGE_MARGIN, 30, f"Page {self.page}")
+
+    def _line(self, line, font):
+        if self.y < PAGE_MARGIN:
+            self._end_page()
+            self.canvas.showPage()
+            self.page += 1
+            self._start_text(self.height - PAGE_MARGIN)
+        if font != self.font:
+            self.text.setFont(*font)
+            self.font = font
+        self.text.textLine(line)
+        self.y -= LINE_HEIGHT
+
+    def write(self, msg):
+        self._line(f"{_role(msg)} - {_time_str(msg)}", HEADER_FONT)
+        for line in wrap_text(msg["content"], self.width - 2 * PAGE_MARGIN, self.glyphs):
+            self._line(line, BODY_FONT)
+        self.text.moveCursor(0, MESSAGE_GAP)
+        self.y -= MESSAGE_GAP
+
+    def close(self):
+        self._end_page()
+        self.canvas.setFont("Helvetica", 10)
+        self.canvas.drawString(PAGE_MARGIN, 45, f"Exported from PDF Inquiry System on {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}")
+        self.canvas.save()
+
+def _write_pdf(messages, out):
+    writer = _PdfWriter(out)
+    for msg in messages:
+        writer.write(msg)
+    writer.close()
+
+def _write_markdown(messages, out):
+    out.write(f"# Chat Conversation Export\n\n_Exported {datetime.datetime.now().strftime('%Y-%m-%d %H:%M')}_\n\n".encode())
+    for msg in messages:
+        out.write(f"### {_role(msg)} - {_time_str(msg)}\n\n{msg['content']}\n\n".encode())
+
+def _write_json(messages, out):
+    out.write(f'{{"exported_at": {json.dumps(datetime.datetime.now().isoformat())}, "messages": ['.encode())
+    for i, msg in enumerate(messages):
+        item = {"role": msg["role"], "content": msg["content"], "timestamp": msg.get("timestamp")}
+        out.write((", " if i else "").encode() + json.dumps(item, default=str).encode())
+    out.write(b"]}\n")
+
+WRITERS = {"pdf": _write_pdf, "markdown": _write_markdown, "json": _write_json}
+
+def export_conversation(messages, fmt="pdf"):
+    """Write an iterable of chat messages to a stream st.download_button accepts, rewound and ready to read
+
+    Messages are consumed one at a time, so a cursor over history never has
+    to be materialized. Exports up to EXPORT_SPOOL_BYTES come back as a
+    BytesIO; larger ones as a BufferedReader over an unlinked temp file,
+    which the OS removes once the reader is closed.
+    """
+    with tempfile.NamedTemporaryFile(suffix=f".{EXPORT_FORMATS[fmt][1]}", delete=False) as out:
+        path = out.name
+        try:
+            WRITERS[fmt](messages, out)
+            size = out.tell()
+        except Exception:
+            out.close()
+            os.unlink(path)
+            raise
+    if size <= EXPORT_SPOOL_BYTES:
+        with open(path, "rb") as f:
+            data = BytesIO(f.read())
+        os.unlink(path)
+        return data
+    reader = open(path, "rb")
+    os.unlink(path)
+    return reader
@@ -0,0 +1,129 @@
+import os
+import re
+from tokens import count_tokens
+
+# Constants
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+MIN_OVERLAP_CHARS = 20
+MIN_PARTIAL_TOKENS = 40
+
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+
+class ContextSpan:
+    """Contiguous text from one page, merged from one or more retrieved chunks"""
+
+    def __init__(self, doc, rank):
+        self.metadata = doc.metadata
+        self.text = doc.page_content
+        self.rank = rank
+        self.start = doc.metadata.get("start_index")
+        self.chunks = 1
+
+    @property
+    def end(self):
+        return self.start + len(self.text)
+
+    def absorb_by_offset(self, doc, rank):
+        """Extend with a chunk that starts inside or right after this span; False if it doesn't"""
+        start = doc.metadata["start_index"]
+        if start > self.end + 1:
+            return False
+        tail = doc.page_content[self.end - start:] if start <= self.end else " " + doc.page_content
+        self.text += tail
+        self.rank = min(self.rank, rank)
+        self.chunks += 1
+        return True
+
+    def absorb_by_text(self, doc, rank):
+        """Merge a chunk without offsets by matching the splitter's overlap text"""
+        text = doc.page_content
+        if text in self.text:
+            merged = self.text
+        elif self.text in text:
+            merged = text
+        else:
+            merged = _join_overlapping(self.text, text) or _join_overlapping(text, self.text)
+            if merged is None:
+                return False
+        self.text = merged
+        self.rank = min(self.rank, rank)
+        self.chunks += 1
+        return True
+
+def _join_overlapping(first, second):
+    """first + second without the longest suffix of first that second starts with"""
+    for size in range(min(len(first), len(second)) - 1, MIN_OVERLAP_CHARS - 1, -1):
+        if first.endswith(second[:size]):
+            return first + second[size:]
+    return None
+
+def merge_chunks(docs):
+    """Collapse chunks from the same page into spans, dropping repeated overlap text
+
+    `docs` are in relevance order; each span keeps the best rank of its chunks.
+    Chunks carrying a splitter start_index are merged by offset, others by
+    matching overlap text.
+    """
+    pages = {}
+    for rank, doc in enumerate(docs):
+        key = (doc.metadata.get("pdf_hash"), doc.metadata.get("source"), doc.metadata.get("page"))
+        pages.setdefault(key, []).append((rank, doc))
+
+    spans = []
+    for chunks in pages.values():
+        page_spans = []
+        if all("start_index" in doc.metadata for _, doc in chunks):
+            for rank, doc in sorted(chunks, key=lambda pair: pair[1].metadata["start_index"]):
+                if not page_spans or not page_spans[-1].absorb_by_offset(doc, rank):
+                    page_spans.append(ContextSpan(doc, rank))
+        else:
+            for rank, doc in chunks:
+                if not any(span.absorb_by_text(doc, rank) for span in page_spans):
+                    page_spans.append(ContextSpan(doc, rank))
+        spans.extend(page_spans)
+    return sorted(spans, key=lambda span: span.rank)
+
+def trim_to_tokens(text, budget):
+    """Longest run of whole leading sentences that fits in budget tokens"""
+    kept = []
+    for sentence in SENTENCE_BREAK.split(text):
+        if count_tokens(" ".join(kept + [sentence])) > budget:
+            break
+        kept.append(sentence)
+    return " ".join(kept)
+
+class BuiltContext:
+    """Prompt context plus token accounting"""
+
+    def __init__(self, text, spans, retrieved_tokens, tokens):
+        self.text = text
+        self.spans = spans
+        self.retrieved_tokens = retrieved_tokens
+        self.tokens = tokens
+
+    def __str__(self):
+        return f"{self.tokens} context tokens from {self.retrieved_tokens} retrieved in {len(self.spans)} spans"
+
+def build_context(docs, budget=CONTEXT_TOKEN_BUDGET, label=None):
+    """Dedup and merge retrieved chunks, then pack the most relevant spans into `budget` tokens
+
+    label(span) returns an optional header such as "[file, p. 3]" for each span.
+    """
+    retrieved_tokens = sum(count_tokens(doc.page_content) for doc in docs)
+    kept, blocks = [], []
+    used = 0
+    for span in merge_chunks(docs):
+        header = f"[{label(span)}]\n" if label else ""
+        remaining = budget - used - count_tokens(header)
+        if count_tokens(span.text) > remaining:
+            if remaining < MIN_PARTIAL_TOKENS:
+                continue
+            span.text = trim_to_tokens(span.text, remaining)
+            if not span.text:
+                continue
+        kept.append(span)
+        blocks.append(header + span.text)
+        used += count_tokens(blocks[-1])
+
+    text = "\n\n".join(blocks)
+    return BuiltContext(text, kept, retrieved_tokens, count_tokens(text))
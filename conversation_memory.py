@@ -0,0 +1,197 @@
+import os
+import logging
+import datetime
+import threading
+from collections import OrderedDict
+from llm_client import chat_completion
+from index import db
+from tokens import count_tokens
+from context_builder import trim_to_tokens
+
+# Constants
+MEMORY_RECENT_TURNS = int(os.getenv("MEMORY_RECENT_TURNS", "2"))
+MEMORY_SUMMARY_TOKENS = int(os.getenv("MEMORY_SUMMARY_TOKENS", "200"))
+MEMORY_RECENT_TOKENS = int(os.getenv("MEMORY_RECENT_TOKENS", "400"))
+MEMORY_MESSAGE_TOKENS = 150
+MEMORY_CACHE_SIZE = int(os.getenv("MEMORY_CACHE_SIZE", "1024"))  # conversations whose memory stays loaded
+MEMORY_TIMEOUT = 20
+
+CONDENSE_PROMPT = """You keep the memory of a conversation about the user's PDFs.
+
+Summary of the earlier conversation:
+{summary}
+
+Turns to add to the summary:
+{fold}
+
+Most recent turns:
+{recent}
+
+New question: {question}
+
+Reply with exactly two lines:
+QUESTION: the new question rewritten to stand on its own, replacing references such as "it" or "that section" with what they refer to
+SUMMARY: the summary of the earlier conversation updated with the turns to add, at most {words} words"""
+
+REWRITE_PROMPT = """Conversation so far:
+{summary}
+{recent}
+
+New question: {question}
+
+Reply with one line:
+QUESTION: the new question rewritten to stand on its own, replacing references such as "it" or "that section" with what they refer to"""
+
+memory_collection = db["conversation_memory"]
+logger = logging.getLogger(__name__)
+
+def _timestamp(message):
+    return message.get("timestamp") or datetime.datetime.min
+
+def _format_turns(messages, max_tokens):
+    """Messages as "User:/Assistant:" lines, newest kept when over max_tokens"""
+    lines = []
+    used = 0
+    for message in reversed(messages):
+        speaker = "User" if message["role"] == "user" else "Assistant"
+        line = f"{speaker}: {trim_to_tokens(message['content'], MEMORY_MESSAGE_TOKENS) or message['content'][:200]}"
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            break
+        lines.append(line)
+        used += tokens
+    return "\n".join(reversed(lines))
+
+def _parse(reply, question, summary):
+    """(question, summary) from the model's QUESTION:/SUMMARY: lines, keeping the inputs when absent"""
+    fields = {}
+    current = None
+    for line in reply.splitlines():
+        label, _, value = line.partition(":")
+        if label.strip().upper() in ("QUESTION", "SUMMARY"):
+            current = label.strip().upper()
+            fields[current] = value.strip()
+        elif current and line.strip():
+            fields[current] += " " + line.strip()
+    return fields.get("QUESTION") or question, fields.get("SUMMARY") or summary
+
+class ConversationMemory:
+    """Rolling summary of one conversation plus its last few turns
+
+    Turns that leave the recent window are folded into the summary one
+    condense call at a time, so each question costs at most one small LLM
+    call and the memory never grows past MEMORY_SUMMARY_TOKENS +
+    MEMORY_RECENT_TOKENS however long the conversation gets.
+    """
+
+    def __init__(self, username=None, pdf_hash=None, summary="", folded_until=datetime.datetime.min):
+        self.key = (username, pdf_hash)
+        self.summary = summary
+        self.folded_until = folded_until
+        self.recent = ""
+
+    @classmethod
+    def load(cls, username, pdf_hash):
+        """Memory stored for a conversation, or an empty one"""
+        if not username or not pdf_hash:
+            return cls(username, pdf_hash)
+        doc = memory_collection.find_one({"username": username, "pdf_hash": pdf_hash}, {"_id": 0})
+        if not doc:
+            return cls(username, pdf_hash)
+        return cls(username, pdf_hash, doc["summary"], doc["folded_until"])
+
+    def save(self):
+        username, pdf_hash = self.key
+        if not username or not pdf_hash:
+            return
+        memory_collection.update_one(
+            {"username": username, "pdf_hash": pdf_hash},
+            {"$set": {"summary": self.summary, "folded_until": self.folded_until, "updated_at": datetime.datetime.now()}},
+            upsert=True
+        )
+
+    def context(self):
+        """Memory text to put in the answer prompt"""
+        parts = []
+        if self.summary:
+            parts.append(f"Summary of the earlier conversation: {self.summary}")
+        if self.recent:
+            parts.append(f"Most recent turns:\n{self.recent}")
+        return "\n".join(parts)
+
+    def prepare(self, messages, question):
+        """(standalone question for retrieval, memory text for the answer prompt)
+
+        `messages` is the conversation before this question, in any order.
+        Folds turns that left the recent window into the summary.
+        """
+        history = sorted(
+            (m for m in messages if not m["content"].startswith("⚠️")),
+            key=_timestamp
+        )
+        if not history:
+            self.recent = ""
+            return question, ""
+
+        window = 2 * MEMORY_RECENT_TURNS
+        recent, older = history[-window:], history[:-window]
+        to_fold = [m for m in older if _timestamp(m) > self.folded_until]
+        self.recent = _format_turns(recent, MEMORY_RECENT_TOKENS)
+
+        if to_fold:
+            prompt = CONDENSE_PROMPT.format(
+                summary=self.summary or "(none)",
+                fold=_format_turns(to_fold, MEMORY_RECENT_TOKENS),
+                recent=self.recent,
+                question=question,
+                words=int(MEMORY_SUMMARY_TOKENS * 0.7)
+            )
+        else:
+            prompt = REWRITE_PROMPT.format(summary=self.summary, recent=self.recent, question=question)
+
+        try:
+            reply = chat_completion([{"role": "user", "content": prompt}], temperature=0.0, timeout=MEMORY_TIMEOUT)
+        except Exception as e:
+            logger.warning("conversation memory call failed, using the question as asked: %s", e)
+            return question, self.context()
+
+        rewritten, summary = _parse(reply, question, self.summary)
+        if to_fold:
+            self.summary = trim_to_tokens(summary, MEMORY_SUMMARY_TOKENS) or summary[:MEMORY_SUMMARY_TOKENS * 4]
+            self.folded_until = _timestamp(older[-1])
+            self.save()
+        logger.info(
+            "memory: %d prompt tokens, %d summary tokens, query %r -> %r",
+            count_tokens(prompt), count_tokens(self.summary), question, rewritten
+        )
+        return rewritten, self.context()
+
+class MemoryCache:
+    """LRU of conversation memories keyed by (username, pdf_hash), so a question costs no MongoDB read for it"""
+
+    def __init__(self, size=MEMORY_CACHE_SIZE):
+        self.size = size
+        self._memories = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, username, pdf_hash):
+        """(memory, lock) for a conversation; hold the lock while preparing a question with it"""
+        if not username or not pdf_hash:
+            return ConversationMemory(username, pdf_hash), threading.Lock()
+        key = (username, pdf_hash)
+        with self._lock:
+            entry = self._memories.get(key)
+            if entry is not None:
+                self._memories.move_to_end(key)
+                return entry
+        entry = (ConversationMemory.load(username, pdf_hash), threading.Lock())
+        with self._lock:
+            # Another request may have loaded it meanwhile; keep the first so both share one lock
+            entry = self._memories.setdefault(key, entry)
+            self._memories.move_to_end(key)
+            while len(self._memories) > self.size:
+                self._memories.popitem(last=False)
+        return entry
+
+# Shared by every Streamlit session and API request in this process
+memory_cache = MemoryCache()
@@ -0,0 +1,19 @@
+import os
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from gridfs import GridFS
+
+# MongoDB handles only; the login page and the API's thin client import this without the pipeline
+load_dotenv()
+MONGO_URI = os.getenv("MONGO_URI")
+
+if not MONGO_URI:
+    raise ValueError("Missing MONGO_URI in .env")
+
+# Initialize MongoDB connection
+client = MongoClient(MONGO_URI)
+db = client["pdf_qa_system"]
+fs = GridFS(db)
+users_collection = db["users"]
+history_collection = db["chat_history"]
+conversation_meta_collection = db["conversation_meta"]
@@ -0,0 +1,102 @@
+import os
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+from bson import Binary
+from pymongo.errors import BulkWriteError
+from langchain.embeddings.base import Embeddings
+from embedding_engine import get_embedding_engine
+
+# Constants
+EMBEDDING_CACHE_BACKEND = os.getenv("EMBEDDING_CACHE_BACKEND", "disk")  # "disk", "mongo" or "off"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join("index_store", "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_DTYPE = np.dtype(os.getenv("EMBEDDING_CACHE_DTYPE", "float16"))
+SQLITE_MAX_VARIABLES = 500
+
+def chunk_key(model_name, text):
+    """Content address of a chunk embedding"""
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).hexdigest()
+
+class SqliteVectorStore:
+    """Key -> packed vector bytes in a local SQLite file"""
+
+    def __init__(self, path=EMBEDDING_CACHE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), SQLITE_MAX_VARIABLES):
+                batch = keys[start:start + SQLITE_MAX_VARIABLES]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                )
+                found.update(rows)
+        return found
+
+    def put_many(self, items):
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)", items)
+
+class MongoVectorStore:
+    """Key -> packed vector bytes in a MongoDB collection"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    def get_many(self, keys):
+        return {doc["_id"]: bytes(doc["v"]) for doc in self.collection.find({"_id": {"$in": keys}})}
+
+    def put_many(self, items):
+        if not items:
+            return
+        try:
+            self.collection.insert_many([{"_id": key, "v": Binary(vector)} for key, vector in items], ordered=False)
+        except BulkWriteError as e:
+            # Another process cached the same chunk first
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+class CachedEmbeddings(Embeddings):
+    """Chunk embeddings served from a content-addressed cache, computing only the misses"""
+
+    def __init__(self, store, dtype=EMBEDDING_CACHE_DTYPE):
+        self.store = store
+        self.dtype = dtype
+        self.hits = 0
+        self.misses = 0
+
+    def embed_documents(self, texts):
+        engine = get_embedding_engine()
+        keys = [chunk_key(engine.model_name, text) for text in texts]
+        found = self.store.get_many(list(set(keys)))
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found:
+                missing.setdefault(key, text)
+        if missing:
+            vectors = engine.embed_documents(list(missing.values()))
+            packed = [(key, np.asarray(vector, dtype=self.dtype).tobytes()) for key, vector in zip(missing, vectors)]
+            self.store.put_many(packed)
+            found.update(packed)
+
+        self.hits += len(texts) - len(missing)
+        self.misses += len(missing)
+        return [np.frombuffer(found[key], dtype=self.dtype).astype(np.float32).tolist() for key in keys]
+
+    def embed_query(self, text):
+        return get_embedding_engine().embed_query(text)
+
+def make_chunk_embedder(collection=None, backend=EMBEDDING_CACHE_BACKEND):
+    """Embeddings used at ingest time: cached per chunk unless the backend is "off" """
+    if backend == "off":
+        return get_embedding_engine()
+    if backend == "mongo":
+        return CachedEmbeddings(MongoVectorStore(collection))
+    return CachedEmbeddings(SqliteVectorStore())
@@ -0,0 +1,59 @@
+import os
+import threading
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain.embeddings.base import Embeddings
+
+# Constants
+EMBEDDING_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "32"))
+
+# Process-wide engine shared by every Streamlit session
+_engine = None
+_engine_lock = threading.Lock()
+
+class EmbeddingEngine(Embeddings):
+    """Shared sentence-transformers model with batched encoding"""
+
+    def __init__(self, model_name=EMBEDDING_MODEL_NAME, batch_size=EMBEDDING_BATCH_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self._model = HuggingFaceEmbeddings(
+            model_name=model_name,
+            encode_kwargs={"batch_size": batch_size}
+        )
+        self._warm = False
+        self._warm_lock = threading.Lock()
+
+    def embed_documents(self, texts, batch_size=None):
+        """Embed a list of texts in batches of batch_size"""
+        batch_size = batch_size or self.batch_size
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(self._model.embed_documents(list(texts[start:start + batch_size])))
+        return vectors
+
+    def embed_query(self, text):
+        """Embed a single query string"""
+        return self._model.embed_query(text)
+
+    def warm_up(self):
+        """Run one encode so the first real request doesn't pay for lazy init"""
+        with self._warm_lock:
+            if not self._warm:
+                self._model.embed_query("warm up")
+                self._warm = True
+
+def get_embedding_engine():
+    """Return the process-wide embedding engine, creating it on first use"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = EmbeddingEngine()
+    return _engine
+
+def warm_up_embedding_engine():
+    """Load and warm the shared model; cheap after the first call"""
+    engine = get_embedding_engine()
+    engine.warm_up()
+    return engine
@@ -0,0 +1,136 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from metrics import registry
+
+# Constants
+HISTORY_FLUSH_SIZE = int(os.getenv("HISTORY_FLUSH_SIZE", "50"))
+HISTORY_FLUSH_SECONDS = float(os.getenv("HISTORY_FLUSH_SECONDS", "1.0"))
+
+logger = logging.getLogger(__name__)
+
+def record_key(record):
+    """Identity of a history record shared by its buffered and stored copies; timestamps are in milliseconds"""
+    return (record["username"], record["pdf_hash"], record["timestamp"], record["question"])
+
+class HistoryWriter:
+    """Write-behind buffer for chat history and conversation meta
+
+    save() only appends to memory. A background thread flushes with one
+    bulk_write for meta upserts and one insert_many for history whenever
+    `max_batch` records are waiting or `interval` seconds have passed, and
+    once more at interpreter exit. Records stay visible through pending()
+    until they are written, so readers in this process see their own writes.
+    """
+
+    def __init__(self, history_collection, meta_collection, max_batch=HISTORY_FLUSH_SIZE, interval=HISTORY_FLUSH_SECONDS):
+        self.history_collection = history_collection
+        self.meta_collection = meta_collection
+        self.max_batch = max_batch
+        self.interval = interval
+        self._records = []
+        self._meta = {}
+        self._inflight_records = []
+        self._inflight_meta = {}
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self.flushes = 0
+        self.records_written = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def save(self, record, meta):
+        """Queue a history record and the meta document to insert if the conversation is new"""
+        # A client-side _id makes retried inserts idempotent
+        record = dict(record, _id=ObjectId())
+        with self._cond:
+            self._records.append(record)
+            self._meta.setdefault((meta["username"], meta["pdf_hash"]), meta)
+            if len(self._records) >= self.max_batch:
+                self._cond.notify()
+
+    def pending(self, username, pdf_hash=None):
+        """Unwritten records for a user (and conversation), oldest first"""
+        with self._cond:
+            records = self._inflight_records + self._records
+        return [
+            {key: value for key, value in record.items() if key != "_id"} for record in records
+            if record["username"] == username and (pdf_hash is None or record["pdf_hash"] == pdf_hash)
+        ]
+
+    def pending_meta(self, username, pdf_hash):
+        """Unwritten meta document for a conversation, if any"""
+        with self._cond:
+            meta = self._meta.get((username, pdf_hash)) or self._inflight_meta.get((username, pdf_hash))
+        return dict(meta) if meta else None
+
+    def flush(self):
+        """Write everything buffered so far; on failure the batch is kept for the next attempt"""
+        with self._flush_lock:
+            with self._cond:
+                if not self._records and not self._meta:
+                    return
+                self._inflight_records, self._records = self._records, []
+                self._inflight_meta, self._meta = self._meta, {}
+
+            try:
+                with registry.timer("db_seconds", op="history_flush"):
+                    if self._inflight_meta:
+                        self.meta_collection.bulk_write([
+                            UpdateOne(
+                                {"username": meta["username"], "pdf_hash": meta["pdf_hash"]},
+                                {"$setOnInsert": meta},
+                                upsert=True
+                            )
+                            for meta in self._inflight_meta.values()
+                        ], ordered=False)
+                    if self._inflight_records:
+                        try:
+                            self.history_collection.insert_many(self._inflight_records, ordered=False)
+                        except BulkWriteError as e:
+                            # Records already written by an earlier, partially failed flush
+                            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                                raise
+            except Exception:
+                logger.exception("history flush failed; %d records will be retried", len(self._inflight_records))
+                with self._cond:
+                    self._records = self._inflight_records + self._records
+                    for key, meta in self._inflight_meta.items():
+                        self._meta.setdefault(key, meta)
+                    self._inflight_records, self._inflight_meta = [], {}
+                raise
+
+            with self._cond:
+                self.flushes += 1
+                self.records_written += len(self._inflight_records)
+                self._inflight_records, self._inflight_meta = [], {}
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and len(self._records) < self.max_batch:
+                    self._cond.wait(self.interval)
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # Already logged; back off instead of spinning on a full buffer
+                time.sleep(self.interval)
+
+    def close(self):
+        """Stop the background thread and flush what is left"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout=self.interval * 2)
+        self.flush()
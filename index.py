@@ -1,97 +1,281 @@
 import os
 import hashlib
 import datetime
-from dotenv import load_dotenv
-from pymongo import MongoClient
-from gridfs import GridFS
-from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.document_loaders import PyPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-# Load environment variables
-load_dotenv()
-MONGO_URI = os.getenv("MONGO_URI")
+from database import db, fs, users_collection, history_collection, conversation_meta_collection
+from embedding_engine import get_embedding_engine
+from embedding_cache import make_chunk_embedder
+from index_factory import build_vector_store
+from pdf_ingest import split_pdf
+from history_writer import HistoryWriter, record_key
+from metrics import registry
+
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
-# Validate required environment variables
-if not MONGO_URI or not MISTRAL_API_KEY:
-    raise ValueError("Missing MONGO_URI or MISTRAL_API_KEY in .env")
+# Validate required environment variables; MONGO_URI is checked by database.py
+if not MISTRAL_API_KEY:
+    raise ValueError("Missing MISTRAL_API_KEY in .env")
+
+history_writer = HistoryWriter(history_collection, conversation_meta_collection)
+_chunk_embedder = None
+
+CONVERSATION_PAGE_SIZE = 20
+PDF_BLOCK_SIZE = 255 * 1024  # GridFS default chunk size
+EXPORT_BATCH_SIZE = 500
+
+# Bumped on every history write so per-session conversation lists know when to reload
+_history_versions = {}
+
+def history_version(username):
+    """Counter that changes whenever this user's history or conversation names change"""
+    return _history_versions.get(username, 0)
 
-# Initialize MongoDB connection
-client = MongoClient(MONGO_URI)
-db = client["pdf_qa_system"]
-fs = GridFS(db)
-users_collection = db["users"]
-history_collection = db["chat_history"]
-conversation_meta_collection = db["conversation_meta"]
+def _bump_history_version(username):
+    _history_versions[username] = _history_versions.get(username, 0) + 1
 
 def hash_pdf_bytes(pdf_bytes):
     """Generate SHA256 hash for PDF bytes"""
     return hashlib.sha256(pdf_bytes).hexdigest()
 
-def save_pdf_to_gridfs(pdf_bytes, filename):
-    """Save PDF to GridFS if not already exists"""
-    pdf_hash = hash_pdf_bytes(pdf_bytes)
-    if not fs.find_one({"metadata.hash": pdf_hash}):
-        fs.put(pdf_bytes, filename=filename, metadata={"hash": pdf_hash})
+def _copy_blocks(stream, digest, grid_in=None):
+    """Feed the stream block by block to the hash and, if given, a GridFS file; aborts the file on error"""
+    try:
+        for block in iter(lambda: stream.read(PDF_BLOCK_SIZE), b""):
+            digest.update(block)
+            if grid_in is not None:
+                grid_in.write(block)
+    except BaseException:
+        if grid_in is not None:
+            grid_in.abort()
+        raise
+    return digest.hexdigest()
+
+@registry.timed("db_seconds", op="save_pdf")
+def save_pdf_stream(stream, filename):
+    """Store an uploaded PDF in GridFS unless its hash is already there, returning the hash
+
+    The stream is read in GridFS-chunk-sized blocks, never as a whole.
+    Seekable uploads are hashed first so duplicates are never written;
+    other streams are hashed while their chunks are written, and the new
+    chunks are discarded if the hash turns out to be stored already.
+    """
+    if stream.seekable():
+        start = stream.tell()
+        pdf_hash = _copy_blocks(stream, hashlib.sha256())
+        if fs.exists({"metadata.hash": pdf_hash}):
+            return pdf_hash
+        stream.seek(start)
+        grid_in = fs.new_file(filename=filename, contentType="application/pdf", metadata={"hash": pdf_hash})
+        _copy_blocks(stream, hashlib.sha256(), grid_in)
+        grid_in.close()
+        return pdf_hash
+
+    grid_in = fs.new_file(filename=filename, contentType="application/pdf")
+    pdf_hash = _copy_blocks(stream, hashlib.sha256(), grid_in)
+    if fs.exists({"metadata.hash": pdf_hash}):
+        grid_in.abort()
+    else:
+        grid_in.metadata = {"hash": pdf_hash}
+        grid_in.close()
     return pdf_hash
 
-def load_pdf_from_gridfs(pdf_hash):
-    """Load PDF from GridFS by hash"""
-    file = fs.find_one({"metadata.hash": pdf_hash})
-    return file.read() if file else None
+def open_pdf_stream(pdf_hash):
+    """Seekable read stream over a stored PDF, or None; the caller closes it"""
+    return fs.find_one({"metadata.hash": pdf_hash})
 
-def load_and_process_pdf_from_bytes(pdf_bytes):
-    """Process PDF bytes into document chunks"""
-    with open("temp.pdf", "wb") as f:
-        f.write(pdf_bytes)
-    try:
-        loader = PyPDFLoader("temp.pdf")
-        documents = loader.load()
-        splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-        return splitter.split_documents(documents)
-    finally:
-        if os.path.exists("temp.pdf"):
-            os.remove("temp.pdf")
-
-def create_vector_store(documents):
-    """Create FAISS vector store from documents"""
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    return FAISS.from_documents(documents, embeddings)
-
-def save_chat_history(username, question, answer, pdf_hash):
-    """Save chat message and create conversation meta if needed"""
-    if not conversation_meta_collection.find_one({"username": username, "pdf_hash": pdf_hash}):
-        conversation_meta_collection.insert_one({
+def get_pdf_filenames(pdf_hashes):
+    """Uploaded filename for each stored PDF hash"""
+    files = db["fs.files"].find({"metadata.hash": {"$in": list(pdf_hashes)}}, {"filename": 1, "metadata.hash": 1})
+    return {file["metadata"]["hash"]: file["filename"] for file in files}
+
+def list_user_pdfs(username):
+    """Hashes of every PDF the user has a conversation about"""
+    pdf_hashes = set(history_collection.distinct("pdf_hash", {"username": username}))
+    pdf_hashes.update(record["pdf_hash"] for record in history_writer.pending(username))
+    pdf_hashes.discard(None)
+    return pdf_hashes
+
+def load_and_process_pdf(pdf, filename="document.pdf"):
+    """Process a PDF (bytes, path or open stream) into document chunks"""
+    return split_pdf(pdf, filename)
+
+def get_chunk_embedder():
+    """Ingest-time embeddings, backed by the chunk embedding cache"""
+    global _chunk_embedder
+    if _chunk_embedder is None:
+        _chunk_embedder = make_chunk_embedder(db["embedding_cache"])
+    return _chunk_embedder
+
+def create_vector_store(documents, progress=None):
+    """Create FAISS vector store from documents, reporting embedding progress as a 0-1 fraction"""
+    engine = get_embedding_engine()
+    embedder = get_chunk_embedder()
+    texts = [doc.page_content for doc in documents]
+    vectors = []
+    with registry.timer("ingest_seconds", stage="embed"):
+        for start in range(0, len(texts), engine.batch_size):
+            vectors.extend(embedder.embed_documents(texts[start:start + engine.batch_size]))
+            if progress:
+                progress(len(vectors) / len(texts))
+    with registry.timer("ingest_seconds", stage="index_build"):
+        return build_vector_store(texts, vectors, [doc.metadata for doc in documents], engine)
+
+@registry.timed("db_seconds", op="save_chat_history")
+def save_chat_history(username, question, answer, pdf_hash, timestamp=None):
+    """Queue chat message and conversation meta for the background writer
+
+    Timestamps are cut to milliseconds, as MongoDB stores them, so a
+    buffered record and its stored copy have the same record_key().
+    """
+    now = timestamp or datetime.datetime.now()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    history_writer.save(
+        {
+            "username": username,
+            "question": question,
+            "answer": answer,
+            "pdf_hash": pdf_hash,
+            "timestamp": now
+        },
+        {
             "username": username,
             "pdf_hash": pdf_hash,
             "conversation_name": question[:50],
-            "created_at": datetime.datetime.now(),
-            "updated_at": datetime.datetime.now()
-        })
-    
-    history_collection.insert_one({
-        "username": username,
-        "question": question,
-        "answer": answer,
-        "pdf_hash": pdf_hash,
-        "timestamp": datetime.datetime.now()
-    })
+            "created_at": now,
+            "updated_at": now
+        }
+    )
+    _bump_history_version(username)
+
+def _with_pending(stored, pending):
+    """Merge records still in the write-behind buffer into stored rows, newest first
 
+    Take the pending snapshot before querying so a flush in between cannot
+    hide a record from both sides.
+    """
+    if not pending:
+        return stored
+    seen = {record_key(record) for record in stored}
+    merged = stored + [record for record in pending if record_key(record) not in seen]
+    return sorted(merged, key=lambda record: record["timestamp"], reverse=True)
+
+@registry.timed("db_seconds", op="get_chat_history")
 def get_chat_history(username):
     """Get all chat history for a user, sorted by timestamp"""
-    return list(history_collection.find(
+    pending = history_writer.pending(username)
+    return _with_pending(list(history_collection.find(
         {"username": username}, 
         {"_id": 0}
-    ).sort("timestamp", -1))
+    ).sort("timestamp", -1)), pending)
+
+@registry.timed("db_seconds", op="list_conversations")
+def list_conversations(username, limit=CONVERSATION_PAGE_SIZE, cursor=None):
+    """One row per conversation (pdf_hash, conversation_name, latest, count), newest first
+
+    Returns (rows, next_cursor). Pass next_cursor back to fetch the following
+    page; it is None on the last page.
+    """
+    pending = history_writer.pending(username) if cursor is None else []
+    pipeline = [
+        {"$match": {"username": username, "pdf_hash": {"$ne": None}}},
+        {"$group": {"_id": "$pdf_hash", "latest": {"$max": "$timestamp"}, "count": {"$sum": 1}}}
+    ]
+    if cursor:
+        latest, pdf_hash = cursor
+        pipeline.append({"$match": {"$or": [
+            {"latest": {"$lt": latest}},
+            {"latest": latest, "_id": {"$lt": pdf_hash}}
+        ]}})
+    pipeline += [
+        {"$sort": {"latest": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$lookup": {
+            "from": conversation_meta_collection.name,
+            "let": {"h": "$_id"},
+            "pipeline": [
+                {"$match": {"username": username, "$expr": {"$eq": ["$pdf_hash", "$$h"]}}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "conversation_name": 1}}
+            ],
+            "as": "meta"
+        }}
+    ]
+
+    rows = []
+    for row in history_collection.aggregate(pipeline):
+        names = [meta["conversation_name"] for meta in row["meta"]]
+        rows.append({
+            "pdf_hash": row["_id"],
+            "conversation_name": names[0] if names else "New Conversation",
+            "latest": row["latest"],
+            "count": row["count"]
+        })
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = (rows[-1]["latest"], rows[-1]["pdf_hash"])
+    return _merge_pending_conversations(username, rows, pending), next_cursor
+
+def _merge_pending_conversations(username, rows, pending):
+    """Fold unwritten records into the first page of conversations
+
+    Pending records are the newest, so their conversations belong at the
+    top. Counts may briefly include a record twice if a flush lands between
+    the snapshot and the aggregation.
+    """
+    if not pending:
+        return rows
+    by_hash = {row["pdf_hash"]: row for row in rows}
+    for record in pending:
+        row = by_hash.get(record["pdf_hash"])
+        if row is None:
+            meta = get_conversation_meta(username, record["pdf_hash"])
+            row = by_hash[record["pdf_hash"]] = {
+                "pdf_hash": record["pdf_hash"],
+                "conversation_name": meta["conversation_name"] if meta else "New Conversation",
+                "latest": record["timestamp"],
+                "count": 0
+            }
+        row["latest"] = max(row["latest"], record["timestamp"])
+        row["count"] += 1
+    return sorted(by_hash.values(), key=lambda row: row["latest"], reverse=True)
+
+@registry.timed("db_seconds", op="get_conversation_messages")
+def get_conversation_messages(username, pdf_hash, since=None):
+    """Q&A rows for a single conversation, newest first; only those after `since` when given"""
+    pending = history_writer.pending(username, pdf_hash)
+    query = {"username": username, "pdf_hash": pdf_hash}
+    if since is not None and since > datetime.datetime.min:
+        query["timestamp"] = {"$gt": since}
+        pending = [record for record in pending if record["timestamp"] > since]
+    return _with_pending(list(history_collection.find(
+        query,
+        {"_id": 0}
+    ).sort("timestamp", -1)), pending)
+
+def iter_conversation_messages(username, pdf_hash, batch_size=EXPORT_BATCH_SIZE):
+    """Stream a conversation as user/assistant messages, oldest first, without loading it whole"""
+    pending = {record_key(record): record for record in history_writer.pending(username, pdf_hash)}
+    rows = history_collection.find(
+        {"username": username, "pdf_hash": pdf_hash},
+        {"_id": 0, "question": 1, "answer": 1, "timestamp": 1, "username": 1, "pdf_hash": 1}
+    ).sort("timestamp", 1).batch_size(batch_size)
+    for row in rows:
+        pending.pop(record_key(row), None)
+        yield {"role": "user", "content": row["question"], "timestamp": row["timestamp"]}
+        yield {"role": "assistant", "content": row["answer"], "timestamp": row["timestamp"]}
+    # Records still in the write buffer are the newest ones
+    for record in sorted(pending.values(), key=lambda record: record["timestamp"]):
+        yield {"role": "user", "content": record["question"], "timestamp": record["timestamp"]}
+        yield {"role": "assistant", "content": record["answer"], "timestamp": record["timestamp"]}
 
 def get_conversation_meta(username, pdf_hash):
     """Get conversation metadata"""
-    return conversation_meta_collection.find_one(
+    meta = conversation_meta_collection.find_one(
         {"username": username, "pdf_hash": pdf_hash},
         {"_id": 0}
     )
+    return meta or history_writer.pending_meta(username, pdf_hash)
 
 def update_conversation_name(username, pdf_hash, new_name):
     """Update conversation name in database"""
@@ -103,4 +287,5 @@ def update_conversation_name(username, pdf_hash, new_name):
         }},
         upsert=True
     )
+    _bump_history_version(username)
     return result.modified_count > 0
\ No newline at end of file
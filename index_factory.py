@@ -0,0 +1,110 @@
+import os
+import math
+import time
+import uuid
+import logging
+import faiss
+import numpy as np
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.vectorstores import FAISS
+from sparse_index import BM25Index
+
+# Constants
+FAISS_INDEX_MODE = os.getenv("FAISS_INDEX_MODE", "auto")  # "auto", "flat", "sq", "hnsw", "ivfsq" or "ivfpq"
+FAISS_HNSW_MIN_CHUNKS = int(os.getenv("FAISS_HNSW_MIN_CHUNKS", "20000"))
+FAISS_IVF_MIN_CHUNKS = int(os.getenv("FAISS_IVF_MIN_CHUNKS", "200000"))
+FAISS_HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+FAISS_PQ_M = int(os.getenv("FAISS_PQ_M", "48"))
+FAISS_NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+FAISS_EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+IVF_MIN_POINTS_PER_CENTROID = 39
+
+logger = logging.getLogger(__name__)
+
+def choose_mode(num_vectors, mode=FAISS_INDEX_MODE):
+    """Resolve "auto" to a concrete index mode from the chunk count"""
+    if mode != "auto":
+        return mode
+    if num_vectors < FAISS_HNSW_MIN_CHUNKS:
+        return "flat"
+    if num_vectors < FAISS_IVF_MIN_CHUNKS:
+        return "hnsw"
+    return "ivfsq"
+
+def _pq_subquantizers(dimension):
+    """Largest sub-quantizer count up to FAISS_PQ_M that divides the dimension"""
+    return max(m for m in range(1, min(FAISS_PQ_M, dimension) + 1) if dimension % m == 0)
+
+def factory_string(num_vectors, dimension, mode=FAISS_INDEX_MODE):
+    """faiss.index_factory description for a mode and collection size"""
+    mode = choose_mode(num_vectors, mode)
+    if mode == "flat":
+        return "Flat"
+    if mode == "sq":
+        return "SQfp16"
+    if mode == "hnsw":
+        return f"HNSW{FAISS_HNSW_M}_SQfp16"
+    # ~4*sqrt(n) lists, but never more than the training set can support
+    nlist = max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // IVF_MIN_POINTS_PER_CENTROID))
+    if mode == "ivfsq":
+        return f"IVF{nlist},SQ8"
+    if mode == "ivfpq":
+        return f"IVF{nlist},PQ{_pq_subquantizers(dimension)}"
+    raise ValueError(f"Unknown FAISS index mode: {mode}")
+
+def apply_search_params(index, nprobe=FAISS_NPROBE, ef_search=FAISS_EF_SEARCH):
+    """Set query-time knobs (IVF nprobe, HNSW efSearch) on a built or loaded index"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(nprobe, index.nlist)
+    elif isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
+    return index
+
+def index_memory_bytes(index):
+    """Approximate resident size of a FAISS index's codes and graph/list structures"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        links = index.hnsw.nb_neighbors(0) * 4
+        return index.ntotal * (storage.code_size + links)
+    if isinstance(index, faiss.IndexIVF):
+        return index.ntotal * (index.code_size + 8) + index.nlist * index.d * 4
+    code_size = getattr(index, "code_size", index.d * 4)
+    return index.ntotal * code_size
+
+def reconstruct_vectors(index):
+    """All stored vectors of an index as float32 (decoded, so lossy for quantized indexes)"""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+def build_index(vectors, mode=FAISS_INDEX_MODE):
+    """Train (if needed) and fill a FAISS index for the given float32 vectors"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    description = factory_string(len(vectors), vectors.shape[1], mode)
+    start = time.perf_counter()
+    index = faiss.index_factory(vectors.shape[1], description)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    apply_search_params(index)
+    logger.info(
+        "built %s index: %d vectors, %.1f MB, %.2f s",
+        description, index.ntotal, index_memory_bytes(index) / 1e6, time.perf_counter() - start
+    )
+    return index
+
+def build_vector_store(texts, vectors, metadatas, embedding, mode=FAISS_INDEX_MODE):
+    """LangChain FAISS store over an index chosen by build_index, with its BM25 index attached"""
+    index = build_index(vectors, mode)
+    ids = [str(uuid.uuid4()) for _ in texts]
+    docstore = InMemoryDocstore({
+        doc_id: Document(page_content=text, metadata=metadata)
+        for doc_id, text, metadata in zip(ids, texts, metadatas)
+    })
+    vector_store = FAISS(embedding, index, docstore, dict(enumerate(ids)))
+    vector_store.sparse_index = BM25Index.from_texts(texts)
+    return vector_store
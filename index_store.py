@@ -0,0 +1,143 @@
+import os
+import pickle
+import shutil
+import tempfile
+import faiss
+from langchain.vectorstores import FAISS
+from embedding_engine import get_embedding_engine
+from index_factory import apply_search_params
+from retrieval import get_sparse_index
+from index import fs
+from metrics import registry
+
+# Constants
+INDEX_STORE_BACKEND = os.getenv("INDEX_STORE_BACKEND", "local")  # "local" or "gridfs"
+INDEX_STORE_DIR = os.getenv("INDEX_STORE_DIR", "index_store")
+INDEX_FILENAME = "index.faiss"
+DOCSTORE_FILENAME = "docstore.pkl"
+SPARSE_FILENAME = "bm25.pkl"
+
+# Persisted file -> GridFS "kind"
+FILE_KINDS = {
+    INDEX_FILENAME: "faiss_index",
+    DOCSTORE_FILENAME: "faiss_docstore",
+    SPARSE_FILENAME: "bm25_index"
+}
+
+def _index_dir(pdf_hash):
+    """Local directory holding the index files for a PDF hash"""
+    return os.path.join(INDEX_STORE_DIR, pdf_hash)
+
+def _write_local(pdf_hash, files):
+    """Atomically write index files so readers never see a partial index"""
+    os.makedirs(INDEX_STORE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=INDEX_STORE_DIR, prefix=f".{pdf_hash}-")
+    try:
+        for filename, data in files.items():
+            with open(os.path.join(tmp_dir, filename), "wb") as f:
+                f.write(data)
+        try:
+            os.rename(tmp_dir, _index_dir(pdf_hash))
+        except OSError:
+            # Another session saved the same PDF first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+def _fetch_from_gridfs(pdf_hash):
+    """Copy a GridFS-stored index into the local directory so it can be memory-mapped"""
+    files = {}
+    for filename, kind in FILE_KINDS.items():
+        stored = fs.find_one({"metadata.pdf_hash": pdf_hash, "metadata.kind": kind})
+        if stored:
+            files[filename] = stored.read()
+    # Indexes saved before BM25 was added have no sparse file; it is rebuilt on load
+    if INDEX_FILENAME not in files or DOCSTORE_FILENAME not in files:
+        return False
+    _write_local(pdf_hash, files)
+    return True
+
+def has_vector_store(pdf_hash):
+    """Check whether an index for pdf_hash has been persisted"""
+    if os.path.exists(os.path.join(_index_dir(pdf_hash), INDEX_FILENAME)):
+        return True
+    if INDEX_STORE_BACKEND == "gridfs":
+        return fs.exists({"metadata.pdf_hash": pdf_hash, "metadata.kind": "faiss_index"})
+    return False
+
+@registry.timed("db_seconds", op="save_vector_store")
+def save_vector_store(pdf_hash, vector_store):
+    """Persist a FAISS vector store, its chunk docstore and BM25 index by PDF hash"""
+    files = {
+        INDEX_FILENAME: faiss.serialize_index(vector_store.index).tobytes(),
+        DOCSTORE_FILENAME: pickle.dumps((vector_store.docstore, vector_store.index_to_docstore_id)),
+        SPARSE_FILENAME: pickle.dumps(get_sparse_index(vector_store))
+    }
+
+    if INDEX_STORE_BACKEND == "gridfs" and not fs.exists({"metadata.pdf_hash": pdf_hash, "metadata.kind": "faiss_index"}):
+        # The index goes last: has_vector_store() treats its presence as "complete"
+        for filename in (SPARSE_FILENAME, DOCSTORE_FILENAME, INDEX_FILENAME):
+            fs.put(files[filename], filename=f"{pdf_hash}-{filename}", metadata={"pdf_hash": pdf_hash, "kind": FILE_KINDS[filename]})
+
+    if not os.path.exists(_index_dir(pdf_hash)):
+        _write_local(pdf_hash, files)
+
+def delete_vector_store(pdf_hash):
+    """Remove a persisted index locally and, with the gridfs backend, from GridFS"""
+    shutil.rmtree(_index_dir(pdf_hash), ignore_errors=True)
+    if INDEX_STORE_BACKEND == "gridfs":
+        for stored in fs.find({"metadata.pdf_hash": pdf_hash}):
+            fs.delete(stored._id)
+
+def touch_vector_store(pdf_hash):
+    """Mark a persisted index as used now, for prune_vector_stores()"""
+    try:
+        os.utime(_index_dir(pdf_hash))
+    except FileNotFoundError:
+        pass
+
+def prune_vector_stores(prefix, limit):
+    """Delete the least recently used local indexes whose key starts with prefix beyond `limit`; returns their keys"""
+    try:
+        keys = [name for name in os.listdir(INDEX_STORE_DIR) if name.startswith(prefix)]
+    except FileNotFoundError:
+        return []
+
+    def last_used(key):
+        try:
+            return os.path.getmtime(_index_dir(key))
+        except FileNotFoundError:
+            return 0.0
+
+    stale = sorted(keys, key=last_used, reverse=True)[limit:]
+    for key in stale:
+        delete_vector_store(key)
+    return stale
+
+@registry.timed("db_seconds", op="load_vector_store")
+def load_vector_store(pdf_hash):
+    """Load a persisted vector store by PDF hash, or None if it was never saved"""
+    index_dir = _index_dir(pdf_hash)
+    index_path = os.path.join(index_dir, INDEX_FILENAME)
+    if not os.path.exists(index_path):
+        if INDEX_STORE_BACKEND != "gridfs" or not _fetch_from_gridfs(pdf_hash):
+            return None
+
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        # Index types without mmap support are read into memory
+        index = faiss.read_index(index_path)
+    # Trained centroids/codebooks are in the file; nprobe/efSearch follow the current config
+    apply_search_params(index)
+
+    with open(os.path.join(index_dir, DOCSTORE_FILENAME), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    vector_store = FAISS(get_embedding_engine(), index, docstore, index_to_docstore_id)
+    sparse_path = os.path.join(index_dir, SPARSE_FILENAME)
+    if os.path.exists(sparse_path):
+        with open(sparse_path, "rb") as f:
+            vector_store.sparse_index = pickle.load(f)
+    return vector_store
@@ -0,0 +1,171 @@
+import os
+import time
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo.errors import PyMongoError
+from index import db, load_and_process_pdf, create_vector_store, open_pdf_stream
+from job_states import QUEUED, PARSING, EMBEDDING, INDEXED, FAILED, ACTIVE_STATES
+from index_store import load_vector_store, save_vector_store
+from vector_cache import vector_cache
+from metrics import registry
+
+# Constants
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.getenv("INGEST_JOB_RETENTION_SECONDS", "600"))
+# A shared job record not updated for this long belongs to a worker that died mid-ingest
+JOB_STALE_SECONDS = int(os.getenv("INGEST_JOB_STALE_SECONDS", "900"))
+STATUS_PUBLISH_SECONDS = 1.0
+
+ingest_jobs_collection = db["ingest_jobs"]
+logger = logging.getLogger(__name__)
+
+class IngestJob:
+    """Progress of one PDF through parse -> embed -> index"""
+
+    def __init__(self, pdf_hash, filename):
+        self.pdf_hash = pdf_hash
+        self.filename = filename
+        self.state = QUEUED
+        self.progress = 0.0
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.published_at = 0.0
+
+    @property
+    def done(self):
+        return self.state in (INDEXED, FAILED)
+
+class IngestScheduler:
+    """Thread pool that ingests uploads in the background, one job per PDF hash"""
+
+    def __init__(self, workers=INGEST_WORKERS, collection=ingest_jobs_collection):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ingest")
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._collection = collection
+
+    def submit(self, pdf_hash, filename):
+        """Queue a PDF already stored in GridFS for ingestion
+
+        Returns the existing job if one is queued, running or done.
+        """
+        with self._lock:
+            self._prune()
+            job = self._jobs.get(pdf_hash)
+            if job is not None and job.state != FAILED:
+                return job
+            job = IngestJob(pdf_hash, filename)
+            self._jobs[pdf_hash] = job
+        self._publish(job)
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, pdf_hash):
+        """Job for pdf_hash, or None if nothing was submitted recently"""
+        with self._lock:
+            return self._jobs.get(pdf_hash)
+
+    def is_pending(self, pdf_hash):
+        """True while a PDF is queued or being processed in this process"""
+        job = self.get(pdf_hash)
+        return job is not None and not job.done
+
+    def status(self, pdf_hash):
+        """{"state", "progress", "error"} from this process's job or, failing that, the shared record; None if neither exists"""
+        job = self.get(pdf_hash)
+        if job is not None:
+            return {"state": job.state, "progress": job.progress, "error": job.error}
+        if self._collection is None:
+            return None
+        record = self._collection.find_one({"_id": pdf_hash})
+        if record is None:
+            return None
+        if record["state"] in ACTIVE_STATES and record["updated_at"] < self._stale_cutoff():
+            return {"state": FAILED, "progress": record["progress"], "error": "ingest worker stopped responding"}
+        return {"state": record["state"], "progress": record["progress"], "error": record.get("error")}
+
+    def active(self, pdf_hashes):
+        """The PDFs among pdf_hashes that any worker is still ingesting, with one query for the shared records"""
+        pdf_hashes = set(pdf_hashes)
+        active = {pdf_hash for pdf_hash in pdf_hashes if self.is_pending(pdf_hash)}
+        others = [pdf_hash for pdf_hash in pdf_hashes - active if self.get(pdf_hash) is None]
+        if others and self._collection is not None:
+            active.update(record["_id"] for record in self._collection.find(
+                {"_id": {"$in": others}, "state": {"$in": list(ACTIVE_STATES)}, "updated_at": {"$gte": self._stale_cutoff()}},
+                {"_id": 1}
+            ))
+        return active
+
+    def _stale_cutoff(self):
+        return datetime.datetime.now() - datetime.timedelta(seconds=JOB_STALE_SECONDS)
+
+    def _publish(self, job, throttle=False):
+        """Mirror a job's state to the shared collection so every API worker can report it"""
+        if self._collection is None:
+            return
+        now = time.time()
+        if throttle and now - job.published_at < STATUS_PUBLISH_SECONDS:
+            return
+        job.published_at = now
+        try:
+            self._collection.update_one(
+                {"_id": job.pdf_hash},
+                {"$set": {
+                    "filename": job.filename,
+                    "state": job.state,
+                    "progress": job.progress,
+                    "error": job.error,
+                    "updated_at": datetime.datetime.now()
+                }},
+                upsert=True
+            )
+        except PyMongoError as e:
+            logger.warning("could not publish ingest status for %s: %s", job.pdf_hash, e)
+
+    def _prune(self):
+        """Forget finished jobs past the retention window; caller holds the lock"""
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for pdf_hash in [h for h, job in self._jobs.items() if job.done and job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[pdf_hash]
+
+    def _run(self, job):
+        state = FAILED
+        try:
+            vs = load_vector_store(job.pdf_hash)
+            if vs is None:
+                job.state = PARSING
+                self._publish(job)
+                stream = open_pdf_stream(job.pdf_hash)
+                if stream is None:
+                    raise ValueError(f"{job.filename} is not in storage")
+                with stream:
+                    docs = load_and_process_pdf(stream, job.filename)
+                job.state = EMBEDDING
+                job.progress = 0.0
+                self._publish(job)
+
+                def report(fraction):
+                    job.progress = fraction
+                    self._publish(job, throttle=True)
+
+                vs = create_vector_store(docs, progress=report)
+                save_vector_store(job.pdf_hash, vs)
+            vector_cache.load(job.pdf_hash, lambda: vs)
+            job.progress = 1.0
+            state = INDEXED
+        except Exception as e:
+            logger.exception("ingest of %s failed", job.pdf_hash)
+            job.error = str(e)
+        finally:
+            # finished_at first: _prune() reads it from any job whose state is final
+            job.finished_at = time.time()
+            job.state = state
+            self._publish(job)
+            registry.inc("ingest_jobs_total", state=job.state)
+            registry.observe("ingest_job_seconds", job.finished_at - job.submitted_at, state=job.state)
+
+# Shared by every Streamlit session and API request in this process
+ingest_scheduler = IngestScheduler()
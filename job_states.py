@@ -0,0 +1,7 @@
+# Ingest job states, shared by the scheduler, the API and its thin client; no imports, so clients stay light
+QUEUED = "queued"
+PARSING = "parsing"
+EMBEDDING = "embedding"
+INDEXED = "indexed"
+FAILED = "failed"
+ACTIVE_STATES = (QUEUED, PARSING, EMBEDDING)
@@ -0,0 +1,69 @@
+import os
+import hashlib
+import numpy as np
+from embedding_engine import get_embedding_engine
+from index import get_pdf_filenames
+from index_factory import build_vector_store, reconstruct_vectors
+from index_store import load_vector_store, save_vector_store, touch_vector_store, prune_vector_stores
+
+# Constants
+LIBRARY_TOP_K = int(os.getenv("LIBRARY_TOP_K", "5"))
+LIBRARY_STORE_LIMIT = int(os.getenv("LIBRARY_STORE_LIMIT", "32"))  # merged indexes kept on disk
+
+def library_key(pdf_hashes):
+    """Stable id of the merged index over a set of PDFs"""
+    digest = hashlib.sha256("\n".join(sorted(pdf_hashes)).encode()).hexdigest()
+    return f"library-{digest}"
+
+def merge_vector_stores(stores, filenames, embedding):
+    """One vector store over several per-PDF stores, tagging chunks with pdf_hash and filename
+
+    Vectors are copied out of the existing indexes, so nothing is re-embedded.
+    """
+    texts, vectors, metadatas = [], [], []
+    for pdf_hash, vs in stores.items():
+        vectors.append(reconstruct_vectors(vs.index))
+        for position in range(vs.index.ntotal):
+            doc = vs.docstore.search(vs.index_to_docstore_id[position])
+            texts.append(doc.page_content)
+            metadatas.append(dict(
+                doc.metadata,
+                pdf_hash=pdf_hash,
+                filename=filenames.get(pdf_hash) or doc.metadata.get("source", pdf_hash)
+            ))
+    if not texts:
+        return None
+    return build_vector_store(texts, np.vstack(vectors), metadatas, embedding)
+
+def get_library_store(pdf_hashes, loader):
+    """Persisted merged store for a set of PDFs, built from their per-PDF stores on first use
+
+    A library's key changes whenever a PDF is added, so saving a new one
+    deletes the least recently used beyond LIBRARY_STORE_LIMIT. One that is
+    deleted while still in use is rebuilt on its next load.
+    """
+    key = library_key(pdf_hashes)
+    try:
+        vs = load_vector_store(key)
+    except FileNotFoundError:
+        # Pruned by another worker between the existence check and the read
+        vs = None
+    if vs is not None:
+        touch_vector_store(key)
+    else:
+        stores = {}
+        for pdf_hash in sorted(pdf_hashes):
+            store = loader(pdf_hash)
+            if store is not None:
+                stores[pdf_hash] = store
+        vs = merge_vector_stores(stores, get_pdf_filenames(stores), get_embedding_engine())
+        if vs is not None:
+            save_vector_store(key, vs)
+            prune_vector_stores("library-", LIBRARY_STORE_LIMIT)
+    return vs
+
+def cite(doc):
+    """Source label for a library chunk or context span: file name and 1-based page"""
+    page = doc.metadata.get("page")
+    filename = doc.metadata.get("filename", "document.pdf")
+    return f"{filename}, p. {page + 1}" if page is not None else filename
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import random
+import threading
+import datetime
+from collections import deque
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from metrics import registry
+
+# Constants
+MISTRAL_MODEL = "mistral-small"
+MISTRAL_API_URL = os.getenv("MISTRAL_API_URL", "https://api.mistral.ai/v1/chat/completions")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_RETRY_AFTER_MAX = float(os.getenv("LLM_RETRY_AFTER_MAX", "120"))  # longest Retry-After honoured, against bogus values
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LatencyStats:
+    """Rolling latency samples and counters for LLM calls"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._ttft = deque(maxlen=window)
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+
+    def record(self, latency, ttft=None, error=False):
+        with self._lock:
+            self.calls += 1
+            if error:
+                self.errors += 1
+            else:
+                self._latencies.append(latency)
+                if ttft is not None:
+                    self._ttft.append(ttft)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            ttft = list(self._ttft)
+            return {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+                "latency_p50": _percentile(latencies, 0.5),
+                "latency_p95": _percentile(latencies, 0.95),
+                "ttft_p50": _percentile(ttft, 0.5),
+                "ttft_p95": _percentile(ttft, 0.95)
+            }
+
+def _retry_after_seconds(response):
+    """Parse a Retry-After header given as seconds or an HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (when - datetime.datetime.now(when.tzinfo)).total_seconds())
+
+class LLMClient:
+    """Shared chat-completions client
+
+    Keeps a pooled keep-alive session, caps in-flight requests across all
+    sessions with a semaphore, and retries 429/5xx and connection errors
+    with jittered exponential backoff that honours Retry-After.
+    """
+
+    def __init__(self, api_url=MISTRAL_API_URL, max_concurrency=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_max=LLM_BACKOFF_MAX, retry_after_max=LLM_RETRY_AFTER_MAX):
+        self.api_url = api_url
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.metrics = LatencyStats()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+
+    def _headers(self):
+        return {
+            "Authorization": f"Bearer {os.getenv('MISTRAL_API_KEY')}",
+            "Content-Type": "application/json"
+        }
+
+    def _backoff(self, attempt):
+        """Full-jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _post(self, payload, timeout, stream=False):
+        """POST with retries; returns a response with a 2xx status or raises"""
+        attempt = 0
+        while True:
+            try:
+                response = self._session.post(
+                    self.api_url,
+                    headers=self._headers(),
+                    json=payload,
+                    timeout=timeout,
+                    stream=stream
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                if attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    response.raise_for_status()
+                    return response
+                retry_after = _retry_after_seconds(response)
+                # The server's wait wins over backoff_max, which only caps the jittered fallback
+                delay = min(self.retry_after_max, retry_after) if retry_after is not None else self._backoff(attempt)
+                response.close()
+            self.metrics.record_retry()
+            registry.inc("llm_retries_total")
+            time.sleep(delay)
+            attempt += 1
+
+    def chat_completion(self, messages, temperature, timeout):
+        """Blocking chat completion; returns the full message content"""
+        with self._semaphore:
+            start = time.perf_counter()
+            try:
+                response = self._post(
+                    {"model": MISTRAL_MODEL, "messages": messages, "temperature": temperature},
+                    timeout
+                )
+                content = response.json()["choices"][0]["message"]["content"]
+            except Exception:
+                self.metrics.record(time.perf_counter() - start, error=True)
+                registry.inc("llm_errors_total", call="complete")
+                raise
+            elapsed = time.perf_counter() - start
+            self.metrics.record(elapsed)
+            registry.observe("llm_seconds", elapsed, call="complete")
+            return content
+
+    def stream_chat_completion(self, messages, temperature, timeout):
+        """Streaming chat completion; yields content tokens as they arrive"""
+        with self._semaphore:
+            start = time.perf_counter()
+            ttft = None
+            try:
+                with self._post(
+                    {"model": MISTRAL_MODEL, "messages": messages, "temperature": temperature, "stream": True},
+                    timeout,
+                    stream=True
+                ) as response:
+                    # SSE is always UTF-8; without a charset requests would decode it as ISO-8859-1
+                    response.encoding = "utf-8"
+                    for token in iter_sse_content(response.iter_lines(decode_unicode=True)):
+                        if ttft is None:
+                            ttft = time.perf_counter() - start
+                        yield token
+            except GeneratorExit:
+                raise
+            except Exception:
+                self.metrics.record(time.perf_counter() - start, error=True)
+                registry.inc("llm_errors_total", call="stream")
+                raise
+            elapsed = time.perf_counter() - start
+            self.metrics.record(elapsed, ttft=ttft)
+            registry.observe("llm_seconds", elapsed, call="stream")
+            if ttft is not None:
+                registry.observe("llm_ttft_seconds", ttft, call="stream")
+
+def iter_sse_content(lines):
+    """Yield content deltas from chat-completions server-sent event lines"""
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            break
+        choices = json.loads(data).get("choices") or [{}]
+        content = choices[0].get("delta", {}).get("content")
+        if content:
+            yield content
+
+# Shared by every Streamlit session in this process
+default_client = LLMClient()
+
+def chat_completion(messages, temperature, timeout):
+    """Blocking chat completion through the shared client"""
+    return default_client.chat_completion(messages, temperature, timeout)
+
+def stream_chat_completion(messages, temperature, timeout):
+    """Streaming chat completion through the shared client"""
+    return default_client.stream_chat_completion(messages, temperature, timeout)
@@ -1,6 +1,6 @@
 import streamlit as st
 import bcrypt
-from index import users_collection
+from database import users_collection
 
 def login_page():
     if "auth_mode" not in st.session_state:
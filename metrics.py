@@ -0,0 +1,255 @@
+import os
+import time
+import atexit
+import bisect
+import logging
+import functools
+import threading
+from contextlib import nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Constants
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "false").lower() == "true"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # serve Prometheus text on /metrics when > 0
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_DUMP_PATH = os.getenv("METRICS_DUMP_PATH", "")  # rewritten every METRICS_DUMP_SECONDS and at exit when set
+METRICS_DUMP_SECONDS = float(os.getenv("METRICS_DUMP_SECONDS", "60"))
+METRICS_ADMINS = {name.strip() for name in os.getenv("METRICS_ADMINS", "").split(",") if name.strip()}
+METRIC_PREFIX = "pdfqa_"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+logger = logging.getLogger(__name__)
+
+_NULL_TIMER = nullcontext()
+
+class Histogram:
+    """Per-bucket counts plus sum and count of observed values"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.min = float("inf")
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimate by linear interpolation inside the bucket holding the q-th observation"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[i - 1] if i else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.max
+                estimate = lower + (upper - lower) * (rank - seen) / count
+                return min(max(estimate, self.min), self.max)
+            seen += count
+        return self.max
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry._observe(self.name, time.perf_counter() - self.start, self.labels)
+        if exc_type is not None and not issubclass(exc_type, GeneratorExit):
+            self.registry._inc(self.name.replace("_seconds", "_errors_total"), 1, self.labels)
+        return False
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+class MetricsRegistry:
+    """Process-wide latency histograms and counters keyed by metric name and labels
+
+    Disabled registries hand out a shared no-op context manager and return
+    undecorated functions, so instrumented code pays one attribute check.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def timer(self, name, **labels):
+        """Context manager observing the elapsed seconds of its block; errors also bump <name>_errors_total"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def timed(self, name, **labels):
+        """Decorator form of timer()"""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with _Timer(self, name, labels):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def observe(self, name, value, **labels):
+        """Record one observation, e.g. a latency measured elsewhere"""
+        if self.enabled:
+            self._observe(name, value, labels)
+
+    def inc(self, name, amount=1, **labels):
+        if self.enabled:
+            self._inc(name, amount, labels)
+
+    def _observe(self, name, value, labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def _inc(self, name, amount, labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self):
+        """(histogram rows, counter rows) sorted by metric, for display"""
+        with self._lock:
+            histograms = [
+                {
+                    "metric": name,
+                    "labels": ", ".join(f"{k}={v}" for k, v in key),
+                    "count": h.count,
+                    "mean_ms": round(1000 * h.sum / h.count, 1) if h.count else None,
+                    "p50_ms": round(1000 * h.quantile(0.5), 1) if h.count else None,
+                    "p95_ms": round(1000 * h.quantile(0.95), 1) if h.count else None,
+                    "total_s": round(h.sum, 3)
+                }
+                for (name, key), h in self._histograms.items()
+            ]
+            counters = [
+                {"metric": name, "labels": ", ".join(f"{k}={v}" for k, v in key), "value": value}
+                for (name, key), value in self._counters.items()
+            ]
+        order = lambda row: (row["metric"], row["labels"])
+        return sorted(histograms, key=order), sorted(counters, key=order)
+
+    def render_prometheus(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            histograms = sorted(
+                ((name, key, list(h.counts), h.sum, h.count, h.buckets) for (name, key), h in self._histograms.items()),
+                key=lambda row: row[:2]
+            )
+            counters = sorted(self._counters.items())
+
+        lines = []
+        declared = set()
+        for name, key, counts, total, count, buckets in histograms:
+            metric = METRIC_PREFIX + name
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} histogram")
+                declared.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{metric}_bucket{_format_labels(key, [('le', le)])} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(key)} {total}")
+            lines.append(f"{metric}_count{_format_labels(key)} {count}")
+        for (name, key), value in counters:
+            metric = METRIC_PREFIX + name
+            if metric not in declared:
+                lines.append(f"# TYPE {metric} counter")
+                declared.add(metric)
+            lines.append(f"{metric}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path=METRICS_DUMP_PATH):
+        """Atomically rewrite path with the Prometheus text, e.g. for node_exporter's textfile collector"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.render_prometheus())
+        os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def _dump_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            registry.dump(path)
+        except OSError as e:
+            logger.warning("metrics dump to %s failed: %s", path, e)
+
+# Shared by every Streamlit session in this process
+registry = MetricsRegistry()
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+def start_exporters_once():
+    """Start the /metrics endpoint and the periodic dump if configured, at most once per process"""
+    global _exporters_started
+    if not registry.enabled or _exporters_started:
+        return
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+        if METRICS_PORT:
+            try:
+                server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), _MetricsHandler)
+            except OSError as e:
+                logger.warning("metrics endpoint on %s:%d unavailable: %s", METRICS_HOST, METRICS_PORT, e)
+            else:
+                threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+                logger.info("serving metrics on http://%s:%d/metrics", METRICS_HOST, METRICS_PORT)
+        if METRICS_DUMP_PATH:
+            threading.Thread(target=_dump_loop, args=(METRICS_DUMP_PATH, METRICS_DUMP_SECONDS), name="metrics-dump", daemon=True).start()
+            atexit.register(registry.dump, METRICS_DUMP_PATH)
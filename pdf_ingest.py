@@ -0,0 +1,148 @@
+import os
+import shutil
+import tempfile
+import threading
+import multiprocessing
+from io import BytesIO
+from itertools import repeat
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pypdf import PdfReader
+from langchain.docstore.document import Document
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from metrics import registry
+
+# Constants
+CHUNK_SIZE = 500
+CHUNK_OVERLAP = 100
+PDF_PARSE_WORKERS = int(os.getenv("PDF_PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARALLEL_PARSE_MIN_PAGES = int(os.getenv("PARALLEL_PARSE_MIN_PAGES", "40"))
+PAGES_PER_TASK = int(os.getenv("PAGES_PER_TASK", "16"))
+SPOOL_BLOCK_SIZE = 1024 * 1024
+
+# Workers start from a fresh interpreter rather than a fork of a process holding
+# MongoDB clients, FAISS indexes and threads; fork is left out on purpose
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Shared by every ingest in this process; started on first use and kept warm
+_pool = None
+_pool_lock = threading.Lock()
+
+def make_splitter():
+    """Text splitter shared by the serial and parallel paths
+
+    start_index lets the context builder merge overlapping chunks exactly.
+    """
+    return RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+
+def open_pdf(pdf):
+    """Seekable binary stream over a PDF given as bytes, a file path or an open stream"""
+    if isinstance(pdf, (bytes, bytearray, memoryview)):
+        return nullcontext(BytesIO(pdf))
+    if isinstance(pdf, (str, os.PathLike)):
+        return open(pdf, "rb")
+    pdf.seek(0)
+    return nullcontext(pdf)
+
+def count_pdf_pages(pdf):
+    """Number of pages in a PDF"""
+    with open_pdf(pdf) as stream:
+        return len(PdfReader(stream).pages)
+
+def _extract_pages(reader, filename, start, end):
+    return [
+        Document(page_content=reader.pages[page].extract_text(), metadata={"source": filename, "page": page})
+        for page in range(start, end)
+    ]
+
+def load_pdf_pages(pdf, filename="document.pdf"):
+    """Parse a PDF into one Document per page"""
+    with open_pdf(pdf) as stream:
+        reader = PdfReader(stream)
+        return _extract_pages(reader, filename, 0, len(reader.pages))
+
+def split_pdf_serial(pdf, filename="document.pdf"):
+    """Extract and chunk every page in the current process"""
+    with registry.timer("ingest_seconds", stage="parse"):
+        pages = load_pdf_pages(pdf, filename)
+    with registry.timer("ingest_seconds", stage="split"):
+        return make_splitter().split_documents(pages)
+
+def get_parse_pool():
+    """Process pool of PDF_PARSE_WORKERS parse workers, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context(PARSE_START_METHOD)
+            )
+        return _pool
+
+def _discard_pool(pool):
+    """Drop a broken pool so the next call starts a new one"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def _split_page_range(path, filename, start, end):
+    """Extract and chunk pages [start, end) inside a worker process"""
+    with open(path, "rb") as stream:
+        pages = _extract_pages(PdfReader(stream), filename, start, end)
+    return make_splitter().split_documents(pages)
+
+def split_pdf_parallel(pdf, filename="document.pdf", pages_per_task=PAGES_PER_TASK):
+    """Extract and chunk page ranges in the shared process pool, merged back in page order
+
+    Workers open the file themselves, so bytes are written to a temp file
+    first. Chunks never span pages, so the output is identical to
+    split_pdf_serial.
+    """
+    with _as_local(pdf, path_only=True) as path:
+        page_count = count_pdf_pages(path)
+        starts = list(range(0, page_count, pages_per_task))
+        ends = [min(start + pages_per_task, page_count) for start in starts]
+        if not starts:
+            return []
+
+        pool = get_parse_pool()
+        try:
+            # map() yields results in submission order regardless of completion order
+            parts = pool.map(_split_page_range, repeat(path), repeat(filename), starts, ends)
+            return [chunk for part in parts for chunk in part]
+        except BrokenProcessPool:
+            _discard_pool(pool)
+            raise
+
+@contextmanager
+def _as_local(pdf, path_only=False):
+    """bytes and paths as they are; streams, and bytes if path_only, copied to a temp file
+
+    pypdf seeks back and forth in small reads, which a GridOut answers by
+    refetching chunks from MongoDB, so parsing one in place is several times
+    slower than one sequential copy. The temp file also lets workers open it.
+    """
+    if isinstance(pdf, (str, os.PathLike)) or (isinstance(pdf, (bytes, bytearray)) and not path_only):
+        yield pdf
+        return
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "document.pdf")
+        with open(path, "wb") as f:
+            if isinstance(pdf, (bytes, bytearray)):
+                f.write(pdf)
+            else:
+                pdf.seek(0)
+                shutil.copyfileobj(pdf, f, SPOOL_BLOCK_SIZE)
+        yield path
+
+def split_pdf(pdf, filename="document.pdf"):
+    """Chunk a PDF, using the process pool for documents large enough to benefit"""
+    with _as_local(pdf) as source:
+        if PDF_PARSE_WORKERS > 1 and count_pdf_pages(source) >= PARALLEL_PARSE_MIN_PAGES:
+            # Workers parse and split each page range together
+            with registry.timer("ingest_seconds", stage="parse_split_parallel"):
+                return split_pdf_parallel(source, filename)
+        return split_pdf_serial(source, filename)
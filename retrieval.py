@@ -0,0 +1,117 @@
+import os
+import threading
+import numpy as np
+from sparse_index import BM25Index
+from metrics import registry
+
+# Constants
+RETRIEVAL_K = int(os.getenv("RETRIEVAL_K", "3"))
+HYBRID_SEARCH = os.getenv("HYBRID_SEARCH", "true").lower() == "true"
+HYBRID_FETCH_K = int(os.getenv("HYBRID_FETCH_K", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+SPARSE_MIN_SCORE_RATIO = float(os.getenv("SPARSE_MIN_SCORE_RATIO", "0.5"))
+RERANK_MODEL = os.getenv("RERANK_MODEL", "")  # e.g. "cross-encoder/ms-marco-MiniLM-L-6-v2"; empty disables reranking
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))
+
+# Cross-encoders shared by every Streamlit session in this process
+_rerankers = {}
+_reranker_lock = threading.Lock()
+
+def chunk_at(vs, position):
+    """Document stored at a FAISS position"""
+    return vs.docstore.search(vs.index_to_docstore_id[position])
+
+def get_sparse_index(vs):
+    """BM25 index of a vector store, built from its docstore for stores saved without one"""
+    sparse = getattr(vs, "sparse_index", None)
+    if sparse is None:
+        sparse = BM25Index.from_texts([chunk_at(vs, position).page_content for position in range(vs.index.ntotal)])
+        vs.sparse_index = sparse
+    return sparse
+
+def dense_search(vs, query_vector, k):
+    """Top-k (position, distance) pairs from the FAISS index"""
+    distances, positions = vs.index.search(np.asarray([query_vector], dtype=np.float32), k)
+    return [(int(position), float(distance)) for position, distance in zip(positions[0], distances[0]) if position != -1]
+
+def sparse_search(vs, query, k, min_ratio=SPARSE_MIN_SCORE_RATIO):
+    """Top-k BM25 (position, score) pairs, dropping matches far weaker than the best one
+
+    Chunks that only share common query words ("code", "section") would
+    otherwise pile up fusion credit alongside the dense ranking and push
+    out the one chunk that contains the exact identifier.
+    """
+    results = get_sparse_index(vs).search(query, k)
+    if not results:
+        return results
+    cutoff = results[0][1] * min_ratio
+    return [(position, score) for position, score in results if score >= cutoff]
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Positions ordered by the summed 1/(k + rank) over several rankings"""
+    fused = {}
+    for ranking in rankings:
+        for rank, position in enumerate(ranking):
+            fused[position] = fused.get(position, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=fused.get, reverse=True)
+
+def get_reranker(model_name=RERANK_MODEL):
+    """Load a local cross-encoder once per process"""
+    if model_name not in _rerankers:
+        with _reranker_lock:
+            if model_name not in _rerankers:
+                from sentence_transformers import CrossEncoder
+                _rerankers[model_name] = CrossEncoder(model_name)
+    return _rerankers[model_name]
+
+def rerank(query, docs, model_name=RERANK_MODEL):
+    """Order documents by cross-encoder relevance to the query"""
+    if not docs:
+        return docs
+    scores = get_reranker(model_name).predict([(query, doc.page_content) for doc in docs])
+    return [doc for _, doc in sorted(zip(scores, docs), key=lambda pair: pair[0], reverse=True)]
+
+def _search_depths(k, hybrid, rerank_model, fetch_k):
+    """(candidates kept after fusion, depth fetched from each ranking)"""
+    candidates = max(k, RERANK_CANDIDATES) if rerank_model else k
+    return candidates, max(candidates, fetch_k) if hybrid else candidates
+
+def _fuse(vs, query, dense_ranking, k, candidates, depth, hybrid, rerank_model):
+    """Fuse a dense ranking with BM25 for the query, then optionally rerank"""
+    rankings = [dense_ranking]
+    if hybrid:
+        with registry.timer("retrieval_seconds", stage="sparse"):
+            rankings.append([position for position, _ in sparse_search(vs, query, depth)])
+
+    docs = [chunk_at(vs, position) for position in reciprocal_rank_fusion(rankings)[:candidates]]
+    if rerank_model:
+        with registry.timer("retrieval_seconds", stage="rerank"):
+            docs = rerank(query, docs, rerank_model)
+    return docs[:k]
+
+def retrieve(vs, query, k, hybrid=HYBRID_SEARCH, rerank_model=RERANK_MODEL, fetch_k=HYBRID_FETCH_K):
+    """Top-k chunks: dense and BM25 rankings fused by reciprocal rank, then optionally reranked"""
+    candidates, depth = _search_depths(k, hybrid, rerank_model, fetch_k)
+    with registry.timer("retrieval_seconds", stage="embed_query"):
+        query_vector = vs.embeddings.embed_query(query)
+    with registry.timer("retrieval_seconds", stage="dense"):
+        dense_ranking = [position for position, _ in dense_search(vs, query_vector, depth)]
+    return _fuse(vs, query, dense_ranking, k, candidates, depth, hybrid, rerank_model)
+
+def retrieve_many(vs, queries, k, query_vectors=None, hybrid=HYBRID_SEARCH, rerank_model=RERANK_MODEL, fetch_k=HYBRID_FETCH_K):
+    """retrieve() for several queries with one embedding call and one FAISS search
+
+    Pass query_vectors when the queries are already embedded.
+    """
+    if not queries:
+        return []
+    candidates, depth = _search_depths(k, hybrid, rerank_model, fetch_k)
+    if query_vectors is None:
+        with registry.timer("retrieval_seconds", stage="embed_batch"):
+            query_vectors = vs.embeddings.embed_documents(list(queries))
+    with registry.timer("retrieval_seconds", stage="dense_batch"):
+        _, positions = vs.index.search(np.asarray(query_vectors, dtype=np.float32), depth)
+    return [
+        _fuse(vs, query, [int(position) for position in row if position != -1], k, candidates, depth, hybrid, rerank_model)
+        for query, row in zip(queries, positions)
+    ]
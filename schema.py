@@ -0,0 +1,74 @@
+import logging
+import threading
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from index import db
+from answer_cache import ANSWER_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_ensured = False
+_ensure_lock = threading.Lock()
+
+# collection -> [(keys, options)]; every query in index.py and the caches is served by one of these
+INDEXES = {
+    "users": [
+        ([("username", ASCENDING)], {"unique": True, "name": "username_unique"})
+    ],
+    "chat_history": [
+        # get_chat_history: find by username, sort by timestamp
+        ([("username", ASCENDING), ("timestamp", DESCENDING)], {"name": "username_timestamp"}),
+        # get_conversation_messages and the list_conversations $group
+        ([("username", ASCENDING), ("pdf_hash", ASCENDING), ("timestamp", DESCENDING)], {"name": "username_pdf_timestamp"})
+    ],
+    "conversation_meta": [
+        # Equality on both fields for find_one/update_one and the list_conversations $lookup
+        ([("pdf_hash", ASCENDING), ("username", ASCENDING)], {"unique": True, "name": "pdf_username_unique"})
+    ],
+    "fs.files": [
+        ([("metadata.hash", ASCENDING)], {"name": "metadata_hash"}),
+        ([("metadata.pdf_hash", ASCENDING), ("metadata.kind", ASCENDING)], {"name": "metadata_pdf_hash_kind"})
+    ],
+    "answer_cache": [
+        ([("pdf_hash", ASCENDING), ("key", ASCENDING)], {"unique": True, "name": "pdf_key_unique"}),
+        ([("created_at", ASCENDING)], {"expireAfterSeconds": ANSWER_CACHE_TTL_SECONDS, "name": "created_at_ttl"})
+    ],
+    "conversation_memory": [
+        ([("username", ASCENDING), ("pdf_hash", ASCENDING)], {"unique": True, "name": "username_pdf_unique"})
+    ],
+    "summary_cache": [
+        ([("key", ASCENDING)], {"unique": True, "name": "key_unique"})
+    ]
+}
+
+def _create(collection, keys, options):
+    try:
+        collection.create_index(keys, **options)
+    except OperationFailure as e:
+        if e.code in (85, 86):
+            # Same name with different options, e.g. a TTL change or an earlier non-unique fallback
+            logger.warning("index %s on %s already exists with other options: %s", options["name"], collection.name, e)
+            return
+        if not options.get("unique") or e.code != 11000:
+            raise
+        # Existing duplicates (e.g. from the old find_one/insert_one race) block a unique index
+        logger.warning("duplicates in %s prevent unique index %s; creating it non-unique", collection.name, options["name"])
+        options = dict(options, unique=False)
+        collection.create_index(keys, **options)
+
+def ensure_indexes(database=db):
+    """Create every index the app relies on; safe to call repeatedly"""
+    for collection_name, indexes in INDEXES.items():
+        collection = database[collection_name]
+        for keys, options in indexes:
+            _create(collection, keys, options)
+
+def ensure_indexes_once():
+    """ensure_indexes for the app database, at most once per process"""
+    global _ensured
+    if _ensured:
+        return
+    with _ensure_lock:
+        if not _ensured:
+            ensure_indexes()
+            _ensured = True
@@ -0,0 +1,275 @@
+import time
+import asyncio
+import logging
+from contextlib import contextmanager, ExitStack
+from index import (
+    load_and_process_pdf,
+    create_vector_store,
+    save_chat_history,
+    list_conversations,
+    get_conversation_messages,
+    iter_conversation_messages,
+    update_conversation_name,
+    history_version,
+    list_user_pdfs,
+    save_pdf_stream,
+    open_pdf_stream
+)
+from index_store import load_vector_store, save_vector_store, has_vector_store
+from vector_cache import vector_cache
+from ingest_queue import ingest_scheduler
+from job_states import ACTIVE_STATES, INDEXED
+from answer_cache import answer_cache
+from summarizer import SummaryReport, summarize_document, stream_document_summary
+from library import library_key, get_library_store
+from answering import NO_PDF_MESSAGE, answer_question, stream_answer
+from batch_answers import BATCH_MAX_QUESTIONS, iter_batch_answers, record_batch
+from conversation_memory import memory_cache
+from llm_client import default_client
+from metrics import registry
+
+SUMMARY_QUESTION = "[System] Generate PDF summary"
+
+logger = logging.getLogger(__name__)
+
+def get_vector_store(pdf_hash, filename="document.pdf"):
+    """Load the persisted index for a PDF, building and saving it on first use"""
+    vs = load_vector_store(pdf_hash)
+    if vs is None:
+        stream = open_pdf_stream(pdf_hash)
+        if stream is None:
+            return None
+        with stream:
+            docs = load_and_process_pdf(stream, filename)
+        vs = create_vector_store(docs)
+        save_vector_store(pdf_hash, vs)
+    return vs
+
+@contextmanager
+def pinned_store(pdf_hash):
+    """Shared vector store for a PDF, pinned in the cache for the duration of the block; None if unknown"""
+    vs = vector_cache.acquire(pdf_hash, lambda: get_vector_store(pdf_hash)) if pdf_hash else None
+    try:
+        yield vs
+    finally:
+        if vs is not None:
+            vector_cache.release(pdf_hash)
+
+def library_pdf_hashes(username, extra=()):
+    """Indexed PDFs in the user's library: past conversations plus `extra`, e.g. a session's uploads"""
+    pdf_hashes = set(list_user_pdfs(username)) if username else set()
+    pdf_hashes.update(extra)
+    return pdf_hashes - ingest_scheduler.active(pdf_hashes)
+
+@contextmanager
+def pinned_library(pdf_hashes):
+    """Merged vector store over a set of PDFs, pinned for the duration of the block; None if empty"""
+    key = library_key(pdf_hashes) if pdf_hashes else None
+    vs = vector_cache.acquire(key, lambda: get_library_store(pdf_hashes, get_vector_store)) if key else None
+    try:
+        yield vs
+    finally:
+        if vs is not None:
+            vector_cache.release(key)
+
+def upload_pdf(stream, filename):
+    """Store an uploaded PDF and queue it for ingestion unless it is already indexed; returns its status"""
+    pdf_hash = save_pdf_stream(stream, filename)
+    if not vector_cache.contains(pdf_hash) and ingest_status(pdf_hash)["state"] not in (INDEXED, *ACTIVE_STATES):
+        ingest_scheduler.submit(pdf_hash, filename)
+    return ingest_status(pdf_hash)
+
+def ingest_status(pdf_hash):
+    """{"pdf_hash", "state", "progress", "error"}; state is None for a PDF that was never ingested
+
+    Jobs started by other API workers are found through their shared
+    status records, and a persisted index counts as indexed.
+    """
+    status = ingest_scheduler.status(pdf_hash)
+    if status is None:
+        if vector_cache.contains(pdf_hash) or has_vector_store(pdf_hash):
+            status = {"state": INDEXED, "progress": 1.0, "error": None}
+        else:
+            status = {"state": None, "progress": 0.0, "error": None}
+    return {"pdf_hash": pdf_hash, **status}
+
+def cache_stats():
+    """LLM client, answer cache and vector cache counters for this process"""
+    return {
+        "llm_client": default_client.metrics.snapshot(),
+        "answer_cache": answer_cache.stats(),
+        "vector_cache": vector_cache.stats()
+    }
+
+def is_pending(pdf_hash):
+    """True while a PDF is queued or being processed by any worker"""
+    return ingest_status(pdf_hash)["state"] in ACTIVE_STATES
+
+def _stored_messages(username, pdf_hash, since):
+    """Conversation rows after `since` as user/assistant messages, oldest first"""
+    messages = []
+    for row in reversed(get_conversation_messages(username, pdf_hash, since=since)):
+        messages.append({"role": "user", "content": row["question"], "timestamp": row.get("timestamp")})
+        messages.append({"role": "assistant", "content": row["answer"], "timestamp": row.get("timestamp")})
+    return messages
+
+def _prepare(username, pdf_hash, question, messages):
+    """(standalone question, memory text) from the conversation memory
+
+    `messages` is the caller's view of the conversation; without one the
+    turns not yet folded into the stored summary are read from history.
+    """
+    memory, lock = memory_cache.get(username, pdf_hash)
+    # One question at a time per conversation: prepare() updates the memory in place
+    with lock:
+        if messages is None:
+            messages = _stored_messages(username, pdf_hash, memory.folded_until) if username and pdf_hash else []
+        with registry.timer("memory_seconds"):
+            return memory.prepare(messages, question)
+
+@contextmanager
+def _answer_store(username, pdf_hash, library, extra_pdf_hashes):
+    """(vector store, answer cache scope) for a question, pinned for the duration of the block"""
+    if library:
+        pdf_hashes = library_pdf_hashes(username, extra_pdf_hashes)
+        with pinned_library(pdf_hashes) as vs:
+            yield vs, library_key(pdf_hashes) if pdf_hashes else None
+    else:
+        with pinned_store(pdf_hash) as vs:
+            yield vs, pdf_hash
+
+def _record(username, pdf_hash, question, answer):
+    if username and pdf_hash:
+        save_chat_history(username, question, answer, pdf_hash)
+
+def ask(username, pdf_hash, question, library=False, messages=None, extra_pdf_hashes=()):
+    """Answer a question about a PDF or the user's library and record it in history
+
+    Returns {"answer", "cached"}.
+    """
+    standalone, memory = _prepare(username, pdf_hash, question, messages)
+    with _answer_store(username, pdf_hash, library, extra_pdf_hashes) as (vs, scope):
+        start = time.perf_counter()
+        answer = answer_cache.lookup(scope, standalone) if scope else None
+        cached = answer is not None
+        if cached:
+            registry.observe("answer_seconds", time.perf_counter() - start, source="cache")
+        else:
+            start = time.perf_counter()
+            answer = answer_question(vs, standalone, memory, library)
+            elapsed = time.perf_counter() - start
+            registry.observe("answer_seconds", elapsed, source="llm")
+            if scope and not answer.startswith("⚠️"):
+                answer_cache.store(scope, standalone, answer, elapsed)
+    _record(username, pdf_hash, question, answer)
+    return {"answer": answer, "cached": cached}
+
+def ask_stream(username, pdf_hash, question, library=False, messages=None, extra_pdf_hashes=()):
+    """ask() yielding answer tokens as they arrive; history is written once the answer is complete"""
+    standalone, memory = _prepare(username, pdf_hash, question, messages)
+    with _answer_store(username, pdf_hash, library, extra_pdf_hashes) as (vs, scope):
+        start = time.perf_counter()
+        answer = answer_cache.lookup(scope, standalone) if scope else None
+        if answer is not None:
+            registry.observe("answer_seconds", time.perf_counter() - start, source="cache")
+            yield answer
+        else:
+            start = time.perf_counter()
+            tokens = []
+            for token in stream_answer(vs, standalone, memory, library):
+                tokens.append(token)
+                yield token
+            answer = "".join(tokens)
+            elapsed = time.perf_counter() - start
+            registry.observe("answer_seconds", elapsed, source="llm")
+            if scope and not answer.startswith("⚠️"):
+                answer_cache.store(scope, standalone, answer, elapsed)
+    _record(username, pdf_hash, question, answer)
+
+async def iter_ask_batch(username, pdf_hash, questions, library=False, extra_pdf_hashes=()):
+    """Answer up to BATCH_MAX_QUESTIONS independent questions, yielding results as they are ready
+
+    Each question is answered on its own, without the conversation memory.
+    History is written in question order once the batch is done.
+    """
+    questions = list(questions)[:BATCH_MAX_QUESTIONS]
+    loop = asyncio.get_running_loop()
+    results = [None] * len(questions)
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        # Loading a store can take seconds, so it happens off the event loop
+        entering = loop.run_in_executor(
+            None, stack.enter_context, _answer_store(username, pdf_hash, library, extra_pdf_hashes)
+        )
+        try:
+            vs, scope = await asyncio.shield(entering)
+        except asyncio.CancelledError:
+            # The thread still takes the pin after this block has exited; release it once it has
+            def release(future):
+                if not future.cancelled() and future.exception() is None:
+                    stack.close()
+            entering.add_done_callback(release)
+            raise
+        async for result in iter_batch_answers(vs, questions, scope, library):
+            results[result["index"]] = result
+            yield result
+    registry.observe("batch_seconds", time.perf_counter() - start)
+    await loop.run_in_executor(None, record_batch, username, pdf_hash, results)
+
+def ask_batch(username, pdf_hash, questions, library=False, extra_pdf_hashes=(), on_answer=None):
+    """iter_ask_batch() for synchronous callers; returns the results in question order
+
+    on_answer(result) is called as each answer is ready, e.g. to update a
+    progress bar.
+    """
+    async def run():
+        results = []
+        async for result in iter_ask_batch(username, pdf_hash, questions, library, extra_pdf_hashes):
+            results.append(result)
+            if on_answer:
+                on_answer(result)
+        return sorted(results, key=lambda result: result["index"])
+    return asyncio.run(run())
+
+def summarize(username, pdf_hash):
+    """Map-reduce summary of a whole PDF, recorded in history; returns {"summary", "report"}"""
+    with pinned_store(pdf_hash) as vs:
+        if vs is None:
+            return {"summary": NO_PDF_MESSAGE, "report": ""}
+        summary, report = summarize_document(pdf_hash, vs)
+    _record(username, pdf_hash, SUMMARY_QUESTION, summary)
+    return {"summary": summary, "report": str(report)}
+
+def summarize_stream(username, pdf_hash):
+    """summarize() yielding the final reduce step's tokens as they arrive"""
+    with pinned_store(pdf_hash) as vs:
+        if vs is None:
+            yield NO_PDF_MESSAGE
+            return
+        report = SummaryReport()
+        tokens = []
+        for token in stream_document_summary(pdf_hash, vs, report):
+            tokens.append(token)
+            yield token
+    logger.info("summary of %s: %s", pdf_hash, report)
+    _record(username, pdf_hash, SUMMARY_QUESTION, "".join(tokens))
+
+def conversations(username, cursor=None):
+    """(rows, next_cursor) for the sidebar, newest conversation first"""
+    return list_conversations(username, cursor=cursor)
+
+def conversation_messages(username, pdf_hash):
+    """A conversation as user/assistant messages, oldest first"""
+    return _stored_messages(username, pdf_hash, None)
+
+def export_messages(username, pdf_hash):
+    """conversation_messages() streamed from MongoDB in batches, for exports of long conversations"""
+    return iter_conversation_messages(username, pdf_hash)
+
+def rename_conversation(username, pdf_hash, name):
+    """Set a conversation's sidebar name; True if it changed"""
+    return update_conversation_name(username, pdf_hash, name)
+
+def conversations_version(username):
+    """Counter that changes whenever this process writes the user's history or renames a conversation"""
+    return history_version(username)
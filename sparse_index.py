@@ -0,0 +1,83 @@
+import os
+import re
+import math
+import numpy as np
+
+# Constants
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Identifiers such as "ERR-00042", "4.2.1" or "QX_17" stay whole; their parts are indexed too
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./][a-z0-9]+)*")
+
+def tokenize(text):
+    """Lowercased word tokens plus the pieces of compound identifiers"""
+    tokens = []
+    for match in TOKEN_PATTERN.findall(text.lower()):
+        tokens.append(match)
+        if not match.isalnum():
+            tokens.extend(part for part in re.split(r"[-_./]", match) if part)
+    return tokens
+
+class BM25Index:
+    """Okapi BM25 inverted index over chunk texts, addressed by FAISS position"""
+
+    def __init__(self, postings, doc_lengths):
+        self.postings = postings  # term -> (positions int32 array, term frequencies float32 array)
+        self.doc_lengths = doc_lengths
+        self.avg_length = float(doc_lengths.mean()) if len(doc_lengths) else 0.0
+
+    @classmethod
+    def from_texts(cls, texts):
+        """Build the index; texts[i] is the chunk stored at FAISS position i"""
+        grouped = {}
+        lengths = np.zeros(len(texts), dtype=np.float32)
+        for position, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths[position] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                grouped.setdefault(token, ([], []))
+                grouped[token][0].append(position)
+                grouped[token][1].append(count)
+        postings = {
+            token: (np.asarray(positions, dtype=np.int32), np.asarray(counts, dtype=np.float32))
+            for token, (positions, counts) in grouped.items()
+        }
+        return cls(postings, lengths)
+
+    def __len__(self):
+        return len(self.doc_lengths)
+
+    def nbytes(self):
+        """Approximate memory held by the postings"""
+        return self.doc_lengths.nbytes + sum(
+            positions.nbytes + counts.nbytes + len(token) for token, (positions, counts) in self.postings.items()
+        )
+
+    def scores(self, query):
+        """BM25 score of every chunk for a query"""
+        scores = np.zeros(len(self.doc_lengths), dtype=np.float32)
+        if not len(scores):
+            return scores
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths / max(self.avg_length, 1.0))
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            positions, counts = posting
+            idf = math.log(1 + (len(scores) - len(positions) + 0.5) / (len(positions) + 0.5))
+            scores[positions] += idf * counts * (BM25_K1 + 1) / (counts + norm[positions])
+        return scores
+
+    def search(self, query, k):
+        """Top-k (position, score) pairs with a positive score, best first"""
+        scores = self.scores(query)
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(position), float(scores[position])) for position in top]
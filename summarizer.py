@@ -0,0 +1,176 @@
+import os
+import math
+import time
+import hashlib
+import logging
+import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from llm_client import chat_completion, stream_chat_completion
+from index import db
+from tokens import count_tokens
+from context_builder import merge_chunks
+
+# Constants
+SUMMARY_GROUP_CHARS = int(os.getenv("SUMMARY_GROUP_CHARS", "8000"))
+SUMMARY_MAX_GROUP_CHARS = int(os.getenv("SUMMARY_MAX_GROUP_CHARS", "24000"))
+SUMMARY_MAX_MAP_CALLS = int(os.getenv("SUMMARY_MAX_MAP_CALLS", "48"))
+SUMMARY_PARALLELISM = int(os.getenv("SUMMARY_PARALLELISM", "6"))
+SUMMARY_MAX_LEVELS = 4
+SUMMARY_TIMEOUT = 60
+
+MAP_PROMPT = "Summarize the following section of a document. Keep the key facts, figures, names and conclusions. Be concise:\n\n{text}"
+REDUCE_PROMPT = "Combine the following partial summaries of consecutive parts of a document into one concise summary that preserves their order and key details:\n\n{text}"
+FINAL_PROMPT = "Please provide a comprehensive summary of the following document. Focus on the main points, key findings, and important details. Structure the summary with clear paragraphs:\n\n{text}"
+
+summary_cache_collection = db["summary_cache"]
+logger = logging.getLogger(__name__)
+
+class SummaryReport:
+    """What a summary cost: LLM calls made, calls served from cache, prompt tokens, wall time and coverage"""
+
+    def __init__(self):
+        self.chunks = 0
+        self.groups = 0
+        self.llm_calls = 0
+        self.cached_calls = 0
+        self.prompt_tokens = 0
+        self.levels = 0
+        self.coverage = 1.0
+        self.started = time.perf_counter()
+        self.wall_time = 0.0
+        self._lock = threading.Lock()
+
+    def add_call(self, cached=False, prompt=""):
+        tokens = count_tokens(prompt)
+        with self._lock:
+            if cached:
+                self.cached_calls += 1
+            else:
+                self.llm_calls += 1
+                self.prompt_tokens += tokens
+
+    def finish(self):
+        self.wall_time = time.perf_counter() - self.started
+        logger.info(
+            "summary: %d chunks in %d groups, %d reduce levels, %d LLM calls, %d cached, %d prompt tokens, %.0f%% coverage, %.2fs",
+            self.chunks, self.groups, self.levels, self.llm_calls, self.cached_calls, self.prompt_tokens,
+            self.coverage * 100, self.wall_time
+        )
+
+    def __str__(self):
+        return f"{self.llm_calls} LLM calls, {self.cached_calls} cached, {self.wall_time:.1f}s"
+
+def ordered_chunks(vector_store):
+    """All chunks from the docstore, in page order then original split order"""
+    docstore = vector_store.docstore
+    docs = [docstore.search(vector_store.index_to_docstore_id[i]) for i in sorted(vector_store.index_to_docstore_id)]
+    return sorted(docs, key=lambda doc: doc.metadata.get("page", 0))
+
+def pack(texts, max_chars):
+    """Greedily group consecutive texts into blocks of at most max_chars"""
+    groups = []
+    current = []
+    size = 0
+    for text in texts:
+        if current and size + len(text) > max_chars:
+            groups.append("\n".join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 1
+    if current:
+        groups.append("\n".join(current))
+    return groups
+
+def _cache_key(prompt, text):
+    return hashlib.sha256(f"{prompt}\0{text}".encode()).hexdigest()
+
+def _cached_completion(pdf_hash, prompt, text, report):
+    """Summarize one block, reusing a previously stored partial summary"""
+    key = _cache_key(prompt, text)
+    cached = summary_cache_collection.find_one({"key": key}, {"_id": 0, "summary": 1})
+    if cached:
+        report.add_call(cached=True)
+        return cached["summary"]
+    content = prompt.format(text=text)
+    report.add_call(prompt=content)
+    summary = chat_completion([{"role": "user", "content": content}], temperature=0.2, timeout=SUMMARY_TIMEOUT)
+    summary_cache_collection.update_one(
+        {"key": key},
+        {"$set": {"pdf_hash": pdf_hash, "summary": summary, "created_at": datetime.datetime.now()}},
+        upsert=True
+    )
+    return summary
+
+def _summarize_all(pdf_hash, prompt, blocks, report):
+    """Summarize blocks concurrently, preserving order"""
+    with ThreadPoolExecutor(max_workers=SUMMARY_PARALLELISM) as pool:
+        return list(pool.map(lambda block: _cached_completion(pdf_hash, prompt, block, report), blocks))
+
+def _final_input(pdf_hash, vector_store, report):
+    """Map and reduce until everything fits in one final prompt"""
+    chunks = ordered_chunks(vector_store)
+    report.chunks = len(chunks)
+    # One text per page with the splitter's chunk overlap removed
+    texts = [span.text for span in merge_chunks(chunks)]
+    total = sum(len(text) for text in texts)
+
+    # Grow groups on big documents so the number of map calls stays bounded
+    group_chars = min(SUMMARY_MAX_GROUP_CHARS, max(SUMMARY_GROUP_CHARS, math.ceil(total / SUMMARY_MAX_MAP_CALLS)))
+    groups = pack(texts, group_chars)
+    report.groups = len(groups)
+    if len(groups) > SUMMARY_MAX_MAP_CALLS:
+        step = len(groups) / SUMMARY_MAX_MAP_CALLS
+        groups = [groups[int(i * step)] for i in range(SUMMARY_MAX_MAP_CALLS)]
+        report.coverage = len(groups) / report.groups
+    if len(groups) <= 1:
+        return groups[0] if groups else ""
+
+    parts = _summarize_all(pdf_hash, MAP_PROMPT, groups, report)
+    while sum(len(part) for part in parts) > SUMMARY_MAX_GROUP_CHARS and len(parts) > 1 and report.levels < SUMMARY_MAX_LEVELS:
+        report.levels += 1
+        parts = _summarize_all(pdf_hash, REDUCE_PROMPT, pack(parts, SUMMARY_MAX_GROUP_CHARS), report)
+    return "\n\n".join(parts)
+
+def _cached_final(pdf_hash):
+    doc = summary_cache_collection.find_one({"key": f"final:{pdf_hash}"}, {"_id": 0, "summary": 1})
+    return doc["summary"] if doc else None
+
+def _store_final(pdf_hash, summary):
+    summary_cache_collection.update_one(
+        {"key": f"final:{pdf_hash}"},
+        {"$set": {"pdf_hash": pdf_hash, "summary": summary, "created_at": datetime.datetime.now()}},
+        upsert=True
+    )
+
+def summarize_document(pdf_hash, vector_store):
+    """Map-reduce summary of every chunk in the document; returns (summary, report)"""
+    report = SummaryReport()
+    summary = _cached_final(pdf_hash)
+    if summary is None:
+        content = FINAL_PROMPT.format(text=_final_input(pdf_hash, vector_store, report))
+        report.add_call(prompt=content)
+        summary = chat_completion([{"role": "user", "content": content}], temperature=0.2, timeout=SUMMARY_TIMEOUT)
+        _store_final(pdf_hash, summary)
+    else:
+        report.add_call(cached=True)
+    report.finish()
+    return summary, report
+
+def stream_document_summary(pdf_hash, vector_store, report):
+    """Like summarize_document, but streams the final reduce step; fills in report when done"""
+    summary = _cached_final(pdf_hash)
+    if summary is not None:
+        report.add_call(cached=True)
+        report.finish()
+        yield summary
+        return
+
+    content = FINAL_PROMPT.format(text=_final_input(pdf_hash, vector_store, report))
+    report.add_call(prompt=content)
+    tokens = []
+    for token in stream_chat_completion([{"role": "user", "content": content}], temperature=0.2, timeout=SUMMARY_TIMEOUT):
+        tokens.append(token)
+        yield token
+    _store_final(pdf_hash, "".join(tokens))
+    report.finish()
@@ -0,0 +1,45 @@
+import os
+import re
+import logging
+import threading
+
+# Constants
+TOKENIZER_PATH = os.getenv("TOKENIZER_PATH", "")  # local tokenizer.json of the LLM; never downloaded at runtime
+# Fallback when the tokenizer cannot be loaded: SentencePiece vocabularies split
+# words into ~1.3 pieces on average English text
+ESTIMATED_TOKENS_PER_WORD = 1.3
+
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+logger = logging.getLogger(__name__)
+
+# Loaded once per process; False means loading failed and the estimate is used
+_tokenizer = None
+_tokenizer_lock = threading.Lock()
+
+def get_tokenizer():
+    """Return the LLM tokenizer from TOKENIZER_PATH, or None if it is unset or unavailable"""
+    global _tokenizer
+    if _tokenizer is None:
+        with _tokenizer_lock:
+            if _tokenizer is None:
+                if not TOKENIZER_PATH:
+                    logger.warning("TOKENIZER_PATH is not set, estimating token counts")
+                    _tokenizer = False
+                else:
+                    try:
+                        from tokenizers import Tokenizer
+                        _tokenizer = Tokenizer.from_file(TOKENIZER_PATH)
+                    except Exception as e:
+                        logger.warning("tokenizer %s unavailable, estimating token counts: %s", TOKENIZER_PATH, e)
+                        _tokenizer = False
+    return _tokenizer or None
+
+def count_tokens(text):
+    """Number of LLM tokens in text"""
+    if not text:
+        return 0
+    tokenizer = get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, add_special_tokens=False).ids)
+    return round(len(WORD_PATTERN.findall(text)) * ESTIMATED_TOKENS_PER_WORD)
@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import OrderedDict
+from index_factory import index_memory_bytes
+
+# Constants
+VECTOR_CACHE_MAX_BYTES = int(os.getenv("VECTOR_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+def estimate_vector_store_bytes(vector_store):
+    """Approximate resident size of a FAISS store: index codes, BM25 postings and chunk text"""
+    size = index_memory_bytes(vector_store.index)
+    sparse = getattr(vector_store, "sparse_index", None)
+    if sparse is not None:
+        size += sparse.nbytes()
+    for doc in getattr(vector_store.docstore, "_dict", {}).values():
+        size += len(doc.page_content)
+    return size
+
+class _Entry:
+    __slots__ = ("vector_store", "size", "refs")
+
+    def __init__(self, vector_store, size):
+        self.vector_store = vector_store
+        self.size = size
+        self.refs = 0
+
+class VectorCache:
+    """Process-wide LRU of loaded vector stores keyed by PDF hash
+
+    Entries with a non-zero reference count are pinned and never evicted,
+    so the cache may temporarily exceed max_bytes if everything is in use.
+    """
+
+    def __init__(self, max_bytes=VECTOR_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _lookup(self, pdf_hash, pin):
+        """Return a cached store and update LRU order; caller holds the lock"""
+        entry = self._entries.get(pdf_hash)
+        if entry is None:
+            return None
+        self._entries.move_to_end(pdf_hash)
+        if pin:
+            entry.refs += 1
+        return entry.vector_store
+
+    def _evict(self):
+        """Drop least recently used unpinned entries until under budget; caller holds the lock"""
+        for pdf_hash in list(self._entries):
+            if self._bytes <= self.max_bytes:
+                break
+            entry = self._entries[pdf_hash]
+            if entry.refs > 0:
+                continue
+            del self._entries[pdf_hash]
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def _get(self, pdf_hash, loader, pin):
+        with self._lock:
+            vs = self._lookup(pdf_hash, pin)
+            if vs is not None:
+                self.hits += 1
+                return vs
+            load_lock = self._load_locks.setdefault(pdf_hash, threading.Lock())
+
+        # Load outside the cache lock; concurrent callers for the same hash wait here
+        with load_lock:
+            with self._lock:
+                vs = self._lookup(pdf_hash, pin)
+                if vs is not None:
+                    self.hits += 1
+                    return vs
+                self.misses += 1
+
+            try:
+                vs = loader()
+            except Exception:
+                with self._lock:
+                    self._load_locks.pop(pdf_hash, None)
+                raise
+
+            with self._lock:
+                self._load_locks.pop(pdf_hash, None)
+                if vs is None:
+                    return None
+                entry = _Entry(vs, estimate_vector_store_bytes(vs))
+                entry.refs = 1 if pin else 0
+                self._entries[pdf_hash] = entry
+                self._bytes += entry.size
+                self._evict()
+                return vs
+
+    def acquire(self, pdf_hash, loader):
+        """Get a store and pin it until release() is called"""
+        return self._get(pdf_hash, loader, pin=True)
+
+    def load(self, pdf_hash, loader):
+        """Get a store without pinning it, loading it into the cache if needed"""
+        return self._get(pdf_hash, loader, pin=False)
+
+    def release(self, pdf_hash):
+        """Unpin a store previously returned by acquire()"""
+        with self._lock:
+            entry = self._entries.get(pdf_hash)
+            if entry is not None and entry.refs > 0:
+                entry.refs -= 1
+                self._evict()
+
+    def contains(self, pdf_hash):
+        """Check whether a store is currently loaded"""
+        with self._lock:
+            return pdf_hash in self._entries
+
+    def stats(self):
+        """Counters and current usage"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "pinned": sum(1 for entry in self._entries.values() if entry.refs > 0),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+
+# Shared by every Streamlit session and API request in this process
+vector_cache = VectorCache()